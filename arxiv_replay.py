@@ -0,0 +1,321 @@
+"""
+arXiv检索的录制/回放：录制模式将原始Atom分页按查询和偏移量保存到磁盘，
+回放模式直接从磁盘读取（也可以通过本地HTTP替身服务提供），使检索、解析、过滤和去重可以离线、确定性地运行和做基准测试
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    import arxiv
+
+
+REPLAY_MODES = ("off", "record", "replay")
+DEFAULT_CASSETTE_DIR = "output/arxiv_cassettes"
+
+# 覆盖arXiv API地址（如指向本地HTTP替身服务 http://127.0.0.1:8081/api/query）
+API_URL_ENV = "ARXIV_API_URL"
+
+_settings = {
+    "mode": os.environ.get("ARXIV_REPLAY_MODE") or "off",
+    "directory": os.environ.get("ARXIV_REPLAY_DIR") or DEFAULT_CASSETTE_DIR,
+}
+
+
+class CassetteMissError(LookupError):
+    """回放模式下请求的分页没有录制"""
+
+
+def split_page_key(url: str) -> Tuple[str, int, Dict[str, str]]:
+    """
+    将arXiv API请求URL拆分为 (查询哈希, 偏移量, 不含偏移量的查询参数)
+
+    同一查询（检索式、排序、分页大小等）的所有分页共享一个查询哈希，按 start 偏移量区分。
+    """
+    params = dict(parse_qsl(urlsplit(url).query, keep_blank_values=True))
+    start = int(params.pop("start", 0) or 0)
+    canonical = json.dumps(sorted(params.items()), ensure_ascii=False)
+    query_hash = hashlib.sha1(canonical.encode("utf-8")).hexdigest()[:16]
+    return query_hash, start, params
+
+
+class Cassette:
+    """
+    磁盘上的Atom分页存储
+
+    目录结构:
+        index.json                 查询哈希 -> {"params": 查询参数, "pages": [偏移量], "recorded_at": 时间}
+        <查询哈希>_<偏移量>.xml     原始Atom分页
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory: str = DEFAULT_CASSETTE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._index: Dict[str, Dict] = {}
+        index_path = os.path.join(directory, self.INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                self._index = json.load(f)
+
+    def _page_path(self, query_hash: str, start: int) -> str:
+        return os.path.join(self.directory, f"{query_hash}_{start}.xml")
+
+    def get(self, url: str) -> bytes:
+        """读取录制的分页，没有录制时抛出CassetteMissError"""
+        query_hash, start, params = split_page_key(url)
+        path = self._page_path(query_hash, start)
+        if not os.path.exists(path):
+            raise CassetteMissError(
+                f"没有录制该arXiv分页 (search_query={params.get('search_query', '')!r}, start={start})，"
+                f"请先用录制模式运行一次"
+            )
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def put(self, url: str, content: bytes):
+        """保存分页并更新索引"""
+        query_hash, start, params = split_page_key(url)
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._page_path(query_hash, start), 'wb') as f:
+                f.write(content)
+            entry = self._index.setdefault(query_hash, {"params": params, "pages": []})
+            if start not in entry["pages"]:
+                entry["pages"] = sorted(entry["pages"] + [start])
+            entry["recorded_at"] = datetime.now().isoformat()
+            with open(os.path.join(self.directory, self.INDEX_FILE), 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, ensure_ascii=False, indent=2)
+
+    def queries(self) -> List[Dict[str, str]]:
+        """已录制的查询参数列表"""
+        return [entry["params"] for entry in self._index.values()]
+
+
+class _Response:
+    """arxiv.Client 只用到响应的 status_code 和 content"""
+
+    def __init__(self, status_code: int, content: bytes):
+        self.status_code = status_code
+        self.content = content
+
+
+class RecordingSession:
+    """转发请求到真实的requests.Session，并将成功的分页录制下来"""
+
+    def __init__(self, session, cassette: Cassette):
+        self._session = session
+        self.cassette = cassette
+
+    def get(self, url, **kwargs):
+        response = self._session.get(url, **kwargs)
+        if response.status_code == 200:
+            self.cassette.put(url, response.content)
+        return response
+
+
+class RequestThrottle:
+    """请求间隔：所有线程的请求按顺序放行，相邻两个请求至少间隔 interval 秒"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last = float("-inf")
+
+    def wait(self, interval: float):
+        with self._lock:
+            delay = self._last + interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self._last = time.monotonic()
+
+
+# 进程内所有arXiv客户端共享，多个子查询线程合计也不超过arXiv每3秒1个请求的限制
+_throttle = RequestThrottle()
+
+
+class ThrottledSession:
+    """每个请求前等待进程级的共享请求间隔（代替arxiv.Client按实例计算的 delay_seconds）"""
+
+    def __init__(self, session, interval: float, throttle: Optional[RequestThrottle] = None):
+        self._session = session
+        self.interval = interval
+        self.throttle = throttle or _throttle
+
+    def get(self, url, **kwargs):
+        self.throttle.wait(self.interval)
+        return self._session.get(url, **kwargs)
+
+
+class ReplaySession:
+    """从磁盘读取录制的分页，不访问网络"""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    def get(self, url, **kwargs):
+        return _Response(200, self.cassette.get(url))
+
+
+def configure_arxiv_replay(mode: str = "off", directory: str = DEFAULT_CASSETTE_DIR):
+    """
+    设置arXiv检索的录制/回放模式
+
+    Args:
+        mode: off（直接访问arXiv）/ record（访问arXiv并录制）/ replay（只从磁盘回放）
+        directory: 录制文件目录
+    """
+    if mode not in REPLAY_MODES:
+        raise ValueError(f"不支持的录制/回放模式: {mode}")
+    _settings["mode"] = mode
+    _settings["directory"] = directory or DEFAULT_CASSETTE_DIR
+    if mode != "off":
+        logger.info(f"arXiv检索{'录制' if mode == 'record' else '回放'}模式，目录: {_settings['directory']}")
+
+
+def make_arxiv_client(num_retries: int = 10, delay_seconds: float = 3, page_size: int = 100) -> 'arxiv.Client':
+    """
+    按当前的录制/回放设置创建arXiv客户端
+
+    回放模式下不需要遵守arXiv的请求间隔，delay_seconds 固定为0；其他模式下 delay_seconds
+    是进程内所有arXiv客户端共享的请求间隔，并发的多个客户端合计也不会超过arXiv的请求频率限制。
+    """
+    import arxiv
+
+    mode = _settings["mode"]
+    if mode == "replay":
+        return make_replay_client(_settings["directory"], page_size=page_size)
+
+    client = arxiv.Client(page_size=page_size, delay_seconds=0, num_retries=num_retries)
+    api_url = os.environ.get(API_URL_ENV)
+    if api_url:
+        client.query_url_format = api_url.rstrip("?") + "?{}"
+    if mode == "record":
+        client._session = RecordingSession(client._session, Cassette(_settings["directory"]))
+    if delay_seconds > 0:
+        client._session = ThrottledSession(client._session, delay_seconds)
+    return client
+
+
+def make_replay_client(directory: str, page_size: int = 100, api_url: Optional[str] = None) -> 'arxiv.Client':
+    """
+    创建回放客户端
+
+    Args:
+        directory: 录制文件目录
+        page_size: 分页大小，必须与录制时一致
+        api_url: 本地HTTP替身服务地址（见ArxivReplayServer），为空时在进程内直接读取磁盘
+    """
+    import arxiv
+
+    client = arxiv.Client(page_size=page_size, delay_seconds=0, num_retries=0)
+    if api_url:
+        client.query_url_format = api_url.rstrip("?") + "?{}"
+    else:
+        client._session = ReplaySession(Cassette(directory))
+    return client
+
+
+class ArxivReplayServer:
+    """
+    本地HTTP替身服务：按arXiv API的 /api/query 接口返回录制的Atom分页，
+    用于连同HTTP开销一起做检索基准测试（客户端通过 ARXIV_API_URL 指向该服务）
+    """
+
+    def __init__(self, directory: str = DEFAULT_CASSETTE_DIR, host: str = "127.0.0.1", port: int = 0):
+        self.cassette = Cassette(directory)
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def api_url(self) -> str:
+        if self._server is None:
+            raise RuntimeError("替身服务尚未启动")
+        return f"http://{self.host}:{self._server.server_address[1]}/api/query"
+
+    def start(self) -> 'ArxivReplayServer':
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        cassette = self.cassette
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                try:
+                    body, status = cassette.get(self.path), 200
+                except CassetteMissError as e:
+                    body, status = str(e).encode("utf-8"), 404
+                self.send_response(status)
+                self.send_header("Content-Type", "application/atom+xml; charset=utf-8" if status == 200
+                                 else "text/plain; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="arxiv-replay", daemon=True)
+        self._thread.start()
+        logger.info(f"arXiv回放服务已启动: {self.api_url}")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def search_from_params(params: Dict[str, str], max_results: Optional[int] = None) -> 'arxiv.Search':
+    """用录制时的查询参数重建arxiv.Search"""
+    import arxiv
+
+    return arxiv.Search(
+        query=params.get("search_query", ""),
+        id_list=[i for i in params.get("id_list", "").split(",") if i],
+        max_results=max_results,
+        sort_by=arxiv.SortCriterion(params.get("sortBy", "relevance")),
+        sort_order=arxiv.SortOrder(params.get("sortOrder", "descending")),
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="arXiv检索回放服务")
+    parser.add_argument("--dir", type=str, default=DEFAULT_CASSETTE_DIR, help="录制文件目录")
+    parser.add_argument("--port", type=int, default=8081)
+    args = parser.parse_args()
+
+    with ArxivReplayServer(args.dir, port=args.port) as replay_server:
+        logger.info(f"设置 {API_URL_ENV}={replay_server.api_url} 使客户端访问该服务")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,246 @@
+"""
+多配置批量运行：把多个用户配置合并为一次arXiv检索，每篇论文只获取一次、
+每种分类表只分析一次，再按各配置的检索条件把结果分发到各自的输出目录
+"""
+
+import os
+import re
+from dataclasses import replace
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from user_config import UserConfig
+from instrumentation import incr, span, timed
+
+if TYPE_CHECKING:
+    from enhanced_main import PipelineResult
+    from enhanced_paper import EnhancedArxivPaper
+    from prompt_builder import PromptBudget
+
+
+# 合并检索最多获取的论文数 = 各配置 max_papers 之和 × 该系数，
+# 避免某个配置条件过窄时一直翻页直到检索结果耗尽
+UNION_FETCH_FACTOR = 5
+
+
+def build_union_config(configs: Dict[str, UserConfig]) -> UserConfig:
+    """
+    合并多个配置的检索条件：检索词和研究领域取并集，时间范围取覆盖全部配置的区间
+
+    合并后的检索结果是各配置检索结果的超集，再在本地按各配置的条件筛选。
+    """
+    first = next(iter(configs.values()))
+    keywords: List[str] = []
+    categories: List[str] = []
+    seen_keywords = set()
+    for config in configs.values():
+        for kw in config.search_keywords:
+            if kw.lower() not in seen_keywords:
+                seen_keywords.add(kw.lower())
+                keywords.append(kw)
+        for cat in config.research_categories:
+            if cat not in categories:
+                categories.append(cat)
+
+    # 任一配置不限制检索词/研究领域时，合并后的查询也不能限制
+    if any(not config.search_keywords for config in configs.values()):
+        keywords = []
+    if any(not config.research_categories for config in configs.values()):
+        categories = []
+
+    return replace(
+        first,
+        search_keywords=keywords,
+        research_categories=categories,
+        start_date=min(config.start_date for config in configs.values()),
+        end_date=max(config.end_date for config in configs.values()),
+        max_papers=sum(config.max_papers for config in configs.values()),
+    )
+
+
+class ConfigMatcher:
+    """
+    在本地判断论文是否满足某个配置的检索条件
+
+    与arXiv的 all:"检索词" / cat:领域 / submittedDate 查询对应：检索词在标题或摘要中作为完整词组出现
+    （不区分大小写），论文分类与配置的研究领域有交集，且提交日期在时间范围内。
+    """
+
+    def __init__(self, config: UserConfig):
+        self.config = config
+        self._keyword_patterns = [
+            re.compile(r'(?<!\w)' + re.escape(kw) + r'(?!\w)', re.IGNORECASE)
+            for kw in config.search_keywords
+        ]
+        self._categories = set(config.research_categories)
+
+    def matches(self, paper: 'EnhancedArxivPaper') -> bool:
+        if not (self.config.start_date <= paper.published_date <= self.config.end_date):
+            return False
+        if self._categories and not self._categories.intersection(paper.categories):
+            return False
+        if self._keyword_patterns:
+            text = f"{paper.title} {paper.summary}"
+            if not any(pattern.search(text) for pattern in self._keyword_patterns):
+                return False
+        return True
+
+
+@timed("batch.search")
+def harvest_papers(configs: Dict[str, UserConfig],
+                   max_fetch: Optional[int] = None) -> Tuple[Dict[str, 'EnhancedArxivPaper'], Dict[str, List[str]]]:
+    """
+    用合并后的查询检索一次，按各配置的条件在本地分配论文
+
+    检索结果按提交日期倒序返回，每个配置依次收下满足其条件的论文直到 max_papers，
+    全部配置收满、检索结果耗尽或达到 max_fetch 时停止翻页。
+
+    Args:
+        configs: 配置名 -> 用户配置
+        max_fetch: 最多获取的论文数，默认为各配置 max_papers 之和 × UNION_FETCH_FACTOR
+
+    Returns:
+        (entry_id -> 论文, 配置名 -> 分配到的entry_id列表)
+    """
+    import arxiv
+    from tqdm import tqdm
+    from arxiv_replay import make_arxiv_client
+    from enhanced_main import build_search_query
+    from enhanced_paper import EnhancedArxivPaper
+    from query_planner import execute_plan, plan_query
+    from result_normalizer import iter_results, wrap_result
+
+    union_config = build_union_config(configs)
+    if max_fetch is None:
+        max_fetch = union_config.max_papers * UNION_FETCH_FACTOR
+    query = build_search_query(union_config)
+    logger.info(f"合并 {len(configs)} 个配置的检索查询: {query}")
+
+    matchers = {name: ConfigMatcher(config) for name, config in configs.items()}
+    assigned: Dict[str, List[str]] = {name: [] for name in configs}
+    papers: Dict[str, EnhancedArxivPaper] = {}
+
+    def all_full() -> bool:
+        return all(len(assigned[name]) >= configs[name].max_papers for name in configs)
+
+    # 合并后的检索词通常很多，超过阈值时拆分为子查询并发执行（无法提前停止翻页）
+    plan = plan_query(replace(union_config, max_papers=max_fetch))
+    fetched = 0
+    with span("search.arxiv_paging"), tqdm(desc="合并检索论文") as pbar:
+        if plan.is_split:
+            candidates = iter(execute_plan(plan))
+        else:
+            client = make_arxiv_client(num_retries=10, delay_seconds=3)
+            search = arxiv.Search(
+                query=query,
+                max_results=max_fetch,
+                sort_by=arxiv.SortCriterion.SubmittedDate,
+                sort_order=arxiv.SortOrder.Descending
+            )
+            candidates = (wrap_result(EnhancedArxivPaper, result) for result in iter_results(client.results(search)))
+
+        for paper in candidates:
+            fetched += 1
+            pbar.update(1)
+            for name, matcher in matchers.items():
+                if len(assigned[name]) < configs[name].max_papers and matcher.matches(paper):
+                    assigned[name].append(paper.entry_id)
+                    papers[paper.entry_id] = paper
+            if all_full():
+                break
+
+    incr("papers_fetched", fetched)
+    logger.info(f"合并检索获取 {fetched} 篇论文，其中 {len(papers)} 篇被至少一个配置选中")
+    for name, entry_ids in assigned.items():
+        logger.info(f"  {name}: {len(entry_ids)}/{configs[name].max_papers} 篇")
+    return papers, assigned
+
+
+def run_batch(configs: Dict[str, UserConfig], output_dir: str = "output", dedup_threshold: float = 0.8,
+              prompt_budget: Optional['PromptBudget'] = None,
+              max_fetch: Optional[int] = None, fulltext=None) -> Dict[str, 'PipelineResult']:
+    """
+    批量运行多个配置：一次检索，按分析输入指纹（提示词模板、分类表、模型）分组，
+    每组内每篇论文只分析一次，结果写入 <output_dir>/<配置名>/
+
+    LLM调用次数与（去重后的论文数 × 不同分类表数量）成正比，而不是配置数 × 论文数。
+    调用前需要先通过 set_global_llm() 设置LLM。
+
+    Args:
+        configs: 配置名 -> 用户配置
+        output_dir: 输出根目录
+        dedup_threshold: 近似重复论文的相似度阈值
+        prompt_budget: 提示词token预算
+        max_fetch: 合并检索最多获取的论文数
+        fulltext: FullTextExtractor对象（全文模式），各分组共享同一个PDF/文本缓存
+
+    Returns:
+        配置名 -> PipelineResult
+    """
+    from enhanced_main import PipelineResult, export_pipeline_results
+    from enhanced_paper_analyzer import EnhancedPaperAnalyzer
+    from paper_dedup import deduplicate_papers, expand_duplicate_analyses
+
+    if not configs:
+        return {}
+
+    papers, assigned = harvest_papers(configs, max_fetch=max_fetch)
+    results = {name: PipelineResult(papers_found=len(assigned[name])) for name in configs}
+
+    # 按分析输入指纹分组，同一分类表的配置共享分析结果
+    groups: Dict[Tuple[str, ...], List[str]] = {}
+    analyzers: Dict[Tuple[str, ...], EnhancedPaperAnalyzer] = {}
+    for name, config in configs.items():
+        analyzer = EnhancedPaperAnalyzer(config, prompt_budget=prompt_budget, fulltext=fulltext)
+        key = tuple(sorted(analyzer.input_fingerprint().items()))
+        groups.setdefault(key, []).append(name)
+        analyzers.setdefault(key, analyzer)
+    logger.info(f"{len(configs)} 个配置共使用 {len(groups)} 种分类表")
+
+    for key, names in groups.items():
+        analyzer = analyzers[key]
+        entry_ids = list(dict.fromkeys(entry_id for name in names for entry_id in assigned[name]))
+        if not entry_ids:
+            continue
+        group_papers = [papers[entry_id] for entry_id in entry_ids]
+
+        with span("dedup"):
+            dedup_result = deduplicate_papers(group_papers, threshold=dedup_threshold)
+        analyses = analyzer.analyze_papers_batch(dedup_result.representatives)
+        analyses = expand_duplicate_analyses(analyses, dedup_result)
+        analyses_by_url = {analysis.arxiv_url: analysis for analysis in analyses}
+
+        for name in names:
+            config_papers = [papers[entry_id] for entry_id in assigned[name]]
+            config_analyses = [analyses_by_url[paper.entry_id] for paper in config_papers
+                               if paper.entry_id in analyses_by_url]
+            if not config_analyses:
+                logger.warning(f"{name}: 没有成功分析的论文")
+                continue
+            logger.info(f"导出配置 {name} 的 {len(config_analyses)} 条分析结果")
+            export_pipeline_results(config_papers, config_analyses, analyzer.input_fingerprint(),
+                                    os.path.join(output_dir, name), results[name])
+
+    requested = sum(len(entry_ids) for entry_ids in assigned.values())
+    incr("batch_papers_shared", requested - len(papers))
+    logger.success(f"批量运行完成：{len(configs)} 个配置共选中 {requested} 篇次论文，实际检索 {len(papers)} 篇")
+    return results
+
+
+def preset_user_config(preset_name: str) -> UserConfig:
+    """将 enhanced_config.PRESET_CONFIGS 中的预设转换为用户配置"""
+    from enhanced_config import get_preset_config
+
+    preset = get_preset_config(preset_name)
+    if preset is None:
+        raise ValueError(f"未知的预设配置: {preset_name}")
+    return replace(
+        UserConfig.create_default(),
+        search_keywords=list(preset["keywords"]),
+        research_categories=list(preset["categories"]),
+        start_date=preset["start_date"],
+        end_date=preset["end_date"],
+        max_papers=preset["max_papers"],
+        custom_task_categories=dict(preset.get("custom_tasks", {})),
+    )
@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+"""
+端到端吞吐基准测试：用本地模拟的OpenAI兼容服务和合成的arXiv论文语料，
+在不同规模下运行 EnhancedPaperAnalyzer 和CSV导出，报告吞吐量、p95延迟和峰值内存，
+并保存结果用于回归对比
+
+用法:
+    python benchmark.py --sizes 100,1000,10000 --latency 0.05
+    python benchmark.py --sizes 1000 --compare output/benchmarks/benchmark_20240101_120000.json
+    python benchmark.py --fetch --sizes 1000,10000             # 回放合成的arXiv检索分页
+    python benchmark.py --fetch --cassette_dir output/arxiv_cassettes --replay_http
+    python benchmark.py --startup                               # 命令冷启动的导入耗时
+    python benchmark.py --connections --tls --concurrency 16    # 新建连接与连接池复用的单请求开销对比
+    python benchmark.py --sizes 200 --token_delay 0.002 --trailing_chars 400 --stream   # 流式提前结束
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+
+DEFAULT_SIZES = (100, 1000, 10000)
+
+# 吞吐量下降或延迟/内存上升超过该比例时视为回归
+REGRESSION_TOLERANCE = 0.10
+
+_TOPICS = [
+    "embodied navigation", "robotic manipulation", "vision-language-action", "scene graph",
+    "object detection", "reinforcement learning", "imitation learning", "world model",
+    "3D reconstruction", "motion planning", "semantic segmentation", "instruction following",
+    "large language model", "diffusion policy", "sim-to-real transfer", "multimodal reasoning",
+]
+_WORDS = (
+    "agent policy environment robot model dataset benchmark task visual language action "
+    "representation learning training evaluation performance method framework approach "
+    "simulation real world transfer perception control planning reasoning memory spatial "
+    "temporal attention transformer encoder decoder reward trajectory demonstration scalable "
+    "efficient robust generalization zero-shot few-shot pretraining fine-tuning embodied"
+).split()
+_CATEGORIES = ["cs.RO", "cs.CV", "cs.AI", "cs.LG", "cs.CL"]
+_FIRST_NAMES = ["Wei", "Li", "Anna", "John", "Maria", "Kenji", "Priya", "David", "Sofia", "Chen"]
+_LAST_NAMES = ["Zhang", "Wang", "Smith", "Garcia", "Tanaka", "Kumar", "Mueller", "Kim", "Rossi", "Liu"]
+
+
+def make_synthetic_corpus(size: int, seed: int = 0) -> List:
+    """
+    生成合成的arXiv论文语料
+
+    Args:
+        size: 论文数量
+        seed: 随机数种子，相同种子生成相同语料
+
+    Returns:
+        EnhancedArxivPaper对象列表
+    """
+    import arxiv
+    from enhanced_paper import EnhancedArxivPaper
+
+    rng = random.Random(seed)
+    base_date = datetime(2024, 1, 1)
+    papers = []
+    for i in range(size):
+        short_id = f"{2401 + (i // 90000) % 12:04d}.{i % 90000 + 10000:05d}v{rng.randint(1, 3)}"
+        topic = rng.choice(_TOPICS)
+        title = f"{topic.title()} with {' '.join(rng.choices(_WORDS, k=rng.randint(3, 8))).title()}"
+        sentences = [
+            " ".join(rng.choices(_WORDS, k=rng.randint(12, 28))).capitalize() + "."
+            for _ in range(rng.randint(5, 12))
+        ]
+        summary = f"We study {topic}. " + " ".join(sentences)
+        authors = [
+            arxiv.Result.Author(f"{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)}")
+            for _ in range(rng.randint(1, 15))
+        ]
+        categories = rng.sample(_CATEGORIES, k=rng.randint(1, 3))
+        result = arxiv.Result(
+            entry_id=f"http://arxiv.org/abs/{short_id}",
+            published=base_date + timedelta(days=rng.randint(0, 180)),
+            title=title,
+            authors=authors,
+            summary=summary,
+            primary_category=categories[0],
+            categories=categories,
+            links=[arxiv.Result.Link(f"http://arxiv.org/pdf/{short_id}", title="pdf",
+                                     content_type="application/pdf")],
+        )
+        papers.append(EnhancedArxivPaper(result))
+    return papers
+
+
+_ATOM_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/" '
+    'xmlns:arxiv="http://arxiv.org/schemas/atom">\n'
+    '<title>arXiv Query</title>\n'
+    '<opensearch:totalResults>{total}</opensearch:totalResults>\n'
+    '<opensearch:startIndex>{start}</opensearch:startIndex>\n'
+    '<opensearch:itemsPerPage>{page_size}</opensearch:itemsPerPage>\n'
+)
+
+
+def render_atom_page(papers: List, total: int, start: int, page_size: int) -> bytes:
+    """将论文渲染为arXiv API格式的Atom分页"""
+    from xml.sax.saxutils import escape, quoteattr
+
+    parts = [_ATOM_HEADER.format(total=total, start=start, page_size=page_size)]
+    for paper in papers:
+        result = paper._paper
+        published = result.published.strftime("%Y-%m-%dT%H:%M:%SZ")
+        parts.append("<entry>")
+        parts.append(f"<id>{escape(result.entry_id)}</id>")
+        parts.append(f"<updated>{published}</updated><published>{published}</published>")
+        parts.append(f"<title>{escape(result.title)}</title>")
+        parts.append(f"<summary>{escape(result.summary)}</summary>")
+        for author in result.authors:
+            parts.append(f"<author><name>{escape(author.name)}</name></author>")
+        parts.append(f'<link href={quoteattr(result.entry_id)} rel="alternate" type="text/html"/>')
+        parts.append(f'<link title="pdf" href={quoteattr(result.pdf_url)} rel="related" type="application/pdf"/>')
+        parts.append(f'<arxiv:primary_category term={quoteattr(result.primary_category)}/>')
+        for category in result.categories:
+            parts.append(f'<category term={quoteattr(category)} scheme="http://arxiv.org/schemas/atom"/>')
+        parts.append("</entry>")
+    parts.append("</feed>\n")
+    return "\n".join(parts).encode("utf-8")
+
+
+def render_text_pdf(lines: List[str], compress: bool = True) -> bytes:
+    """
+    生成只包含文本行的最小PDF（标准Helvetica字体，每行一个文本对象），用作全文模式的本地PDF替身
+
+    Args:
+        lines: 文本行（仅支持Latin-1字符）
+        compress: 是否用FlateDecode压缩内容流
+    """
+    import zlib
+
+    def escape_pdf(text: str) -> str:
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    commands = []
+    for i, line in enumerate(lines):
+        y = 800 - (i % 60) * 12
+        commands.append(f"BT /F1 10 Tf 50 {y} Td ({escape_pdf(line)}) Tj ET")
+    content = "\n".join(commands).encode("latin-1")
+    stream_dict = "<< /Length {length} >>"
+    if compress:
+        content = zlib.compress(content)
+        stream_dict = "<< /Length {length} /Filter /FlateDecode >>"
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        stream_dict.format(length=len(content)).encode("ascii") + b"\nstream\n" + content + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("ascii")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("ascii")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+    return bytes(out)
+
+
+def write_synthetic_cassette(directory: str, size: int, query: str = "all:embodied",
+                             page_size: int = 100, seed: int = 0) -> Dict[str, str]:
+    """
+    用合成语料生成一份arXiv检索录制文件，供回放基准测试使用
+
+    Returns:
+        录制的查询参数
+    """
+    import arxiv
+    from arxiv_replay import Cassette, split_page_key
+
+    papers = make_synthetic_corpus(size, seed=seed)
+    search = arxiv.Search(query=query, max_results=size, sort_by=arxiv.SortCriterion.SubmittedDate,
+                          sort_order=arxiv.SortOrder.Descending)
+    cassette = Cassette(directory)
+    client = arxiv.Client(page_size=page_size)
+    for start in range(0, size, page_size):
+        url = client._format_url(search, start, page_size)
+        cassette.put(url, render_atom_page(papers[start:start + page_size], size, start, page_size))
+    return split_page_key(client._format_url(search, 0, page_size))[2]
+
+
+def run_fetch_benchmark(cassette_dir: str, api_url: Optional[str] = None,
+                        dedup_threshold: float = 0.8) -> List[Dict]:
+    """
+    回放录制的arXiv检索，分别统计分页获取+解析、计算机科学过滤和去重的吞吐量
+
+    Args:
+        cassette_dir: 录制文件目录
+        api_url: 本地HTTP替身服务地址，为空时在进程内直接读取磁盘
+        dedup_threshold: 去重相似度阈值
+
+    Returns:
+        每个录制查询的结果
+    """
+    from arxiv_replay import Cassette, make_replay_client, search_from_params
+    from enhanced_paper import EnhancedArxivPaper
+    from paper_dedup import deduplicate_papers
+
+    runs = []
+    for params in Cassette(cassette_dir).queries():
+        page_size = int(params.get("max_results", 100))
+        client = make_replay_client(cassette_dir, page_size=page_size, api_url=api_url)
+
+        fetch_start = time.perf_counter()
+        papers = [EnhancedArxivPaper(result) for result in client.results(search_from_params(params))]
+        fetch_seconds = time.perf_counter() - fetch_start
+
+        filter_start = time.perf_counter()
+        filtered = [paper for paper in papers if paper.is_cs_related()]
+        filter_seconds = time.perf_counter() - filter_start
+
+        dedup_start = time.perf_counter()
+        dedup_result = deduplicate_papers(filtered, threshold=dedup_threshold)
+        dedup_seconds = time.perf_counter() - dedup_start
+
+        runs.append({
+            "query": params.get("search_query", ""),
+            "size": len(papers),
+            "representatives": len(dedup_result.representatives),
+            "fetch_seconds": round(fetch_seconds, 4),
+            "filter_seconds": round(filter_seconds, 4),
+            "dedup_seconds": round(dedup_seconds, 4),
+            "papers_per_second": round(len(papers) / (fetch_seconds + filter_seconds + dedup_seconds), 3)
+            if papers else 0.0,
+            "fetch_papers_per_second": round(len(papers) / fetch_seconds, 3) if fetch_seconds else 0.0,
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+        })
+    return runs
+
+
+class _LatencyRecorder:
+    """包装LLM实例，记录每次generate调用的耗时"""
+
+    def __init__(self, llm):
+        self._llm = llm
+        self.model = llm.model
+        self.latencies: List[float] = []
+
+    def generate(self, messages, max_tokens=None):
+        start = time.perf_counter()
+        try:
+            return self._llm.generate(messages, max_tokens=max_tokens)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+    def generate_json(self, messages, max_tokens=None):
+        start = time.perf_counter()
+        try:
+            return self._llm.generate_json(messages, max_tokens=max_tokens)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(percentile / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def _peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux上单位为KB，macOS上为字节
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_benchmark(size: int, base_url: str, seed: int = 0, prompt_token_budget: int = 2000,
+                  stream: bool = False) -> Dict:
+    """
+    运行一次端到端基准测试：生成语料 -> 批量分析 -> 导出CSV/统计/高创新性论文
+
+    Args:
+        size: 论文数量
+        base_url: 模拟服务的 base_url
+        seed: 语料随机数种子
+        prompt_token_budget: 每篇论文的提示词token预算
+        stream: 使用流式模式，完整的JSON到达后即关闭流
+
+    Returns:
+        基准测试结果
+    """
+    import llm as llm_module
+    from enhanced_csv_exporter import EnhancedCSVExporter
+    from enhanced_paper_analyzer import EnhancedPaperAnalyzer
+    from instrumentation import get_instrumentation
+    from prompt_builder import PromptBudget
+    from retry_policy import configure_retry
+    from user_config import UserConfig
+
+    llm_module.set_global_llm(api_key="benchmark", base_url=base_url, model="mock")
+    llm_module.configure_streaming(stream)
+    recorder = _LatencyRecorder(llm_module.GLOBAL_LLM)
+    llm_module.GLOBAL_LLM = recorder
+    get_instrumentation().reset()
+    # 每次基准测试使用新的重试预算和断路器
+    configure_retry()
+
+    corpus_start = time.perf_counter()
+    papers = make_synthetic_corpus(size, seed=seed)
+    corpus_seconds = time.perf_counter() - corpus_start
+
+    analyzer = EnhancedPaperAnalyzer(UserConfig.create_default(),
+                                     prompt_budget=PromptBudget(max_tokens=prompt_token_budget))
+    analyze_start = time.perf_counter()
+    analyses = analyzer.analyze_papers_batch(papers)
+    analyze_seconds = time.perf_counter() - analyze_start
+
+    exporter = EnhancedCSVExporter()
+    export_start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as output_dir:
+        exporter.export_to_csv(analyses, output_dir)
+        exporter.export_summary_stats(analyses, output_dir)
+        exporter.export_high_novelty_papers(analyses, output_dir)
+    export_seconds = time.perf_counter() - export_start
+
+    total_seconds = analyze_seconds + export_seconds
+    counters = get_instrumentation().snapshot()["counters"]
+    return {
+        "size": size,
+        "analyzed": len(analyses),
+        "failed": size - len(analyses),
+        "corpus_seconds": round(corpus_seconds, 4),
+        "analyze_seconds": round(analyze_seconds, 4),
+        "export_seconds": round(export_seconds, 4),
+        "papers_per_second": round(size / total_seconds, 3) if total_seconds else 0.0,
+        "llm_p50_seconds": round(_percentile(recorder.latencies, 50), 5),
+        "llm_p95_seconds": round(_percentile(recorder.latencies, 95), 5),
+        "llm_requests": len(recorder.latencies),
+        "llm_retries": counters.get("llm_retries", 0),
+        "prompt_tokens": counters.get("llm_prompt_tokens", 0),
+        "completion_tokens": counters.get("llm_completion_tokens", 0),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def _run_isolated(size: int, base_url: str, seed: int, prompt_token_budget: int, stream: bool = False) -> Dict:
+    """在独立进程中运行，使每个规模的峰值内存互不影响"""
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    return run_benchmark(size, base_url, seed=seed, prompt_token_budget=prompt_token_budget, stream=stream)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+# 启动耗时基准：(名称, 导入的模块, 实际执行的命令参数)
+STARTUP_TARGETS = (
+    ("enhanced_main --help", "enhanced_main", ["enhanced_main.py", "--help"]),
+    ("generate_report", "generate_report", ["generate_report.py", "--help"]),
+    ("quick_start", "quick_start", ["quick_start.py", "--help"]),
+    ("user_config", "user_config", None),
+)
+
+# 报告、配置等短命令的导入耗时预算（毫秒）
+STARTUP_IMPORT_BUDGET_MS = 100
+
+
+def _parse_importtime(stderr: str, module: str) -> Optional[float]:
+    """从 -X importtime 输出中取出顶层模块的累计导入耗时（毫秒）"""
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].rstrip() == f" {module}":
+            return int(parts[1]) / 1000.0
+    return None
+
+
+def make_self_signed_cert(directory: str) -> Tuple[str, str]:
+    """用openssl为本地回环地址生成自签名证书，返回 (证书文件, 私钥文件)"""
+    certfile, keyfile = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+                    "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+                    "-keyout", keyfile, "-out", certfile], check=True, capture_output=True)
+    return certfile, keyfile
+
+
+def run_connection_benchmark(server, requests: int = 200, concurrency: int = 8, verify=True) -> List[Dict]:
+    """
+    对比两种传输方式下并发LLM请求的单请求耗时：每个请求新建TCP（和TLS）连接，与共享连接池复用keep-alive连接
+
+    Args:
+        server: 已启动的 MockOpenAIServer（提供证书时为HTTPS）
+        requests: 每种方式的请求数
+        concurrency: 并发请求数（连接池大小与之一致）
+        verify: TLS证书校验，自签名证书时传入信任该证书的 ssl.SSLContext
+
+    Returns:
+        每种传输方式的结果，新建连接一项的 connection_overhead_ms 为平均每个请求多出的耗时
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from openai import OpenAI
+    from llm_transport import build_http_client, get_timeout
+
+    messages = [{"role": "user", "content": "ping"}]
+    runs = []
+    for transport, keepalive in (("new_connection", False), ("pooled", True)):
+        http_client = build_http_client(max_connections=concurrency, keepalive=keepalive, verify=verify)
+        client = OpenAI(api_key="benchmark", base_url=server.base_url, max_retries=0,
+                        http_client=http_client, timeout=get_timeout())
+
+        def call(_):
+            start = time.perf_counter()
+            client.chat.completions.create(model="mock", messages=messages)
+            return time.perf_counter() - start
+
+        connections_before = server.stats["connections"]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(call, range(requests)))
+        total_seconds = time.perf_counter() - start
+        http_client.close()
+
+        runs.append({
+            "transport": transport,
+            "tls": server.certfile is not None,
+            "requests": requests,
+            "concurrency": concurrency,
+            "connections": server.stats["connections"] - connections_before,
+            "request_mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+            "request_p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+            "request_p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+            "requests_per_second": round(requests / total_seconds, 1),
+        })
+    runs[0]["connection_overhead_ms"] = round(runs[0]["request_mean_ms"] - runs[1]["request_mean_ms"], 3)
+    return runs
+
+
+def run_startup_benchmark(repeat: int = 5) -> List[Dict]:
+    """
+    测量各命令的冷启动开销：每次都在新的解释器中用 -X importtime 统计导入耗时，
+    并统计完整命令（如 --help）的墙钟时间，取中位数
+
+    Returns:
+        每个目标的结果
+    """
+    import statistics
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for name, module, command in STARTUP_TARGETS:
+        import_times, wall_times = [], []
+        for _ in range(repeat):
+            proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                                  capture_output=True, text=True, cwd=root)
+            import_ms = _parse_importtime(proc.stderr, module)
+            if import_ms is not None:
+                import_times.append(import_ms)
+            if command:
+                start = time.perf_counter()
+                subprocess.run([sys.executable] + command, capture_output=True, cwd=root)
+                wall_times.append((time.perf_counter() - start) * 1000)
+
+        run = {
+            "target": name,
+            "import_ms": round(statistics.median(import_times), 1) if import_times else None,
+            "wall_ms": round(statistics.median(wall_times), 1) if wall_times else None,
+        }
+        run["within_budget"] = run["import_ms"] is not None and run["import_ms"] < STARTUP_IMPORT_BUDGET_MS
+        runs.append(run)
+        logger.info(f"  {name}: 导入 {run['import_ms']}ms, 命令耗时 {run['wall_ms']}ms"
+                    f"{'' if run['within_budget'] else ' ⚠️ 超出预算'}")
+    return runs
+
+
+def compare_results(current: Dict, baseline: Dict, tolerance: float = REGRESSION_TOLERANCE) -> List[str]:
+    """
+    与基线结果对比（按规模或启动目标对应）
+
+    Returns:
+        回归描述列表（为空表示没有回归）
+    """
+    def run_key(run):
+        return run.get("size", run.get("target", run.get("transport")))
+
+    baseline_by_key = {run_key(run): run for run in baseline.get("runs", [])}
+    regressions = []
+    for run in current.get("runs", []):
+        key = run_key(run)
+        base = baseline_by_key.get(key)
+        if not base:
+            continue
+        checks = [
+            ("papers_per_second", -1),
+            ("llm_p95_seconds", 1),
+            ("peak_rss_mb", 1),
+            ("import_ms", 1),
+            ("request_p50_ms", 1),
+        ]
+        for metric, direction in checks:
+            old, new = base.get(metric), run.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            marker = ""
+            if change * direction > tolerance:
+                marker = " ⚠️ 回归"
+                regressions.append(f"{key} {metric}: {old} -> {new} ({change:+.1%})")
+            print(f"  {str(key):<22} {metric:<18} {old:>10} -> {new:>10} ({change:+.1%}){marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端吞吐基准测试（使用本地模拟的OpenAI服务）")
+    parser.add_argument("--sizes", type=str, default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="论文数量列表，逗号分隔")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务的基础延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="模拟服务的延迟抖动（秒）")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="模拟服务返回500的概率")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="模拟服务返回429的概率")
+    parser.add_argument("--seed", type=int, default=0, help="语料随机数种子")
+    parser.add_argument("--prompt_token_budget", type=int, default=2000, help="每篇论文的提示词token预算")
+    parser.add_argument("--token_delay", type=float, default=0.0, help="模拟服务每生成一个token的耗时（秒）")
+    parser.add_argument("--trailing_chars", type=int, default=0, help="模拟服务在JSON之后多输出的说明文字字符数")
+    parser.add_argument("--stream", action="store_true", help="使用流式模式，完整的JSON到达后即关闭流")
+    parser.add_argument("--output_dir", type=str, default="output/benchmarks", help="结果保存目录")
+    parser.add_argument("--compare", type=str, default="", help="用于回归对比的基线结果JSON")
+    parser.add_argument("--no_isolate", action="store_true", help="在当前进程中运行所有规模（峰值内存会累积）")
+    parser.add_argument("--fetch", action="store_true",
+                        help="改为回放arXiv检索，测试分页获取/解析、过滤和去重的吞吐量")
+    parser.add_argument("--cassette_dir", type=str, default="",
+                        help="--fetch时回放的录制目录（为空时按--sizes生成合成录制）")
+    parser.add_argument("--replay_http", action="store_true", help="--fetch时通过本地HTTP替身服务回放")
+    parser.add_argument("--startup", action="store_true",
+                        help="改为测量命令冷启动的导入耗时（python -X importtime）")
+    parser.add_argument("--repeat", type=int, default=5, help="--startup时每个目标的重复次数")
+    parser.add_argument("--connections", action="store_true",
+                        help="改为对比每个请求新建连接与共享连接池的LLM请求开销")
+    parser.add_argument("--requests", type=int, default=200, help="--connections时每种传输方式的请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="--connections时的并发请求数")
+    parser.add_argument("--tls", action="store_true", help="--connections时模拟服务使用HTTPS（需要openssl命令）")
+    args = parser.parse_args()
+
+    from mock_openai_server import MockOpenAIServer
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = {
+        "created_at": datetime.now().isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output_dir", "compare")},
+        "runs": [],
+    }
+
+    if args.fetch:
+        results["runs"] = _run_fetch_benchmarks(args, sizes)
+        _save_and_compare(results, args)
+        return
+
+    if args.startup:
+        results["runs"] = run_startup_benchmark(args.repeat)
+        _save_and_compare(results, args)
+        if not all(run["within_budget"] for run in results["runs"]):
+            logger.warning(f"部分命令的导入耗时超过 {STARTUP_IMPORT_BUDGET_MS}ms 预算")
+            sys.exit(1)
+        return
+
+    if args.connections:
+        results["runs"] = _run_connection_benchmarks(args)
+        _save_and_compare(results, args)
+        return
+
+    trailing_content = ("\n说明：" + "分析依据见摘要。" * args.trailing_chars)[:args.trailing_chars]
+    with MockOpenAIServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          rate_limit_rate=args.rate_limit_rate, seed=args.seed, token_delay=args.token_delay,
+                          trailing_content=trailing_content) as server:
+        for size in sizes:
+            logger.info(f"运行基准测试: {size} 篇论文")
+            if args.no_isolate:
+                run = _run_isolated(size, server.base_url, args.seed, args.prompt_token_budget, args.stream)
+            else:
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                    run = executor.submit(_run_isolated, size, server.base_url, args.seed,
+                                          args.prompt_token_budget, args.stream).result()
+            results["runs"].append(run)
+            logger.info(
+                f"  {run['papers_per_second']} 篇/秒, LLM p95 {run['llm_p95_seconds'] * 1000:.1f}ms, "
+                f"峰值内存 {run['peak_rss_mb']}MB"
+            )
+        results["mock_server_stats"] = dict(server.stats)
+
+    _save_and_compare(results, args)
+
+
+def _run_connection_benchmarks(args) -> List[Dict]:
+    from mock_openai_server import MockOpenAIServer
+
+    with tempfile.TemporaryDirectory() as cert_dir:
+        certfile, keyfile = make_self_signed_cert(cert_dir) if args.tls else (None, None)
+        verify = ssl.create_default_context(cafile=certfile) if certfile else True
+        with MockOpenAIServer(latency=args.latency, jitter=args.jitter, seed=args.seed,
+                              certfile=certfile, keyfile=keyfile) as server:
+            runs = run_connection_benchmark(server, requests=args.requests, concurrency=args.concurrency,
+                                            verify=verify)
+
+    for run in runs:
+        logger.info(
+            f"  {run['transport']}: {run['connections']} 个连接, 单请求 p50 {run['request_p50_ms']}ms / "
+            f"p95 {run['request_p95_ms']}ms, {run['requests_per_second']} 请求/秒"
+        )
+    logger.info(f"  每个请求新建连接平均多耗时 {runs[0]['connection_overhead_ms']}ms")
+    return runs
+
+
+def _run_fetch_benchmarks(args, sizes: List[int]) -> List[Dict]:
+    from arxiv_replay import ArxivReplayServer
+
+    def run(cassette_dir: str) -> List[Dict]:
+        if not args.replay_http:
+            return run_fetch_benchmark(cassette_dir)
+        with ArxivReplayServer(cassette_dir) as replay_server:
+            return run_fetch_benchmark(cassette_dir, api_url=replay_server.api_url)
+
+    if args.cassette_dir:
+        runs = run(args.cassette_dir)
+    else:
+        runs = []
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as cassette_dir:
+                write_synthetic_cassette(cassette_dir, size, seed=args.seed)
+                runs.extend(run(cassette_dir))
+
+    for run_result in runs:
+        logger.info(
+            f"  {run_result['size']} 篇: 总体 {run_result['papers_per_second']} 篇/秒 "
+            f"(获取+解析 {run_result['fetch_seconds']}s, 过滤 {run_result['filter_seconds']}s, "
+            f"去重 {run_result['dedup_seconds']}s)"
+        )
+    return runs
+
+
+def _save_and_compare(results: Dict, args):
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    logger.info(f"基准测试结果已保存: {output_path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\n与基线对比 ({args.compare}):")
+        regressions = compare_results(results, baseline)
+        if regressions:
+            logger.warning(f"发现 {len(regressions)} 项性能回归")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+LLM请求的自适应并发控制（AIMD）：延迟稳定且并发已用满时逐步增加同时进行的请求数，
+遇到429/5xx或超时时成倍减少，使流水线在服务商延迟和限流变化时自动保持在可持续的最高吞吐
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Optional
+
+from loguru import logger
+
+from instrumentation import incr
+from metrics import set_llm_concurrency
+
+
+CONCURRENCY_MODES = ("adaptive", "fixed")
+
+_settings = {
+    # adaptive：按延迟和错误自动调整并发数；fixed：并发数固定为 max_limit
+    "mode": os.environ.get("LLM_CONCURRENCY") or "adaptive",
+    "initial_limit": int(os.environ.get("LLM_INITIAL_CONCURRENCY") or 2),
+    "min_limit": int(os.environ.get("LLM_MIN_CONCURRENCY") or 1),
+    "max_limit": int(os.environ.get("LLM_MAX_CONCURRENCY") or 16),
+}
+
+# 出现过载时并发数乘以该系数
+BACKOFF_RATIO = 0.5
+# 请求耗时不超过近期最小耗时的该倍数时视为延迟稳定
+LATENCY_TOLERANCE = 2.0
+# 计算近期最小耗时的样本数
+LATENCY_WINDOW = 100
+
+_limiter: Optional['AdaptiveConcurrencyLimiter'] = None
+_limiter_lock = threading.Lock()
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """429、5xx和超时说明服务端已过载，其他错误（如400）与并发数无关"""
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code == 429 or status_code >= 500
+    return isinstance(error, TimeoutError) or "Timeout" in type(error).__name__
+
+
+class _Slot:
+    """一次请求占用的并发名额"""
+
+    def __init__(self, epoch: int, saturated: bool):
+        self.epoch = epoch
+        self.saturated = saturated
+        self.start = time.perf_counter()
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD并发限制器
+
+    - 请求成功、耗时不超过近期最小耗时的 latency_tolerance 倍、且发起时并发已用满：
+      每个请求把上限增加 1/上限，即每轮（上限个请求）增加1
+    - 请求因429/5xx/超时失败：上限乘以 backoff_ratio，同一轮中并发失败的请求只减少一次
+    - 其他结果不调整上限
+
+    Args:
+        initial_limit: 初始并发数
+        min_limit: 最小并发数
+        max_limit: 最大并发数
+        adaptive: 为False时并发数固定为 max_limit
+        backoff_ratio: 过载时的缩减系数
+        latency_tolerance: 延迟稳定的判定倍数
+        window: 计算近期最小耗时的样本数
+    """
+
+    def __init__(self, initial_limit: int = 2, min_limit: int = 1, max_limit: int = 16, adaptive: bool = True,
+                 backoff_ratio: float = BACKOFF_RATIO, latency_tolerance: float = LATENCY_TOLERANCE,
+                 window: int = LATENCY_WINDOW):
+        if not 1 <= min_limit <= max_limit:
+            raise ValueError("并发数上下限必须满足 1 <= min_limit <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.adaptive = adaptive
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self._limit = float(min(max(initial_limit, min_limit), max_limit)) if adaptive else float(max_limit)
+        self._inflight = 0
+        self._epoch = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._cond = threading.Condition()
+        set_llm_concurrency(self.limit, 0)
+
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return int(self._limit)
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    def acquire(self) -> _Slot:
+        """等待并占用一个并发名额"""
+        with self._cond:
+            while self._inflight >= self.limit:
+                self._cond.wait()
+            self._inflight += 1
+            set_llm_concurrency(self.limit, self._inflight)
+            return _Slot(self._epoch, self._inflight >= self.limit)
+
+    def release(self, slot: _Slot, outcome: str):
+        """
+        释放并发名额并按请求结果调整上限
+
+        Args:
+            slot: acquire 返回的名额
+            outcome: success / overload / error
+        """
+        latency = time.perf_counter() - slot.start
+        with self._cond:
+            self._inflight -= 1
+            if self.adaptive:
+                self._adjust(slot, outcome, latency)
+            set_llm_concurrency(self.limit, self._inflight)
+            self._cond.notify_all()
+
+    def _adjust(self, slot: _Slot, outcome: str, latency: float):
+        if outcome == "overload":
+            # 上次缩减之后发起的请求才会再次触发缩减
+            if slot.epoch == self._epoch:
+                previous = self.limit
+                self._limit = max(float(self.min_limit), self._limit * self.backoff_ratio)
+                self._epoch += 1
+                incr("llm_concurrency_decreases")
+                logger.warning(f"LLM服务过载，并发数 {previous} -> {self.limit}")
+        elif outcome == "success":
+            self._latencies.append(latency)
+            stable = latency <= min(self._latencies) * self.latency_tolerance
+            if stable and slot.saturated and self._limit < self.max_limit:
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+                incr("llm_concurrency_increases")
+
+    @contextmanager
+    def slot(self):
+        """在代码块执行期间占用一个并发名额，按代码块是否抛出过载异常调整上限"""
+        slot = self.acquire()
+        outcome = "error"
+        try:
+            yield slot
+            outcome = "success"
+        except BaseException as e:
+            if is_overload_error(e):
+                outcome = "overload"
+            raise
+        finally:
+            self.release(slot, outcome)
+
+
+def configure_concurrency(mode: Optional[str] = None, initial_limit: Optional[int] = None,
+                          min_limit: Optional[int] = None, max_limit: Optional[int] = None):
+    """设置LLM并发控制参数并重建全局限制器，参数为None时保持原值"""
+    global _limiter
+    if mode is not None:
+        if mode not in CONCURRENCY_MODES:
+            raise ValueError(f"不支持的并发控制模式: {mode}")
+        _settings["mode"] = mode
+    for key, value in (("initial_limit", initial_limit), ("min_limit", min_limit), ("max_limit", max_limit)):
+        if value is not None:
+            if value <= 0:
+                raise ValueError(f"{key} 必须大于0")
+            _settings[key] = value
+    with _limiter_lock:
+        _limiter = None
+
+
+def get_limiter() -> AdaptiveConcurrencyLimiter:
+    """获取全局LLM并发限制器（所有LLM请求共享）"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AdaptiveConcurrencyLimiter(
+                initial_limit=_settings["initial_limit"],
+                min_limit=_settings["min_limit"],
+                max_limit=_settings["max_limit"],
+                adaptive=_settings["mode"] == "adaptive",
+            )
+        return _limiter
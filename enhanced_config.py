@@ -335,20 +335,131 @@ ENHANCED_EXTRACTION_PROMPT_TEMPLATE = """你是一个专业的学术论文分析
 6. 所有回复必须使用中文
 """
 
+# 全文模式下附加在分析提示词之后的全文节选
+FULLTEXT_EXCERPT_PROMPT_TEMPLATE = """
+全文节选（实验/数据集相关章节）：
+{excerpt}
+
+请优先根据以上全文节选填写 training_dataset、testing_dataset 和 evaluation_metrics。
+"""
+
+# 各分析字段的说明，用于只重新提取部分字段
+ENHANCED_FIELD_DESCRIPTIONS = {
+    "task_category": "从给定分类表中选择最匹配的类别，如无法匹配则返回'未分类'",
+    "methods": "论文使用的主要方法和技术（简洁描述，不超过200字）",
+    "contributions": "论文的主要贡献和创新点（简洁描述，不超过200字）",
+    "training_dataset": "训练使用的数据集名称（如果有多个，用逗号分隔）",
+    "testing_dataset": "测试/评估使用的数据集名称（如果有多个，用逗号分隔）",
+    "evaluation_metrics": "使用的评估指标（如果有多个，用逗号分隔）",
+    "confidence": "分类置信度，范围0-1，表示对任务分类的确信程度",
+    "research_field": "研究领域（如机器学习、计算机视觉、自然语言处理等）",
+    "novelty_score": "创新性评分，范围1-5，5表示非常创新"
+}
+
+# 只依赖任务分类表的字段：分类表变化时只需重新提取这些字段
+TAXONOMY_DEPENDENT_FIELDS = ("task_category", "confidence")
+
+# 部分字段重新提取提示词模板
+ENHANCED_PARTIAL_EXTRACTION_PROMPT_TEMPLATE = """你是一个专业的学术论文分析专家。请仔细分析以下论文，只提取指定的字段。
+
+论文标题：{title}
+论文摘要：{abstract}
+
+请按照以下JSON格式输出分析结果：
+{fields_spec}
+
+任务分类表：
+{classification_table}
+
+分析要求：
+1. 如果论文涉及多个任务类别，选择最主要的一个
+2. 只输出上面列出的字段，并确保输出是有效的JSON格式
+3. 所有回复必须使用中文
+"""
+
+# 全文map-reduce分析：map阶段附加在分析提示词之后的全文片段
+ENHANCED_MAP_CHUNK_PROMPT_TEMPLATE = """
+全文片段（第{index}/{total}段）：
+{chunk}
+
+以上只是论文全文的一个片段。请根据标题、摘要和本片段填写各字段，本片段没有涉及的数据集、评估指标填写"未明确说明"。
+"""
+
+# 全文map-reduce分析：reduce阶段把各片段的提取结果合并为一份分析结果
+ENHANCED_REDUCE_PROMPT_TEMPLATE = """你是一个专业的学术论文分析专家。以下是对同一篇论文全文的各个片段分别提取的结构化信息，请合并为一份完整的分析结果。
+
+论文标题：{title}
+论文摘要：{abstract}
+
+各片段的提取结果：
+{partials}
+
+请按照以下JSON格式输出合并后的分析结果：
+{fields_spec}
+
+任务分类表：
+{classification_table}
+
+合并要求：
+1. 数据集和评估指标取各片段结果的并集，去掉重复项和"未明确说明"，全部片段都未说明时填写"未明确说明"
+2. 方法和贡献综合各片段的描述，各不超过200字
+3. 任务类别从分类表中选择最主要的一个，置信度和创新性评分综合各片段的判断
+4. 请确保输出是有效的JSON格式
+5. 所有回复必须使用中文
+"""
+
+# 仅重新分类的轻量提示词模板：只发送标题、一句话摘要和分类表
+ENHANCED_RECLASSIFY_PROMPT_TEMPLATE = """请根据论文标题和一句话摘要，从任务分类表中选择最匹配的类别。
+
+论文标题：{title}
+一句话摘要：{summary}
+
+任务分类表：
+{classification_table}
+
+只输出JSON：{{"task_category": "类别名称，无法匹配则为'未分类'", "confidence": 0到1之间的置信度}}
+"""
+
 # 分类表格式化函数
-def format_enhanced_classification_table(custom_categories=None):
-    """将增强版分类表格式化为字符串"""
+def _merge_task_categories(custom_categories=None):
+    """合并默认分类和自定义分类"""
     categories = ENHANCED_TASK_CATEGORIES.copy()
     
     # 添加自定义分类
     if custom_categories:
         categories.update(custom_categories)
+    return categories
+
+def format_enhanced_classification_table(custom_categories=None):
+    """将增强版分类表格式化为字符串"""
+    categories = _merge_task_categories(custom_categories)
     
     formatted = ""
     for category, info in categories.items():
         formatted += f"- {category}: {info['definition']}\n"
     return formatted
 
+def format_compact_classification_table(custom_categories=None, max_definition_chars=40):
+    """
+    将分类表压缩为短代码形式，减少提示词token
+    
+    Returns:
+        (格式化后的分类表字符串, {类别代码: 类别名称})
+    """
+    categories = _merge_task_categories(custom_categories)
+    
+    formatted = ""
+    code_map = {}
+    for index, (category, info) in enumerate(categories.items(), 1):
+        code = f"C{index:02d}"
+        code_map[code] = category
+        definition = info['definition'].replace("\n", " ")
+        if len(definition) > max_definition_chars:
+            definition = definition[:max_definition_chars] + "…"
+        formatted += f"{code} {category}: {definition}\n"
+    formatted += "（task_category 请直接填写类别代码，如 C01；无法匹配则填写'未分类'）\n"
+    return formatted, code_map
+
 def get_preset_config(preset_name):
     """获取预设配置"""
     return PRESET_CONFIGS.get(preset_name, None)
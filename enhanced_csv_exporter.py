@@ -8,6 +8,7 @@ from typing import List, Dict
 from datetime import datetime
 from loguru import logger
 from enhanced_paper_analyzer import EnhancedPaperAnalysis
+from instrumentation import timed
 
 
 class EnhancedCSVExporter:
@@ -33,6 +34,7 @@ class EnhancedCSVExporter:
             "Novelty_Score"
         ]
     
+    @timed("export.csv")
     def export_to_csv(self, analyses: List[EnhancedPaperAnalysis], output_dir: str = "output") -> str:
         """
         将分析结果导出为CSV文件
@@ -90,6 +92,7 @@ class EnhancedCSVExporter:
             logger.error(f"导出CSV文件失败: {str(e)}")
             raise
     
+    @timed("export.print_summary")
     def print_summary(self, analyses: List[EnhancedPaperAnalysis]):
         """
         打印分析结果摘要
@@ -155,6 +158,7 @@ class EnhancedCSVExporter:
         
         logger.info("=" * 60)
     
+    @timed("export.summary_stats")
     def export_summary_stats(self, analyses: List[EnhancedPaperAnalysis], output_dir: str = "output") -> str:
         """
         导出详细统计摘要到CSV文件
@@ -251,6 +255,7 @@ class EnhancedCSVExporter:
             logger.error(f"导出统计摘要失败: {str(e)}")
             raise
     
+    @timed("export.high_novelty")
     def export_high_novelty_papers(self, analyses: List[EnhancedPaperAnalysis], 
                                    output_dir: str = "output", min_score: int = 4) -> str:
         """
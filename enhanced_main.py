@@ -3,27 +3,40 @@
 支持用户自定义检索词、时间区间、研究领域和任务分类
 """
 
-import arxiv
 import argparse
 import os
 import sys
 import json
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 from loguru import logger
-from tqdm import tqdm
-from typing import List, Dict, Optional
+from dataclasses import dataclass, field
+from typing import Callable, List, Dict, Optional, TYPE_CHECKING
 
-# 加载环境变量
-load_dotenv(override=True)
 os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 # 导入自定义模块
-from enhanced_paper import EnhancedArxivPaper
-from llm import set_global_llm
+# arxiv、openai、numpy、tqdm等较重的依赖只在需要它们的阶段才导入，
+# 使 --help、配置和报告等短命令快速启动（见 benchmark.py --startup）
+from llm import configure_streaming, set_global_llm
 from enhanced_paper_analyzer import EnhancedPaperAnalyzer
 from enhanced_csv_exporter import EnhancedCSVExporter
 from user_config import UserConfig, load_user_config, save_user_config
+from results_store import ResultsStore
+from enhanced_config import TAXONOMY_DEPENDENT_FIELDS
+from prompt_builder import PromptBudget
+from instrumentation import RunProfiler, get_instrumentation, incr, span, timed, write_run_info
+from metrics import MetricsExporter
+from arxiv_replay import REPLAY_MODES, configure_arxiv_replay
+from concurrency_limiter import CONCURRENCY_MODES, configure_concurrency
+from llm_transport import configure_transport
+from query_planner import configure_query_planner, plan_query, search_plan
+from result_normalizer import configure_normalizer
+from retry_policy import configure_retry
+from search_executor import SearchOutcome, cs_filter_for, execute_search
+
+if TYPE_CHECKING:
+    from enhanced_paper import EnhancedArxivPaper
+    from seen_filter import SeenFilter
 
 # arXiv主要研究领域分类
 ARXIV_CATEGORIES = {
@@ -51,6 +64,17 @@ CS_SUBCATEGORIES = {
     "cs.SI": "社会与信息网络 (Social and Information Networks)"
 }
 
+# 命令行参数的默认值，进程内入口（quick_start、generate_github_config）也使用相同的默认值
+DEFAULT_DEDUP_THRESHOLD = 0.8
+DEFAULT_PROMPT_TOKEN_BUDGET = 2000
+DEFAULT_MAX_PROMPT_AUTHORS = 10
+
+
+def make_prompt_budget(max_tokens: int = DEFAULT_PROMPT_TOKEN_BUDGET,
+                       max_authors: int = DEFAULT_MAX_PROMPT_AUTHORS) -> PromptBudget:
+    """按 --prompt_token_budget / --max_prompt_authors 构建提示词预算，不传参数时与命令行默认值相同"""
+    return PromptBudget(max_tokens=max_tokens, max_authors=max_authors)
+
 
 def interactive_setup() -> UserConfig:
     """交互式设置用户配置"""
@@ -109,7 +133,9 @@ def interactive_setup() -> UserConfig:
     print(f"\n4. 任务分类配置")
     print(f"当前自定义任务数量: {len(config.custom_task_categories)}")
     
+    categories_changed = False
     if input("是否修改任务分类? (y/n): ").lower() == 'y':
+        categories_changed = True
         print("选择任务分类模式:")
         print("1. 使用默认分类")
         print("2. 添加自定义分类")
@@ -157,6 +183,9 @@ def interactive_setup() -> UserConfig:
     save_user_config(config)
     print(f"\n配置已保存到 {UserConfig.CONFIG_FILE}")
     
+    if categories_changed:
+        print("提示: 任务分类已修改，可运行 `python enhanced_main.py reclassify` 只对已分析的论文重新分类")
+    
     return config
 
 
@@ -182,8 +211,26 @@ def build_search_query(config: UserConfig) -> str:
     return " AND ".join(query_parts)
 
 
-def search_papers_with_config(config: UserConfig) -> List[EnhancedArxivPaper]:
-    """根据用户配置搜索论文"""
+def search_papers_with_config(config: UserConfig, seen: Optional['SeenFilter'] = None) -> List['EnhancedArxivPaper']:
+    """
+    根据用户配置搜索论文
+    
+    Args:
+        config: 用户配置
+        seen: 已处理论文过滤器，提供时跳过已分析过的论文，max_papers 只计新论文
+              （拆分为多个子查询时各子查询在翻页时跳过，合并后同样计满 max_papers 篇新论文）
+    """
+    return search_with_config(config, seen=seen).papers
+
+
+@timed("search")
+def search_with_config(config: UserConfig, seen: Optional['SeenFilter'] = None) -> SearchOutcome:
+    """
+    同 search_papers_with_config，返回SearchOutcome：exhausted 表示时间范围内的结果已全部取回，
+    没有因达到 max_papers 或翻页上限而提前停止
+    """
+    from enhanced_paper import EnhancedArxivPaper
+    
     query = build_search_query(config)
     
     logger.info(f"搜索查询: {query}")
@@ -191,47 +238,236 @@ def search_papers_with_config(config: UserConfig) -> List[EnhancedArxivPaper]:
     logger.info(f"研究领域: {', '.join(config.research_categories)}")
     logger.info(f"时间范围: {config.start_date} 到 {config.end_date}")
     
-    client = arxiv.Client(num_retries=10, delay_seconds=3)
-    search = arxiv.Search(
-        query=query,
-        max_results=config.max_papers,
-        sort_by=arxiv.SortCriterion.SubmittedDate,
-        sort_order=arxiv.SortOrder.Descending
-    )
-    
-    papers = []
+    # 研究领域全部为cs.*时，cat:子句已保证结果属于计算机科学，不需要再在本地过滤；
+    # 混合了其他学科时逐篇检查，凑够 max_papers 篇计算机科学相关论文后停止翻页
+    cs_filter = cs_filter_for(config.research_categories)
     logger.info(f"正在检索论文，最大数量: {config.max_papers}")
     
     try:
-        with tqdm(desc="检索论文") as pbar:
-            for result in client.results(search):
-                paper = EnhancedArxivPaper(result)
-                papers.append(paper)
-                pbar.update(1)
-                
-                if len(papers) >= config.max_papers:
-                    break
+        # 检索词/研究领域过多或结果数超过arXiv结果窗口时拆分为多个子查询并发执行
+        with span("search.plan"):
+            plan = plan_query(config)
+        
+        with span("search.arxiv_paging"):
+            skip = seen.contains_result if seen is not None else None
+            if plan.is_split:
+                outcome = search_plan(plan, predicate=cs_filter, skip=skip)
+            else:
+                outcome = execute_search(query, config.max_papers, EnhancedArxivPaper, predicate=cs_filter, skip=skip)
                     
     except Exception as e:
         logger.error(f"搜索论文时出错: {str(e)}")
         raise
     
-    logger.info(f"搜索完成，找到 {len(papers)} 篇论文")
+    incr("papers_fetched", outcome.fetched)
+    incr("papers_filtered_out", outcome.fetched - outcome.matched)
+    logger.info(f"搜索完成，获取 {outcome.fetched} 篇论文，其中 {outcome.matched} 篇符合条件")
+    return outcome
+
+
+def reanalyze_stored_results(config: UserConfig, output_dir: str, full: bool = False,
+                             prompt_budget: Optional[PromptBudget] = None, fulltext=None) -> List:
+    """
+    重新分析输入指纹（提示词模板、分类表、模型）与当前不一致的已存储结果
     
-    # 过滤非计算机科学相关论文（如果用户选择了计算机科学领域）
-    if any(cat.startswith('cs') for cat in config.research_categories):
-        filtered_papers = []
-        for paper in papers:
-            # 检查论文是否与计算机科学相关
-            if paper.is_cs_related():
-                filtered_papers.append(paper)
-            else:
-                logger.debug(f"跳过非计算机科学论文: {paper.title}")
+    只有分类表变化时只重新提取依赖分类表的字段，否则重新完整分析。
+    
+    Args:
+        config: 用户配置
+        output_dir: 输出目录（结果存储所在目录）
+        full: 是否总是重新完整分析
+        prompt_budget: 提示词token预算
+        fulltext: FullTextExtractor对象（全文模式）
         
-        logger.info(f"过滤后剩余 {len(filtered_papers)} 篇计算机科学相关论文")
-        return filtered_papers
+    Returns:
+        更新后的EnhancedPaperAnalysis列表
+    """
+    from tqdm import tqdm
+    
+    store = ResultsStore.for_output_dir(output_dir)
+    analyzer = EnhancedPaperAnalyzer(config, prompt_budget=prompt_budget, fulltext=fulltext)
+    fingerprint = analyzer.input_fingerprint()
+    stale = store.find_stale(fingerprint)
+    
+    logger.info(f"结果存储共 {store.count()} 篇论文，其中 {len(stale)} 篇需要重新分析")
     
-    return papers
+    updated = []
+    for arxiv_id, changed in tqdm(stale.items(), desc="重新分析"):
+        paper = store.load_paper(arxiv_id)
+        if full or changed != ["taxonomy_hash"]:
+            analysis = analyzer.analyze_paper(paper)
+        else:
+            analysis = analyzer.reextract_fields(paper, store.get_analysis(arxiv_id), list(TAXONOMY_DEPENDENT_FIELDS))
+        
+        if analysis is None:
+            logger.warning(f"重新分析失败: {paper.title}")
+            continue
+        store.save_analysis(paper, analysis, fingerprint)
+        updated.append(analysis)
+    
+    logger.info(f"重新分析完成，更新 {len(updated)}/{len(stale)} 篇论文")
+    return updated
+
+
+def reclassify_stored_results(config: UserConfig, output_dir: str, all_papers: bool = False) -> int:
+    """
+    分类表变化后的快速重新分类：只发送标题、缓存的一句话摘要和新分类表，
+    原地更新结果存储中的 task_category 和 confidence
+    
+    Args:
+        config: 用户配置
+        output_dir: 输出目录（结果存储所在目录）
+        all_papers: 是否重新分类全部论文（默认只处理分类表指纹变化的论文）
+        
+    Returns:
+        更新的论文数量
+    """
+    from tqdm import tqdm
+    
+    store = ResultsStore.for_output_dir(output_dir)
+    analyzer = EnhancedPaperAnalyzer(config)
+    fingerprint = analyzer.input_fingerprint()
+    stale = store.find_stale({**fingerprint, "taxonomy_hash": None} if all_papers else fingerprint)
+    targets = [arxiv_id for arxiv_id, changed in stale.items() if "taxonomy_hash" in changed]
+    
+    logger.info(f"需要重新分类 {len(targets)} 篇论文")
+    
+    updated = 0
+    for arxiv_id in tqdm(targets, desc="重新分类"):
+        cached = store.get_one_line_summary(arxiv_id)
+        if cached is None:
+            continue
+        result = analyzer.reclassify(cached["title"], cached["one_line_summary"])
+        if result is None:
+            continue
+        store.update_classification(arxiv_id, result["task_category"], result["confidence"],
+                                    fingerprint["taxonomy_hash"])
+        updated += 1
+    
+    logger.info(f"重新分类完成，更新 {updated}/{len(targets)} 篇论文")
+    return updated
+
+
+@dataclass
+class PipelineResult:
+    """一次检索+分析流程的结果"""
+    analyses: List = field(default_factory=list)
+    csv_path: Optional[str] = None
+    summary_path: Optional[str] = None
+    papers_found: int = 0
+    # 检索是否取回了时间范围内的全部结果（调度器据此推进水位线）
+    search_exhausted: bool = False
+
+
+def run_pipeline(config: UserConfig, output_dir: str = "output", dedup_threshold: float = DEFAULT_DEDUP_THRESHOLD,
+                 prompt_budget: Optional[PromptBudget] = None, skip_seen: bool = False,
+                 fulltext=None, progress: Optional[Callable[[str, Dict], None]] = None) -> PipelineResult:
+    """
+    按用户配置执行完整流程：检索、去重、分析、保存到结果存储、导出CSV/统计摘要并汇总趋势数据
+    
+    可在进程内直接调用（如quick_start的预设配置），多次调用共享已初始化的LLM客户端。
+    调用前需要先通过 set_global_llm() 设置LLM。
+    
+    Args:
+        config: 用户配置
+        output_dir: 输出目录
+        dedup_threshold: 近似重复论文的相似度阈值
+        prompt_budget: 提示词token预算
+        skip_seen: 跳过输出目录结果存储中已分析过的论文（增量运行）
+        fulltext: FullTextExtractor对象，提供时分析提示词附加实验/数据集相关章节的全文节选
+        progress: 进度回调 (阶段, 数据)，阶段为 searched / analyzed / exported
+        
+    Returns:
+        PipelineResult对象，没有检索到或没有成功分析论文时 analyses 为空
+    """
+    seen = None
+    if skip_seen:
+        from seen_filter import SeenFilter
+        seen = SeenFilter.for_output_dir(output_dir)
+    
+    # 搜索论文
+    outcome = search_with_config(config, seen=seen)
+    papers = outcome.papers
+    result = PipelineResult(papers_found=len(papers), search_exhausted=outcome.exhausted)
+    if progress:
+        progress("searched", {"papers_found": len(papers)})
+    
+    if not papers:
+        logger.warning("未找到符合条件的论文")
+        return result
+    
+    # 去重：同一论文的多个版本和近似重复论文只分析一次
+    from paper_dedup import deduplicate_papers, expand_duplicate_analyses
+    with span("dedup"):
+        dedup_result = deduplicate_papers(papers, threshold=dedup_threshold)
+    
+    # 分析论文
+    analyzer = EnhancedPaperAnalyzer(config, prompt_budget=prompt_budget, fulltext=fulltext)
+    analyses = analyzer.analyze_papers_batch(dedup_result.representatives, progress=progress)
+    analyses = expand_duplicate_analyses(analyses, dedup_result)
+    
+    if not analyses:
+        logger.warning("没有成功分析的论文")
+        return result
+    
+    export_pipeline_results(papers, analyses, analyzer.input_fingerprint(), output_dir, result, seen=seen)
+    if progress:
+        progress("exported", {"analyzed": len(result.analyses), "csv_path": result.csv_path})
+    return result
+
+
+def export_pipeline_results(papers: List['EnhancedArxivPaper'], analyses: List, fingerprint: Dict[str, str],
+                            output_dir: str, result: PipelineResult,
+                            seen: Optional['SeenFilter'] = None) -> PipelineResult:
+    """
+    保存分析结果到结果存储，导出CSV/统计摘要并汇总趋势数据，输出文件路径写入 result
+    
+    Args:
+        papers: 检索到的论文列表
+        analyses: 分析结果列表
+        fingerprint: 分析输入指纹
+        output_dir: 输出目录
+        result: 需要填充的PipelineResult
+        seen: 已处理论文过滤器，为None时若输出目录下已有过滤器文件也会同步更新
+    """
+    result.analyses = analyses
+    
+    # 保存到结果存储，并记录输入指纹以便后续增量重新分析
+    with span("results_store.save"):
+        store = ResultsStore.for_output_dir(output_dir)
+        store.save_analyses(papers, analyses, fingerprint)
+        
+        from seen_filter import SeenFilter
+        if seen is None and os.path.exists(os.path.join(output_dir, SeenFilter.FILE_NAME)):
+            seen = SeenFilter.for_output_dir(output_dir, store=store)
+        if seen is not None:
+            analyzed_urls = {analysis.arxiv_url for analysis in analyses}
+            seen.add_papers(paper for paper in papers if paper.entry_id in analyzed_urls)
+    
+    # 导出结果
+    exporter = EnhancedCSVExporter()
+    
+    # 导出详细分析结果
+    result.csv_path = exporter.export_to_csv(analyses, output_dir)
+    
+    # 导出统计摘要
+    result.summary_path = exporter.export_summary_stats(analyses, output_dir)
+    
+    # 汇总到跨运行趋势数据（以CSV文件名为数据源，报告生成时不再重复读取）
+    with span("export.trends"):
+        from trend_analytics import TrendStore
+        trend_store = TrendStore(os.path.join(output_dir, "trends"))
+        trend_store.ingest_analyses(analyses, source=os.path.basename(result.csv_path))
+        trend_store.save()
+    
+    # 打印摘要
+    exporter.print_summary(analyses)
+    
+    logger.success("分析完成！")
+    logger.info(f"详细结果文件: {result.csv_path}")
+    if result.summary_path:
+        logger.info(f"统计摘要文件: {result.summary_path}")
+    return result
 
 
 def setup_argument_parser():
@@ -257,6 +493,14 @@ def setup_argument_parser():
                 env_value = kwargs.get('type')(env_value)
             parser.set_defaults(**{arg_full_name: env_value})
     
+    # 子命令：run（默认，检索并分析）/ reanalyze（只重新分析输入指纹发生变化的已存储结果）
+    # / reclassify（分类表变化后只重新分类已存储结果）/ batch（多个预设配置共享一次检索和分析）
+    # / serve（常驻HTTP服务）/ schedule（按调度配置周期性增量检索与分析）
+    # / enqueue（检索论文加入工作队列）/ worker（从工作队列领取论文分析）
+    parser.add_argument('command', nargs='?', default='run',
+                        choices=['run', 'reanalyze', 'reclassify', 'batch', 'serve', 'schedule', 'enqueue', 'worker'],
+                        help='运行模式')
+    
     # 必需参数
     add_argument('--openai_api_key', type=str, help='OpenAI API密钥', required=False)
     add_argument('--openai_api_base', type=str, help='OpenAI API基础URL', 
@@ -267,12 +511,83 @@ def setup_argument_parser():
     add_argument('--output_dir', type=str, help='输出目录', default='output')
     add_argument('--debug', action='store_true', help='调试模式')
     add_argument('--skip_setup', action='store_true', help='跳过交互式配置，使用现有配置')
+    add_argument('--dedup_threshold', type=float, help='近似重复论文的相似度阈值（<=0时只合并同一论文的不同版本）',
+                default=DEFAULT_DEDUP_THRESHOLD)
+    add_argument('--full_reanalyze', action='store_true', help='reanalyze时总是重新提取全部字段')
+    add_argument('--reclassify_all', action='store_true', help='reclassify时重新分类全部已存储论文')
+    add_argument('--prompt_token_budget', type=int, help='每篇论文的提示词token预算（<=0时使用完整提示词）',
+                default=DEFAULT_PROMPT_TOKEN_BUDGET)
+    add_argument('--max_prompt_authors', type=int, help='提示词中最多保留的作者数量',
+                default=DEFAULT_MAX_PROMPT_AUTHORS)
+    add_argument('--profile', action='store_true', help='对整次运行做性能剖析，结果保存到输出目录')
+    add_argument('--profiler', type=str, help='性能剖析器', default='cprofile', choices=RunProfiler.SUPPORTED)
+    add_argument('--metrics_port', type=int, help='Prometheus指标HTTP端口（0表示不启动）', default=0)
+    add_argument('--metrics_textfile', type=str, help='Prometheus textfile collector 文件路径（为空时不写入）',
+                default='')
+    add_argument('--arxiv_replay_mode', type=str, help='arXiv检索录制/回放模式', default='off',
+                choices=REPLAY_MODES)
+    add_argument('--arxiv_replay_dir', type=str, help='arXiv检索录制文件目录', default='output/arxiv_cassettes')
+    add_argument('--query_max_keywords', type=int, help='单个arXiv子查询最多包含的检索词数量', default=8)
+    add_argument('--query_max_categories', type=int, help='单个arXiv子查询最多包含的研究领域数量', default=4)
+    add_argument('--query_result_window', type=int, help='单个arXiv查询能可靠取回的结果数，超过时按日期拆分',
+                default=10000)
+    add_argument('--query_workers', type=int, help='并发执行arXiv子查询的线程数', default=3)
+    add_argument('--normalize_workers', type=int, help='规范化检索结果的进程数（0表示在翻页线程中直接处理，大批量检索时建议开启）', default=0)
+    add_argument('--normalize_batch_size', type=int, help='每批交给规范化进程池的检索结果数', default=100)
+    add_argument('--llm_concurrency', type=str, choices=CONCURRENCY_MODES, default='adaptive',
+                 help='LLM并发控制：adaptive 按延迟和429/5xx/超时自动调整同时进行的请求数；fixed 固定为最大并发数')
+    add_argument('--llm_initial_concurrency', type=int, help='自适应并发控制的初始并发数', default=2)
+    add_argument('--llm_min_concurrency', type=int, help='自适应并发控制的最小并发数', default=1)
+    add_argument('--llm_max_concurrency', type=int, help='LLM最大并发数（fixed模式下的固定并发数）', default=16)
+    add_argument('--llm_max_attempts', type=int, help='每次LLM调用最多的尝试次数（含第一次）', default=5)
+    add_argument('--llm_retry_base_delay', type=float, help='LLM重试指数退避的基础等待时间（秒）', default=1.0)
+    add_argument('--llm_retry_max_delay', type=float, help='LLM重试等待时间上限（秒）', default=60.0)
+    add_argument('--llm_retry_budget_ratio', type=float, help='整次运行的LLM重试次数占请求次数的比例上限', default=0.2)
+    add_argument('--llm_circuit_threshold', type=int, help='LLM服务连续失败多少次后暂停所有请求（断路器打开）', default=5)
+    add_argument('--llm_circuit_reset_seconds', type=float, help='断路器打开后等待多久放行探测请求（秒）', default=30.0)
+    add_argument('--llm_max_connections', type=int, help='LLM共享连接池大小（0表示与LLM最大并发数一致）', default=0)
+    add_argument('--llm_keepalive_expiry', type=float, help='LLM空闲连接保持时间（秒）', default=60.0)
+    add_argument('--llm_http2', action='store_true', help='LLM请求使用HTTP/2（需要安装h2）')
+    add_argument('--llm_connect_timeout', type=float, help='LLM请求的连接超时（秒）', default=10.0)
+    add_argument('--llm_read_timeout', type=float, help='LLM请求的读取超时（秒）', default=180.0)
+    add_argument('--llm_stream', action='store_true',
+                 help='流式分析：完整的JSON结果到达后立即关闭流，不等待模型输出多余内容')
+    add_argument('--skip_seen', action='store_true', help='增量运行：跳过输出目录中已分析过的论文（同一版本）')
+    add_argument('--fulltext', action='store_true', help='全文模式：下载PDF，把实验/数据集相关章节附加到分析提示词')
+    add_argument('--fulltext_cache_dir', type=str, help='全文模式的PDF/文本缓存目录', default='output/fulltext_cache')
+    add_argument('--fulltext_max_tokens', type=int, help='每篇论文全文节选的token上限', default=1500)
+    add_argument('--fulltext_workers', type=int, help='PDF文本提取进程数（0表示按CPU数自动选择）', default=0)
+    add_argument('--fulltext_mode', type=str, choices=['excerpt', 'mapreduce'], default='excerpt',
+                 help='全文使用方式：excerpt 只附加实验/数据集章节节选；mapreduce 对全文逐段分析后合并')
+    add_argument('--map_chunk_tokens', type=int, help='mapreduce模式下每个全文片段的token上限', default=3000)
+    add_argument('--map_workers', type=int, help='mapreduce模式下并发分析片段的线程数', default=4)
+    add_argument('--serve_host', type=str, help='serve模式的监听地址', default='127.0.0.1')
+    add_argument('--serve_port', type=int, help='serve模式的监听端口', default=8000)
+    add_argument('--serve_job_workers', type=int, help='serve模式下同时执行的检索分析任务数', default=1)
+    add_argument('--schedule_file', type=str, help='schedule模式的调度配置文件', default='schedules.json')
+    add_argument('--schedule_once', action='store_true', help='schedule模式只运行一次到期的配置后退出（由cron等外部定时器触发时使用）')
+    add_argument('--queue_url', type=str, default='',
+                 help='工作队列地址：redis://... 使用Redis，否则为SQLite数据库路径（默认 <output_dir>/work_queue.db）')
+    add_argument('--queue_name', type=str, help='Redis工作队列的队列名（键前缀）', default='papers')
+    add_argument('--worker_threads', type=int, help='worker进程内并发分析的线程数', default=1)
+    add_argument('--worker_lease_seconds', type=float, help='worker领取任务的租约时长（秒），超时未确认的任务重新回到队列',
+                 default=600)
+    add_argument('--worker_max_attempts', type=int, help='每篇论文最多的尝试次数', default=3)
+    add_argument('--worker_forever', action='store_true', help='worker在队列为空时继续等待新任务（默认处理完即退出）')
+    add_argument('--queue_export', action='store_true', help='worker退出后把队列中已完成的论文导出为CSV/统计摘要')
+    add_argument('--batch_presets', type=str, help='batch模式运行的预设配置名（逗号分隔，all表示全部预设）',
+                default='all')
     
     return parser
 
 
 def main():
     """主函数"""
+    from dotenv import load_dotenv
+    
+    # 加载环境变量（在解析参数前，使环境变量可以作为参数默认值）
+    load_dotenv(override=True)
+    
     # 设置参数解析
     parser = setup_argument_parser()
     args = parser.parse_args()
@@ -286,14 +601,44 @@ def main():
         logger.remove()
         logger.add(sys.stdout, level="INFO")
     
+    configure_arxiv_replay(args.arxiv_replay_mode, args.arxiv_replay_dir)
+    configure_query_planner(max_keywords=args.query_max_keywords, max_categories=args.query_max_categories,
+                            result_window=args.query_result_window, workers=args.query_workers)
+    configure_normalizer(workers=args.normalize_workers, batch_size=args.normalize_batch_size)
+    configure_concurrency(mode=args.llm_concurrency, initial_limit=args.llm_initial_concurrency,
+                          min_limit=args.llm_min_concurrency, max_limit=args.llm_max_concurrency)
+    configure_retry(max_attempts=args.llm_max_attempts, base_delay=args.llm_retry_base_delay,
+                    max_delay=args.llm_retry_max_delay, budget_ratio=args.llm_retry_budget_ratio,
+                    circuit_threshold=args.llm_circuit_threshold, circuit_reset_seconds=args.llm_circuit_reset_seconds)
+    configure_transport(max_connections=args.llm_max_connections, keepalive_expiry=args.llm_keepalive_expiry,
+                        http2=args.llm_http2 or None, connect_timeout=args.llm_connect_timeout,
+                        read_timeout=args.llm_read_timeout)
+    configure_streaming(args.llm_stream or None)
+    
     # 验证API密钥
     if not args.openai_api_key:
         logger.error("必须提供OpenAI API密钥")
         sys.exit(1)
     
+    profiler = RunProfiler(args.profiler) if args.profile else None
+    metrics_exporter = MetricsExporter(port=args.metrics_port, textfile=args.metrics_textfile)
+    if metrics_exporter.enabled:
+        metrics_exporter.start()
+    
     try:
         # 交互式配置或加载现有配置
-        if args.skip_setup:
+        if args.command == 'batch':
+            from batch_runner import preset_user_config
+            from enhanced_config import PRESET_CONFIGS
+            names = list(PRESET_CONFIGS) if args.batch_presets == 'all' else \
+                [name.strip() for name in args.batch_presets.split(',') if name.strip()]
+            batch_configs = {name: preset_user_config(name) for name in names}
+            logger.info(f"批量运行预设配置: {', '.join(names)}")
+        elif args.command == 'schedule':
+            from scheduler import load_schedules
+            schedules = load_schedules(args.schedule_file)
+            logger.info(f"已登记 {len(schedules)} 个调度配置: {', '.join(entry.name for entry in schedules)}")
+        elif args.skip_setup or args.command in ('reanalyze', 'reclassify', 'serve', 'worker'):
             config = load_user_config()
             logger.info("使用现有配置")
         else:
@@ -309,37 +654,87 @@ def main():
             lang="Chinese"
         )
         
-        # 搜索论文
-        papers = search_papers_with_config(config)
+        prompt_budget = make_prompt_budget(args.prompt_token_budget, args.max_prompt_authors)
+        fulltext = None
+        if args.fulltext and args.fulltext_mode == 'mapreduce':
+            from mapreduce_extractor import MapReduceExtractor
+            fulltext = MapReduceExtractor(cache_dir=args.fulltext_cache_dir, chunk_tokens=args.map_chunk_tokens,
+                                          map_workers=args.map_workers, max_tokens=args.fulltext_max_tokens,
+                                          workers=args.fulltext_workers or None)
+        elif args.fulltext:
+            from fulltext import FullTextExtractor
+            fulltext = FullTextExtractor(cache_dir=args.fulltext_cache_dir, max_tokens=args.fulltext_max_tokens,
+                                         workers=args.fulltext_workers or None)
+        
+        if args.command == 'serve':
+            from service import AnalysisService
+            service = AnalysisService(config, args.output_dir, dedup_threshold=args.dedup_threshold,
+                                      prompt_budget=prompt_budget, fulltext=fulltext,
+                                      job_workers=args.serve_job_workers)
+            service.serve_forever(args.serve_host, args.serve_port)
+            return
         
-        if not papers:
-            logger.warning("未找到符合条件的论文")
+        if args.command == 'schedule':
+            from scheduler import Scheduler
+            scheduler = Scheduler(schedules, args.output_dir, dedup_threshold=args.dedup_threshold,
+                                  prompt_budget=prompt_budget, fulltext=fulltext)
+            scheduler.run(once=args.schedule_once)
             return
         
-        # 分析论文
-        analyzer = EnhancedPaperAnalyzer(config)
-        analyses = analyzer.analyze_papers_batch(papers)
+        if args.command in ('enqueue', 'worker'):
+            from work_queue import open_work_queue
+            queue = open_work_queue(args.queue_url, args.output_dir, name=args.queue_name)
+        
+        if args.command == 'enqueue':
+            from paper_dedup import deduplicate_papers
+            from work_queue import enqueue_papers
+            seen = None
+            if args.skip_seen:
+                from seen_filter import SeenFilter
+                seen = SeenFilter.for_output_dir(args.output_dir)
+            papers = search_papers_with_config(config, seen=seen)
+            enqueue_papers(queue, deduplicate_papers(papers, threshold=args.dedup_threshold).representatives)
+            logger.info(f"工作队列状态: {queue.stats()}")
+            return
         
-        if not analyses:
-            logger.warning("没有成功分析的论文")
+        if args.command == 'worker':
+            from work_queue import QueueWorker, export_queue_results
+            worker = QueueWorker(queue, config, args.output_dir, prompt_budget=prompt_budget, fulltext=fulltext,
+                                 threads=args.worker_threads, lease_seconds=args.worker_lease_seconds,
+                                 max_attempts=args.worker_max_attempts)
+            worker.run(exit_when_idle=not args.worker_forever)
+            if args.queue_export:
+                export_queue_results(queue, config, args.output_dir)
             return
         
-        # 导出结果
-        exporter = EnhancedCSVExporter()
+        if args.command == 'reanalyze':
+            updated = reanalyze_stored_results(config, args.output_dir, full=args.full_reanalyze,
+                                               prompt_budget=prompt_budget, fulltext=fulltext)
+            if updated:
+                # 导出存储中的全部最新结果
+                analyses = ResultsStore.for_output_dir(args.output_dir).all_analyses()
+                csv_path = EnhancedCSVExporter().export_to_csv(analyses, args.output_dir)
+                logger.info(f"更新后的结果文件: {csv_path}")
+            return
         
-        # 导出详细分析结果
-        csv_path = exporter.export_to_csv(analyses, args.output_dir)
+        if args.command == 'reclassify':
+            if reclassify_stored_results(config, args.output_dir, all_papers=args.reclassify_all):
+                analyses = ResultsStore.for_output_dir(args.output_dir).all_analyses()
+                csv_path = EnhancedCSVExporter().export_to_csv(analyses, args.output_dir)
+                logger.info(f"更新后的结果文件: {csv_path}")
+            return
         
-        # 导出统计摘要
-        summary_path = exporter.export_summary_stats(analyses, args.output_dir)
+        if profiler:
+            profiler.start()
         
-        # 打印摘要
-        exporter.print_summary(analyses)
+        if args.command == 'batch':
+            from batch_runner import run_batch
+            run_batch(batch_configs, args.output_dir, dedup_threshold=args.dedup_threshold,
+                      prompt_budget=prompt_budget, fulltext=fulltext)
+            return
         
-        logger.success("分析完成！")
-        logger.info(f"详细结果文件: {csv_path}")
-        if summary_path:
-            logger.info(f"统计摘要文件: {summary_path}")
+        run_pipeline(config, args.output_dir, dedup_threshold=args.dedup_threshold, prompt_budget=prompt_budget,
+                     skip_seen=args.skip_seen, fulltext=fulltext)
         
     except KeyboardInterrupt:
         logger.warning("用户中断程序执行")
@@ -349,6 +744,15 @@ def main():
         if args.debug:
             raise
         sys.exit(1)
+    finally:
+        if profiler:
+            profiler.stop(args.output_dir)
+        if metrics_exporter.enabled:
+            metrics_exporter.stop()
+        if args.command in ('run', 'batch') and get_instrumentation().snapshot()["stages"]:
+            # 各阶段耗时写入 run_info.json，便于定位慢在哪个阶段
+            get_instrumentation().log_summary()
+            write_run_info(args.output_dir)
 
 
 if __name__ == '__main__':
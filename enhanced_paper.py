@@ -2,19 +2,52 @@
 增强版论文类，包含作者信息和学校信息
 """
 
-from typing import Optional, List, Dict
-import arxiv
+from typing import Optional, List, Dict, TYPE_CHECKING
 import re
 from loguru import logger
 
+if TYPE_CHECKING:
+    import arxiv
+    from result_normalizer import PaperRecord
+
+
+CS_KEYWORDS = [
+    'computer', 'computing', 'algorithm', 'machine learning', 'deep learning',
+    'neural network', 'artificial intelligence', 'robotics', 'computer vision',
+    'natural language processing', 'data mining', 'software', 'programming',
+    'database', 'network', 'security', 'optimization', 'simulation'
+]
+
+
+def is_cs_related_text(categories: List[str], title: str, summary: str) -> bool:
+    """判断是否为计算机科学相关论文：属于cs.*分类，或标题/摘要包含计算机相关关键词"""
+    # 检查分类
+    if any(cat.startswith('cs.') for cat in categories):
+        return True
+    
+    # 检查标题和摘要中的关键词
+    text = (title + " " + summary).lower()
+    return any(keyword in text for keyword in CS_KEYWORDS)
+
 
 class EnhancedArxivPaper:
     """增强版arXiv论文类，包含作者和机构信息"""
     
-    def __init__(self, paper: arxiv.Result):
+    def __init__(self, paper: 'arxiv.Result'):
         self._paper = paper
         self.score = None
         self._author_affiliations = self._extract_author_affiliations()
+        # 由 from_record 填入的预先计算结果
+        self._arxiv_id: Optional[str] = None
+        self._cs_related: Optional[bool] = None
+    
+    @classmethod
+    def from_record(cls, record: 'PaperRecord') -> 'EnhancedArxivPaper':
+        """用进程池中规范化好的PaperRecord构造，沿用其中已计算的ID和计算机科学相关性"""
+        paper = cls(record.to_result())
+        paper._arxiv_id = record.arxiv_id
+        paper._cs_related = record.cs_related
+        return paper
     
     @property
     def title(self) -> str:
@@ -62,7 +95,9 @@ class EnhancedArxivPaper:
     @property
     def arxiv_id(self) -> str:
         """arXiv ID"""
-        return re.sub(r'v\d+$', '', self._paper.get_short_id())
+        if self._arxiv_id is None:
+            self._arxiv_id = re.sub(r'v\d+$', '', self._paper.get_short_id())
+        return self._arxiv_id
     
     @property
     def pdf_url(self) -> str:
@@ -91,20 +126,9 @@ class EnhancedArxivPaper:
     
     def is_cs_related(self) -> bool:
         """判断是否为计算机科学相关论文"""
-        cs_keywords = [
-            'computer', 'computing', 'algorithm', 'machine learning', 'deep learning',
-            'neural network', 'artificial intelligence', 'robotics', 'computer vision',
-            'natural language processing', 'data mining', 'software', 'programming',
-            'database', 'network', 'security', 'optimization', 'simulation'
-        ]
-        
-        # 检查分类
-        if any(cat.startswith('cs.') for cat in self.categories):
-            return True
-        
-        # 检查标题和摘要中的关键词
-        text = (self.title + " " + self.summary).lower()
-        return any(keyword in text for keyword in cs_keywords)
+        if self._cs_related is None:
+            self._cs_related = is_cs_related_text(self.categories, self.title, self.summary)
+        return self._cs_related
     
     def _extract_author_affiliations(self) -> List[Dict[str, str]]:
         """
@@ -2,15 +2,43 @@
 增强版论文分析器：支持自定义任务分类和更详细的分析
 """
 
+import hashlib
 import json
-import re
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from dataclasses import dataclass, replace
 from datetime import datetime
 from loguru import logger
 from llm import get_llm
-from enhanced_config import ENHANCED_EXTRACTION_PROMPT_TEMPLATE, format_enhanced_classification_table
+from enhanced_config import (
+    ENHANCED_EXTRACTION_PROMPT_TEMPLATE,
+    FULLTEXT_EXCERPT_PROMPT_TEMPLATE,
+    ENHANCED_FIELD_DESCRIPTIONS,
+    ENHANCED_MAP_CHUNK_PROMPT_TEMPLATE,
+    ENHANCED_REDUCE_PROMPT_TEMPLATE,
+    ENHANCED_PARTIAL_EXTRACTION_PROMPT_TEMPLATE,
+    ENHANCED_RECLASSIFY_PROMPT_TEMPLATE,
+    format_enhanced_classification_table,
+)
 from user_config import UserConfig, get_effective_task_categories
+from prompt_builder import PromptBudget, PromptBuilder
+from mapreduce_extractor import MapReduceExtractor
+from json_stream import parse_json_response
+from concurrency_limiter import get_limiter
+from instrumentation import incr, span, timed
+from metrics import mark_progress, set_queue_depth
+
+
+ENHANCED_SYSTEM_PROMPT = "你是一个专业的学术论文分析专家。请仔细分析论文内容，准确提取所需信息，并严格按照JSON格式输出结果。所有回复必须使用中文。"
+
+
+# 重新分类只需输出类别和置信度
+RECLASSIFY_MAX_TOKENS = 100
+
+
+def _hash_text(text: str) -> str:
+    """计算文本的短哈希，用于标记分析结果的输入版本"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
 
 
 @dataclass
@@ -37,13 +65,30 @@ class EnhancedPaperAnalysis:
 class EnhancedPaperAnalyzer:
     """增强版论文分析器类"""
     
-    def __init__(self, config: UserConfig):
+    def __init__(self, config: UserConfig, prompt_budget: Optional[PromptBudget] = None, fulltext=None):
+        """
+        Args:
+            config: 用户配置
+            prompt_budget: 提示词token预算，默认使用PromptBudget()；max_tokens<=0 时使用完整提示词
+            fulltext: FullTextExtractor对象，提供时在提示词中附加实验/数据集相关章节的全文节选；
+                MapReduceExtractor对象则对全文逐段分析后合并
+        """
         self.config = config
+        self.fulltext = fulltext
         self.task_categories = get_effective_task_categories(config)
-        self.classification_table = format_enhanced_classification_table(
-            self.task_categories if not config.use_default_categories else config.custom_task_categories
-        )
+        table_categories = self.task_categories if not config.use_default_categories else config.custom_task_categories
+        self.classification_table = format_enhanced_classification_table(table_categories)
+        
+        prompt_budget = prompt_budget if prompt_budget is not None else PromptBudget()
+        self.prompt_builder = None
+        if prompt_budget.max_tokens > 0:
+            self.prompt_builder = PromptBuilder(
+                table_categories,
+                budget=prompt_budget,
+                full_classification_table=self.classification_table
+            )
     
+    @timed("analyze_paper")
     def analyze_paper(self, paper) -> Optional[EnhancedPaperAnalysis]:
         """
         分析单篇论文，提取结构化信息
@@ -56,32 +101,48 @@ class EnhancedPaperAnalyzer:
         """
         try:
             # 构建提示词
-            prompt = ENHANCED_EXTRACTION_PROMPT_TEMPLATE.format(
-                title=paper.title,
-                abstract=paper.summary,
-                authors=paper.authors_with_affiliations,
-                classification_table=self.classification_table
-            )
+            if self.prompt_builder:
+                prompt = self.prompt_builder.build(paper).text
+            else:
+                prompt = ENHANCED_EXTRACTION_PROMPT_TEMPLATE.format(
+                    title=paper.title,
+                    abstract=paper.summary,
+                    authors=paper.authors_with_affiliations,
+                    classification_table=self.classification_table
+                )
             
-            # 调用LLM进行分析
-            llm = get_llm()
-            response = llm.generate([
-                {
-                    "role": "system",
-                    "content": "你是一个专业的学术论文分析专家。请仔细分析论文内容，准确提取所需信息，并严格按照JSON格式输出结果。所有回复必须使用中文。"
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ])
+            analysis_data = None
+            if isinstance(self.fulltext, MapReduceExtractor):
+                # 全文逐段分析后合并，没有全文时退回只用标题和摘要的单次分析
+                table = self.prompt_builder.classification_table if self.prompt_builder else self.classification_table
+                analysis_data = self.fulltext.extract(paper, prompt, table, ENHANCED_SYSTEM_PROMPT,
+                                                      self._parse_llm_response)
+            elif self.fulltext:
+                excerpt = self.fulltext.get_excerpt(paper)
+                if excerpt:
+                    prompt += FULLTEXT_EXCERPT_PROMPT_TEMPLATE.format(excerpt=excerpt)
             
-            # 解析LLM响应
-            analysis_data = self._parse_llm_response(response)
+            if analysis_data is None:
+                # 调用LLM进行分析
+                with span("llm.generate"):
+                    analysis_data = self._generate_json([
+                        {
+                            "role": "system",
+                            "content": ENHANCED_SYSTEM_PROMPT
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ])
             if not analysis_data:
                 logger.warning(f"无法解析LLM响应，论文: {paper.title}")
                 return None
             
+            # 压缩分类表时LLM返回的是类别代码
+            if self.prompt_builder and "task_category" in analysis_data:
+                analysis_data["task_category"] = self.prompt_builder.decode_category(analysis_data["task_category"])
+            
             # 构建分析结果
             return EnhancedPaperAnalysis(
                 title=paper.title,
@@ -106,6 +167,115 @@ class EnhancedPaperAnalyzer:
             logger.error(f"分析论文时出错 '{paper.title}': {str(e)}")
             return None
     
+    def input_fingerprint(self) -> Dict[str, str]:
+        """
+        当前分析输入的指纹：提示词模板、分类表和模型
+        
+        Returns:
+            包含 template_hash / taxonomy_hash / model 的字典
+        """
+        template = ENHANCED_SYSTEM_PROMPT + ENHANCED_EXTRACTION_PROMPT_TEMPLATE
+        if self.prompt_builder:
+            template += self.prompt_builder.signature
+        if isinstance(self.fulltext, MapReduceExtractor):
+            template += ENHANCED_MAP_CHUNK_PROMPT_TEMPLATE + ENHANCED_REDUCE_PROMPT_TEMPLATE + self.fulltext.signature
+        elif self.fulltext:
+            template += FULLTEXT_EXCERPT_PROMPT_TEMPLATE + self.fulltext.signature
+        return {
+            "template_hash": _hash_text(template),
+            "taxonomy_hash": _hash_text(self.classification_table),
+            "model": get_llm().model,
+        }
+    
+    def reextract_fields(self, paper, analysis: EnhancedPaperAnalysis, fields: List[str]) -> Optional[EnhancedPaperAnalysis]:
+        """
+        只重新提取部分字段，其余字段沿用已有分析结果
+        
+        Args:
+            paper: EnhancedArxivPaper对象
+            analysis: 已有的分析结果
+            fields: 需要重新提取的字段名列表
+            
+        Returns:
+            更新后的EnhancedPaperAnalysis对象或None（如果分析失败）
+        """
+        try:
+            fields_spec = json.dumps(
+                {name: ENHANCED_FIELD_DESCRIPTIONS[name] for name in fields},
+                ensure_ascii=False, indent=2
+            )
+            prompt = ENHANCED_PARTIAL_EXTRACTION_PROMPT_TEMPLATE.format(
+                title=paper.title,
+                abstract=paper.summary,
+                fields_spec=fields_spec,
+                classification_table=self.classification_table
+            )
+            
+            analysis_data = self._generate_json([
+                {"role": "system", "content": ENHANCED_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ])
+            if not analysis_data:
+                logger.warning(f"无法解析LLM响应，论文: {paper.title}")
+                return None
+            
+            updates = {}
+            for name in fields:
+                if name not in analysis_data:
+                    continue
+                if name == "confidence":
+                    updates[name] = float(analysis_data[name])
+                elif name == "novelty_score":
+                    updates[name] = int(analysis_data[name])
+                else:
+                    updates[name] = analysis_data[name]
+            return replace(analysis, **updates)
+            
+        except Exception as e:
+            logger.error(f"重新提取字段时出错 '{paper.title}': {str(e)}")
+            return None
+    
+    def reclassify(self, title: str, one_line_summary: str) -> Optional[Dict]:
+        """
+        仅根据标题和一句话摘要重新分类（分类表变化时的快速路径）
+        
+        Args:
+            title: 论文标题
+            one_line_summary: 缓存的一句话摘要
+            
+        Returns:
+            包含 task_category 和 confidence 的字典或None（如果分类失败）
+        """
+        try:
+            prompt = ENHANCED_RECLASSIFY_PROMPT_TEMPLATE.format(
+                title=title,
+                summary=one_line_summary,
+                classification_table=self.classification_table
+            )
+            
+            data = self._generate_json([{"role": "user", "content": prompt}], max_tokens=RECLASSIFY_MAX_TOKENS)
+            if not data or "task_category" not in data:
+                logger.warning(f"无法解析重新分类结果，论文: {title}")
+                return None
+            
+            return {
+                "task_category": data["task_category"],
+                "confidence": float(data.get("confidence", 0.0))
+            }
+            
+        except Exception as e:
+            logger.error(f"重新分类时出错 '{title}': {str(e)}")
+            return None
+    
+    def _generate_json(self, messages: List[Dict], max_tokens: Optional[int] = None) -> Optional[Dict]:
+        """
+        调用LLM并返回解析后的JSON结果
+        
+        解析在LLM的重试流程中进行，回复无法解析时按输出格式错误重试；流式模式下第一个完整的JSON对象到达后即关闭流。
+        """
+        return get_llm().generate_json(messages, max_tokens=max_tokens)
+    
+    @timed("parse_llm_response")
     def _parse_llm_response(self, response: str) -> Optional[Dict]:
         """
         解析LLM的JSON响应
@@ -116,28 +286,7 @@ class EnhancedPaperAnalyzer:
         Returns:
             解析后的字典或None
         """
-        try:
-            # 尝试直接解析JSON
-            return json.loads(response)
-        except json.JSONDecodeError:
-            # 如果直接解析失败，尝试提取JSON部分
-            try:
-                # 查找JSON代码块
-                json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
-                if json_match:
-                    return json.loads(json_match.group(1))
-                
-                # 查找花括号包围的内容
-                json_match = re.search(r'\{.*\}', response, re.DOTALL)
-                if json_match:
-                    return json.loads(json_match.group(0))
-                
-                logger.warning(f"无法从响应中提取JSON: {response[:200]}...")
-                return None
-                
-            except json.JSONDecodeError as e:
-                logger.warning(f"解析提取的JSON失败: {str(e)}")
-                return None
+        return parse_json_response(response)
     
     def _format_date(self, date_obj) -> str:
         """
@@ -153,12 +302,14 @@ class EnhancedPaperAnalyzer:
             return date_obj.strftime("%Y-%m-%d")
         return str(date_obj)
     
-    def analyze_papers_batch(self, papers: List) -> List[EnhancedPaperAnalysis]:
+    def analyze_papers_batch(self, papers: List,
+                             progress: Optional[Callable[[str, Dict], None]] = None) -> List[EnhancedPaperAnalysis]:
         """
         批量分析论文
         
         Args:
             papers: EnhancedArxivPaper对象列表
+            progress: 进度回调，每篇论文分析完成后以 ("analyzed", {...}) 调用
             
         Returns:
             EnhancedPaperAnalysis对象列表
@@ -168,17 +319,37 @@ class EnhancedPaperAnalyzer:
         
         logger.info(f"开始分析 {total} 篇论文...")
         
-        for i, paper in enumerate(papers, 1):
-            logger.info(f"正在分析第 {i}/{total} 篇论文: {paper.title[:50]}...")
-            
-            analysis = self.analyze_paper(paper)
-            if analysis:
-                results.append(analysis)
-                logger.info(f"分析完成，分类为: {analysis.task_category}")
-            else:
-                logger.warning(f"论文分析失败: {paper.title}")
+        if self.fulltext:
+            # 先批量下载并用进程池并行提取全文，分析时直接读取缓存
+            self.fulltext.prepare(papers)
+        
+        # 多个线程同时分析，实际同时进行的LLM请求数由全局自适应并发限制器控制；结果保持输入顺序
+        set_queue_depth("analysis", total)
+        threads = min(get_limiter().max_limit, total)
+        executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="llm-analyze") if threads > 1 else None
+        try:
+            outcomes = executor.map(self.analyze_paper, papers) if executor else map(self.analyze_paper, papers)
+            for i, (paper, analysis) in enumerate(zip(papers, outcomes), 1):
+                set_queue_depth("analysis", total - i)
+                if analysis:
+                    results.append(analysis)
+                    incr("papers_analyzed")
+                    logger.info(f"第 {i}/{total} 篇分析完成，分类为: {analysis.task_category}: {paper.title[:50]}")
+                else:
+                    incr("papers_failed")
+                    logger.warning(f"论文分析失败: {paper.title}")
+                mark_progress()
+                if progress:
+                    progress("analyzed", {"done": i, "total": total, "title": paper.title, "ok": analysis is not None})
+        finally:
+            if executor:
+                executor.shutdown(wait=True, cancel_futures=True)
+        
+        set_queue_depth("analysis", 0)
         
         logger.info(f"批量分析完成，成功分析 {len(results)}/{total} 篇论文")
+        if self.prompt_builder:
+            self.prompt_builder.log_stats()
         return results
     
     def get_category_statistics(self, analyses: List[EnhancedPaperAnalysis]) -> Dict[str, int]:
@@ -12,7 +12,6 @@ from datetime import datetime, timedelta
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from user_config import UserConfig, save_user_config
-from enhanced_main import main as enhanced_main
 
 
 def create_embodied_ai_config():
@@ -202,6 +201,37 @@ def demo_custom_task_categories():
     print("💡 可以根据具体研究领域定义专门的任务分类")
 
 
+def demo_run_pipeline():
+    """演示在代码中直接调用分析流程"""
+    print("=== 直接调用分析流程演示 ===\n")
+    
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        print("💡 设置 OPENAI_API_KEY 环境变量后可运行此演示:")
+        print("    from enhanced_main import run_pipeline")
+        print("    from llm import set_global_llm")
+        print("    set_global_llm(api_key=...)")
+        print("    result = run_pipeline(config, output_dir='output')")
+        return
+    
+    # 延迟导入：只有真正运行分析时才加载检索/分析相关模块
+    from enhanced_main import run_pipeline
+    from llm import ensure_global_llm
+    
+    ensure_global_llm(api_key=api_key, base_url=os.environ.get("OPENAI_API_BASE"),
+                      model=os.environ.get("MODEL_NAME") or "gpt-4o")
+    
+    config = create_embodied_ai_config()
+    config.max_papers = 5
+    result = run_pipeline(config, output_dir="output")
+    
+    print(f"📊 检索到 {result.papers_found} 篇论文，成功分析 {len(result.analyses)} 篇")
+    for analysis in result.analyses[:3]:
+        print(f"  • [{analysis.task_category}] {analysis.title[:60]}")
+    if result.csv_path:
+        print(f"📄 详细结果: {result.csv_path}")
+
+
 def main():
     """主演示函数"""
     print("🚀 增强版学术论文分析系统使用示例\n")
@@ -210,13 +240,14 @@ def main():
         ("配置创建", demo_config_creation),
         ("时间范围配置", demo_time_range_configs),
         ("研究领域分类", demo_research_categories),
-        ("自定义任务分类", demo_custom_task_categories)
+        ("自定义任务分类", demo_custom_task_categories),
+        ("直接调用分析流程", demo_run_pipeline)
     ]
     
     for i, (name, demo_func) in enumerate(demos, 1):
         print(f"{i}. {name}")
     
-    print("\n请选择要运行的演示 (1-4), 或按回车查看所有演示:")
+    print(f"\n请选择要运行的演示 (1-{len(demos)}), 或按回车查看所有演示:")
     choice = input().strip()
     
     if choice == "":
@@ -0,0 +1,394 @@
+"""
+全文分析模式：下载论文PDF并按内容哈希缓存到磁盘（mmap读取），用进程池并行提取文本，
+按章节切分后只把实验/数据集相关章节发送给LLM，以有限的token开销提高数据集和评估指标的提取准确率
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from instrumentation import incr, span
+
+
+DEFAULT_CACHE_DIR = "output/fulltext_cache"
+
+# 发送给LLM的全文节选的默认token上限
+DEFAULT_EXCERPT_TOKENS = 1500
+
+# 优先选取的章节（标题包含这些词）
+SECTION_INCLUDE = ("experiment", "evaluation", "dataset", "benchmark", "result", "setup",
+                   "implementation", "metric", "training detail", "data collection")
+# 不发送的章节
+SECTION_EXCLUDE = ("reference", "bibliography", "related work", "acknowledg", "appendix")
+
+# 常见的不带编号的章节标题
+_NAMED_HEADINGS = ("abstract", "introduction", "related work", "background", "method", "methods", "methodology",
+                   "approach", "experiments", "experiment", "experimental setup", "evaluation", "results",
+                   "discussion", "conclusion", "conclusions", "limitations", "references", "acknowledgments",
+                   "acknowledgements", "appendix")
+_NUMBERED_HEADING = re.compile(r'^(?:\d{1,2}(?:\.\d{1,2}){0,2}|[IVX]{1,4})\.?\s+([A-Z][A-Za-z0-9 ,&:/\-]{2,80})$')
+
+
+def _read_mmap(path: str) -> bytes:
+    """用mmap读取文件，避免大文件的额外缓冲拷贝"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return mapped[:]
+
+
+def _write_atomic(path: str, data: bytes):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class PDFCache:
+    """
+    按内容哈希寻址的PDF/文本缓存
+
+    目录结构:
+        index.json                      arXiv短ID（含版本号）-> PDF内容的sha256
+        pdf/<哈希前2位>/<sha256>.pdf      原始PDF
+        text/<sha256>.<提取器>.txt        提取的文本（提取器变化时自动失效）
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._index: Dict[str, str] = {}
+        index_path = os.path.join(directory, self.INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                self._index = json.load(f)
+
+    def pdf_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "pdf", digest[:2], f"{digest}.pdf")
+
+    def text_path(self, digest: str, extractor: str) -> str:
+        return os.path.join(self.directory, "text", f"{digest}.{extractor}.txt")
+
+    def digest_for(self, key: str) -> Optional[str]:
+        """已缓存PDF的内容哈希"""
+        digest = self._index.get(key)
+        if digest and os.path.exists(self.pdf_path(digest)):
+            return digest
+        return None
+
+    def put_pdf(self, key: str, data: bytes) -> str:
+        """保存PDF，内容相同的PDF只存一份"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.pdf_path(digest)
+        if not os.path.exists(path):
+            _write_atomic(path, data)
+        with self._lock:
+            self._index[key] = digest
+            _write_atomic(os.path.join(self.directory, self.INDEX_FILE),
+                          json.dumps(self._index, ensure_ascii=False, indent=2).encode("utf-8"))
+        return digest
+
+    def get_text(self, digest: str, extractor: str) -> Optional[str]:
+        path = self.text_path(digest, extractor)
+        if not os.path.exists(path):
+            return None
+        return _read_mmap(path).decode("utf-8")
+
+    def put_text(self, digest: str, extractor: str, text: str):
+        _write_atomic(self.text_path(digest, extractor), text.encode("utf-8"))
+
+
+# ----------------------------------------------------------------------
+# PDF文本提取（在子进程中运行，函数需可pickle）
+# ----------------------------------------------------------------------
+def pdf_extractor_name() -> str:
+    """当前可用的文本提取器：安装了pypdf时使用pypdf，否则使用内置的简易解析器"""
+    try:
+        import pypdf  # noqa: F401
+        return "pypdf"
+    except ImportError:
+        return "basic"
+
+
+_PDF_STRING = re.compile(rb'\((?:\\.|[^\\)])*\)')
+_PDF_TEXT_OPS = re.compile(rb'(\[(?:\\.|[^\]\\])*\]\s*TJ|\((?:\\.|[^\\)])*\)\s*(?:Tj|\'|")|T\*|Td|TD|ET)')
+_PDF_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+
+
+def _unescape_pdf_string(raw: bytes) -> str:
+    out = bytearray()
+    i = 0
+    while i < len(raw):
+        char = raw[i:i + 1]
+        if char != b"\\":
+            out += char
+            i += 1
+            continue
+        following = raw[i + 1:i + 2]
+        octal = re.match(rb'[0-7]{1,3}', raw[i + 1:i + 4])
+        if octal:
+            out.append(int(octal.group(0), 8) & 0xFF)
+            i += 1 + len(octal.group(0))
+        else:
+            out += _PDF_ESCAPES.get(following, following)
+            i += 2
+    return out.decode("latin-1")
+
+
+def _extract_text_basic(data: bytes) -> str:
+    """
+    简易PDF文本提取：解压内容流并读取 Tj/TJ 文本操作符
+
+    只适用于使用标准编码字体的简单PDF；arXiv上的大部分论文需要安装pypdf才能正确提取。
+    """
+    lines: List[str] = []
+    current = []
+    for match in re.finditer(rb'stream\r?\n(.*?)\r?\nendstream', data, re.DOTALL):
+        stream = match.group(1)
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        for op in _PDF_TEXT_OPS.finditer(stream):
+            token = op.group(1)
+            if token in (b"T*", b"Td", b"TD", b"ET"):
+                if current:
+                    lines.append("".join(current))
+                    current = []
+                continue
+            current.extend(_unescape_pdf_string(s[1:-1]) for s in _PDF_STRING.findall(token))
+    if current:
+        lines.append("".join(current))
+    return "\n".join(line.strip() for line in lines if line.strip())
+
+
+def extract_pdf_text(path: str) -> str:
+    """从PDF文件提取文本（进程池的工作函数）"""
+    data = _read_mmap(path)
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return _extract_text_basic(data)
+
+    import io
+    reader = PdfReader(io.BytesIO(data))
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+# ----------------------------------------------------------------------
+# 章节切分与选取
+# ----------------------------------------------------------------------
+@dataclass
+class Section:
+    """论文的一个章节"""
+    title: str
+    text: str
+
+
+def _heading_title(line: str) -> Optional[str]:
+    stripped = line.strip()
+    if not stripped or len(stripped) > 90:
+        return None
+    if stripped.lower().rstrip(".:") in _NAMED_HEADINGS:
+        return stripped.rstrip(".:")
+    match = _NUMBERED_HEADING.match(stripped)
+    if match and not stripped.endswith("."):
+        return match.group(1).strip()
+    return None
+
+
+def split_sections(text: str) -> List[Section]:
+    """按章节标题（编号标题或常见的不带编号标题）把全文切分为章节，标题之前的内容归入"前言" """
+    sections = [Section("前言", "")]
+    buffer: List[str] = []
+    for line in text.splitlines():
+        title = _heading_title(line)
+        if title:
+            sections[-1].text = "\n".join(buffer).strip()
+            sections.append(Section(title, ""))
+            buffer = []
+        else:
+            buffer.append(line)
+    sections[-1].text = "\n".join(buffer).strip()
+    return [section for section in sections if section.text]
+
+
+def select_sections(sections: List[Section], max_tokens: int, counter=None) -> str:
+    """
+    选取实验/数据集相关章节，拼接到不超过 max_tokens 个token
+
+    没有识别到相关章节标题时，退而选取提到 dataset/benchmark/metric 的段落。
+    """
+    from prompt_builder import TokenCounter
+
+    counter = counter or TokenCounter()
+    relevant = [s for s in sections
+                if any(word in s.title.lower() for word in SECTION_INCLUDE)
+                and not any(word in s.title.lower() for word in SECTION_EXCLUDE)]
+    if not relevant:
+        paragraphs = [p for s in sections if not any(word in s.title.lower() for word in SECTION_EXCLUDE)
+                      for p in re.split(r'\n\s*\n', s.text)
+                      if re.search(r'dataset|benchmark|metric|accuracy|success rate', p, re.IGNORECASE)]
+        relevant = [Section("相关段落", "\n\n".join(paragraphs))] if paragraphs else []
+
+    parts: List[str] = []
+    remaining = max_tokens
+    for section in relevant:
+        block = f"## {section.title}\n{section.text}"
+        tokens = counter.count(block)
+        if tokens > remaining:
+            if remaining > 50:
+                parts.append(counter.truncate(block, remaining))
+            break
+        parts.append(block)
+        remaining -= tokens
+    return "\n\n".join(parts)
+
+
+# ----------------------------------------------------------------------
+# 下载、缓存和并行提取
+# ----------------------------------------------------------------------
+def download_pdf(url: str, timeout: float = 60) -> bytes:
+    """下载PDF"""
+    from urllib.request import Request, urlopen
+
+    request = Request(url, headers={"User-Agent": "arxiv-daily-fulltext/1.0"})
+    with urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+
+def _cache_key(paper) -> str:
+    return paper._paper.get_short_id()
+
+
+class FullTextExtractor:
+    """
+    全文节选提供者
+
+    Args:
+        cache_dir: PDF/文本缓存目录
+        max_tokens: 每篇论文全文节选的token上限
+        workers: PDF文本提取进程数
+        fetch: 下载函数 url -> PDF字节（测试时可替换为本地PDF）
+        download_delay: 两次下载之间的间隔（秒），遵守arXiv的访问频率要求
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_tokens: int = DEFAULT_EXCERPT_TOKENS,
+                 workers: Optional[int] = None, fetch: Optional[Callable[[str], bytes]] = None,
+                 download_delay: float = 1.0):
+        self.cache = PDFCache(cache_dir)
+        self.max_tokens = max_tokens
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.fetch = fetch or download_pdf
+        self.download_delay = download_delay
+        self.extractor = pdf_extractor_name()
+        self._excerpts: Dict[str, str] = {}
+        self._digests: Dict[str, str] = {}
+        if self.extractor == "basic":
+            logger.warning("未安装pypdf，使用内置的简易PDF解析器，多数arXiv论文需要 pip install pypdf 才能正确提取全文")
+
+    @property
+    def signature(self) -> str:
+        """全文模式参数签名，参与分析结果的输入指纹"""
+        return f"fulltext={self.extractor};tokens={self.max_tokens}"
+
+    def _download_missing(self, papers: List) -> Dict[str, str]:
+        """下载未缓存的PDF，返回 缓存键 -> 内容哈希"""
+        digests = {}
+        last_download = 0.0
+        for paper in papers:
+            key = _cache_key(paper)
+            digest = self.cache.digest_for(key)
+            if digest is None:
+                if not paper.pdf_url:
+                    continue
+                wait = self.download_delay - (time.monotonic() - last_download)
+                if wait > 0:
+                    time.sleep(wait)
+                try:
+                    data = self.fetch(paper.pdf_url)
+                except Exception as e:
+                    logger.warning(f"下载PDF失败 {paper.pdf_url}: {str(e)}")
+                    incr("fulltext_download_failed")
+                    continue
+                finally:
+                    last_download = time.monotonic()
+                digest = self.cache.put_pdf(key, data)
+                incr("fulltext_downloaded")
+            else:
+                incr("fulltext_cache_hits")
+            digests[key] = digest
+        return digests
+
+    def prepare(self, papers: List):
+        """
+        预先下载并并行提取一批论文的全文，结果写入缓存
+
+        已缓存文本的论文不再提取；提取在进程池中进行，不受GIL限制。
+        """
+        with span("fulltext.download"):
+            digests = self._download_missing(papers)
+
+        pending = {digest for digest in digests.values() if self.cache.get_text(digest, self.extractor) is None}
+        if pending:
+            with span("fulltext.extract"):
+                pending = sorted(pending)
+                paths = [self.cache.pdf_path(digest) for digest in pending]
+                if self.workers > 1 and len(paths) > 1:
+                    # 分析、服务和队列worker线程运行时创建子进程，使用spawn避免fork复制其他线程持有的锁（如loguru的锁）
+                    with ProcessPoolExecutor(max_workers=min(self.workers, len(paths)),
+                                             mp_context=get_context("spawn")) as executor:
+                        texts = list(executor.map(_safe_extract, paths))
+                else:
+                    texts = [_safe_extract(path) for path in paths]
+                for digest, text in zip(pending, texts):
+                    if text is not None:
+                        self.cache.put_text(digest, self.extractor, text)
+            logger.info(f"已提取 {len(pending)} 篇论文的全文")
+
+        self._digests.update(digests)
+        for paper in papers:
+            key = _cache_key(paper)
+            digest = digests.get(key)
+            text = self.cache.get_text(digest, self.extractor) if digest else None
+            self._excerpts[key] = select_sections(split_sections(text), self.max_tokens) if text else ""
+
+    def get_excerpt(self, paper) -> str:
+        """论文实验/数据集相关章节的节选，没有全文时返回空字符串"""
+        key = _cache_key(paper)
+        if key not in self._excerpts:
+            self.prepare([paper])
+        return self._excerpts.get(key, "")
+
+    def get_text(self, paper) -> str:
+        """论文的完整全文，没有全文时返回空字符串"""
+        key = _cache_key(paper)
+        if key not in self._excerpts:
+            self.prepare([paper])
+        digest = self._digests.get(key)
+        return (self.cache.get_text(digest, self.extractor) or "") if digest else ""
+
+
+def _safe_extract(path: str) -> Optional[str]:
+    try:
+        return extract_pdf_text(path)
+    except Exception as e:
+        logger.warning(f"提取PDF文本失败 {path}: {str(e)}")
+        return None
@@ -5,6 +5,8 @@
 
 import argparse
 import json
+import os
+import sys
 from datetime import datetime
 from user_config import UserConfig, save_user_config
 
@@ -60,6 +62,9 @@ def main():
     parser.add_argument('--end-date', type=str, help='结束日期')
     parser.add_argument('--max-papers', type=int, default=50, help='最大论文数量')
     parser.add_argument('--preset', type=str, default='custom', help='预设配置')
+    parser.add_argument('--output_dir', type=str, default='output', help='输出目录')
+    parser.add_argument('--run', action='store_true',
+                        help='生成配置后直接在当前进程中运行分析（API配置读取 OPENAI_API_KEY/OPENAI_API_BASE/MODEL_NAME 环境变量）')
     
     args = parser.parse_args()
     
@@ -118,10 +123,41 @@ def main():
         "preset_used": args.preset if args.preset != 'custom' else None
     }
     
-    with open('output/run_info.json', 'w', encoding='utf-8') as f:
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(os.path.join(args.output_dir, 'run_info.json'), 'w', encoding='utf-8') as f:
         json.dump(run_info, f, ensure_ascii=False, indent=2)
     
     print("✅ 配置生成完成")
+    
+    if args.run:
+        sys.exit(0 if run_analysis(config, args.output_dir) else 1)
+
+
+def run_analysis(config: UserConfig, output_dir: str) -> bool:
+    """在当前进程中运行分析，避免再启动一次 enhanced_main.py 并重新读取配置文件"""
+    from enhanced_main import DEFAULT_DEDUP_THRESHOLD, make_prompt_budget, run_pipeline
+    from instrumentation import get_instrumentation, write_run_info
+    from llm import ensure_global_llm
+    
+    api_key = os.environ.get('OPENAI_API_KEY')
+    if not api_key:
+        print("❌ 运行分析需要设置 OPENAI_API_KEY 环境变量")
+        return False
+    
+    ensure_global_llm(
+        api_key=api_key,
+        base_url=os.environ.get('OPENAI_API_BASE') or 'https://api.openai.com/v1',
+        model=os.environ.get('MODEL_NAME') or 'gpt-4o',
+        lang="Chinese"
+    )
+    try:
+        # 与 enhanced_main.py 命令行的默认去重阈值和提示词预算相同
+        result = run_pipeline(config, output_dir, dedup_threshold=DEFAULT_DEDUP_THRESHOLD,
+                              prompt_budget=make_prompt_budget())
+    finally:
+        get_instrumentation().log_summary()
+        write_run_info(output_dir)
+    return bool(result.analyses)
 
 
 if __name__ == "__main__":
@@ -62,7 +62,7 @@ def read_run_info(output_dir):
     return None
 
 
-def generate_markdown_report(papers, summary_data, run_info, output_dir):
+def generate_markdown_report(papers, summary_data, run_info, output_dir, trend_store=None):
     """生成Markdown格式的报告"""
     
     report_lines = []
@@ -168,6 +168,26 @@ def generate_markdown_report(papers, summary_data, run_info, output_dir):
                     report_lines.append(f"- **论文链接**: [{url}]({url})")
                 report_lines.append("")
     
+    # 跨运行趋势
+    if trend_store is not None and trend_store.total_papers:
+        report_lines.extend(format_trend_section(trend_store))
+    
+    # 阶段耗时
+    if run_info and run_info.get('stage_timings'):
+        report_lines.append("## ⏱️ 阶段耗时")
+        report_lines.append("")
+        report_lines.append("| 阶段 | 次数 | 总耗时(s) | 平均(s) | 最长(s) |")
+        report_lines.append("|------|-----|----------|--------|--------|")
+        
+        stages = sorted(run_info['stage_timings'].items(), key=lambda x: x[1].get('total_seconds', 0), reverse=True)
+        for name, stats in stages:
+            report_lines.append(
+                f"| {name} | {stats.get('count', 0)} | {stats.get('total_seconds', 0):.2f} | "
+                f"{stats.get('avg_seconds', 0):.3f} | {stats.get('max_seconds', 0):.3f} |"
+            )
+        
+        report_lines.append("")
+    
     # 文件下载链接
     report_lines.append("## 📁 详细结果文件")
     report_lines.append("")
@@ -185,7 +205,38 @@ def generate_markdown_report(papers, summary_data, run_info, output_dir):
     return report_path
 
 
-def generate_json_summary(papers, summary_data, run_info, output_dir):
+def format_trend_section(trend_store, period="week", last_n=6):
+    """生成跨运行趋势分析的Markdown段落"""
+    from trend_analytics import PERIOD_NAMES
+    
+    lines = []
+    table = trend_store.trend_table("task_category", period=period, last_n=last_n)
+    if not table["rows"]:
+        return lines
+    
+    lines.append(f"## 📉 任务类别趋势 (按{PERIOD_NAMES[period]})")
+    lines.append("")
+    lines.append(f"历史累计论文数: {trend_store.total_papers}")
+    lines.append("")
+    lines.append("| 任务类别 | " + " | ".join(table["periods"]) + " |")
+    lines.append("|---------|" + "|".join(["------"] * len(table["periods"])) + "|")
+    for label, counts in table["rows"]:
+        lines.append(f"| {label} | " + " | ".join(str(c) for c in counts) + " |")
+    lines.append("")
+    
+    growth = trend_store.growth_rates("task_category", period=period)
+    if growth:
+        lines.append("| 任务类别 | 本周期 | 上周期 | 增长率 |")
+        lines.append("|---------|-------|-------|-------|")
+        for item in growth:
+            rate = "新增" if item["growth_rate"] is None else f"{item['growth_rate'] * 100:+.1f}%"
+            lines.append(f"| {item['label']} | {item['current']} | {item['previous']} | {rate} |")
+        lines.append("")
+    
+    return lines
+
+
+def generate_json_summary(papers, summary_data, run_info, output_dir, trend_store=None):
     """生成JSON格式的摘要"""
     
     summary = {
@@ -224,6 +275,15 @@ def generate_json_summary(papers, summary_data, run_info, output_dir):
         
         summary["research_fields"] = research_fields
     
+    # 跨运行趋势
+    if trend_store is not None and trend_store.total_papers:
+        summary["trends"] = {
+            "total_papers": trend_store.total_papers,
+            "weekly_task_categories": trend_store.trend_table("task_category", period="week"),
+            "weekly_growth": trend_store.growth_rates("task_category", period="week"),
+            "monthly_task_categories": trend_store.trend_table("task_category", period="month"),
+        }
+    
     # 保存JSON摘要
     json_path = Path(output_dir) / "analysis_summary.json"
     with open(json_path, 'w', encoding='utf-8') as f:
@@ -232,34 +292,49 @@ def generate_json_summary(papers, summary_data, run_info, output_dir):
     return json_path
 
 
-def main():
-    parser = argparse.ArgumentParser(description='生成分析报告')
-    parser.add_argument('--output_dir', type=str, default='output', help='输出目录')
-    
-    args = parser.parse_args()
-    
-    print("📊 生成分析报告...")
+def generate_reports(output_dir):
+    """
+    读取输出目录中最新的分析结果，更新趋势数据并生成Markdown报告和JSON摘要
     
+    Returns:
+        (Markdown报告路径, JSON摘要路径)，没有分析结果时返回None
+    """
     # 读取分析结果
-    papers, csv_file = read_csv_results(args.output_dir)
-    summary_data = read_summary_results(args.output_dir)
-    run_info = read_run_info(args.output_dir)
+    papers, csv_file = read_csv_results(output_dir)
+    summary_data = read_summary_results(output_dir)
+    run_info = read_run_info(output_dir)
     
     if not papers:
         print("❌ 未找到分析结果文件")
-        return
+        return None
     
     print(f"✅ 读取到 {len(papers)} 篇论文的分析结果")
     
+    # 汇总历史运行结果（只读取尚未汇总过的CSV）；趋势汇总依赖numpy，到这一步才导入
+    from trend_analytics import update_trend_store
+    trend_store = update_trend_store(output_dir)
+    print(f"✅ 趋势数据包含 {trend_store.total_papers} 篇历史论文")
+    
     # 生成Markdown报告
-    md_path = generate_markdown_report(papers, summary_data, run_info, args.output_dir)
+    md_path = generate_markdown_report(papers, summary_data, run_info, output_dir, trend_store)
     print(f"✅ Markdown报告已生成: {md_path}")
     
     # 生成JSON摘要
-    json_path = generate_json_summary(papers, summary_data, run_info, args.output_dir)
+    json_path = generate_json_summary(papers, summary_data, run_info, output_dir, trend_store)
     print(f"✅ JSON摘要已生成: {json_path}")
+    return md_path, json_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成分析报告')
+    parser.add_argument('--output_dir', type=str, default='output', help='输出目录')
+    
+    args = parser.parse_args()
+    
+    print("📊 生成分析报告...")
     
-    print("🎉 报告生成完成！")
+    if generate_reports(args.output_dir):
+        print("🎉 报告生成完成！")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,203 @@
+"""
+轻量级性能埋点：按阶段统计耗时（上下文管理器/装饰器）和计数器，并支持cProfile/pyinstrument性能剖析
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional
+
+from loguru import logger
+
+
+class Instrumentation:
+    """阶段耗时和计数器的线程安全注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spans: Dict[str, Dict[str, float]] = {}
+        self._counters: Dict[str, int] = {}
+
+    @contextmanager
+    def span(self, name: str):
+        """统计代码块耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        """记录一次阶段耗时"""
+        with self._lock:
+            stats = self._spans.setdefault(name, {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            stats["count"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+
+    def incr(self, name: str, value: int = 1):
+        """计数器加一（或指定值）"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def snapshot(self) -> Dict:
+        """当前的阶段耗时和计数器"""
+        with self._lock:
+            stages = {
+                name: {
+                    "count": int(stats["count"]),
+                    "total_seconds": round(stats["total_seconds"], 4),
+                    "avg_seconds": round(stats["total_seconds"] / stats["count"], 4) if stats["count"] else 0.0,
+                    "max_seconds": round(stats["max_seconds"], 4),
+                }
+                for name, stats in sorted(self._spans.items())
+            }
+            return {"stages": stages, "counters": dict(sorted(self._counters.items()))}
+
+    def reset(self):
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def log_summary(self):
+        """在日志中输出各阶段耗时"""
+        snapshot = self.snapshot()
+        if not snapshot["stages"]:
+            return
+        logger.info("阶段耗时统计:")
+        for name, stats in sorted(snapshot["stages"].items(), key=lambda x: x[1]["total_seconds"], reverse=True):
+            logger.info(
+                f"  {name}: 共 {stats['total_seconds']:.2f}s / {stats['count']} 次 "
+                f"(平均 {stats['avg_seconds']:.3f}s, 最长 {stats['max_seconds']:.3f}s)"
+            )
+        for name, value in snapshot["counters"].items():
+            logger.info(f"  {name}: {value}")
+
+
+GLOBAL_INSTRUMENTATION = Instrumentation()
+
+
+def span(name: str):
+    """统计代码块耗时的上下文管理器"""
+    return GLOBAL_INSTRUMENTATION.span(name)
+
+
+def record(name: str, seconds: float):
+    """全局记录一次阶段耗时（耗时分散在多段代码中、不便用span包围时使用）"""
+    GLOBAL_INSTRUMENTATION.record(name, seconds)
+
+
+def incr(name: str, value: int = 1):
+    """全局计数器加一（或指定值）"""
+    GLOBAL_INSTRUMENTATION.incr(name, value)
+
+
+def timed(name: str):
+    """统计函数耗时的装饰器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with GLOBAL_INSTRUMENTATION.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_instrumentation() -> Instrumentation:
+    """获取全局埋点注册表"""
+    return GLOBAL_INSTRUMENTATION
+
+
+def write_run_info(output_dir: str, extra: Optional[Dict] = None) -> str:
+    """
+    将阶段耗时和计数器写入 run_info.json（保留文件中已有的字段，如GitHub Actions生成的配置信息）
+
+    Args:
+        output_dir: 输出目录
+        extra: 额外写入的字段
+
+    Returns:
+        run_info.json 路径
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    run_info_path = os.path.join(output_dir, "run_info.json")
+
+    run_info = {}
+    if os.path.exists(run_info_path):
+        try:
+            with open(run_info_path, 'r', encoding='utf-8') as f:
+                run_info = json.load(f)
+        except Exception as e:
+            logger.warning(f"读取 run_info.json 失败: {str(e)}，将重新生成")
+
+    snapshot = GLOBAL_INSTRUMENTATION.snapshot()
+    run_info["stage_timings"] = snapshot["stages"]
+    run_info["counters"] = snapshot["counters"]
+    run_info["finished_at"] = datetime.now().isoformat()
+    if extra:
+        run_info.update(extra)
+
+    with open(run_info_path, 'w', encoding='utf-8') as f:
+        json.dump(run_info, f, ensure_ascii=False, indent=2)
+    return run_info_path
+
+
+class RunProfiler:
+    """整次运行的性能剖析（cProfile 或 pyinstrument）"""
+
+    SUPPORTED = ("cprofile", "pyinstrument")
+
+    def __init__(self, kind: str = "cprofile"):
+        if kind not in self.SUPPORTED:
+            raise ValueError(f"不支持的性能剖析器: {kind}")
+        self.kind = kind
+        self._profiler = None
+
+    def start(self):
+        if self.kind == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                logger.warning("未安装pyinstrument，改用cProfile")
+                self.kind = "cprofile"
+            else:
+                self._profiler = Profiler()
+                self._profiler.start()
+                return
+
+        import cProfile
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+
+    def stop(self, output_dir: str) -> Optional[str]:
+        """
+        停止剖析并输出结果
+
+        Returns:
+            剖析结果文件路径
+        """
+        if self._profiler is None:
+            return None
+        os.makedirs(output_dir, exist_ok=True)
+
+        if self.kind == "pyinstrument":
+            self._profiler.stop()
+            path = os.path.join(output_dir, "profile.html")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(self._profiler.output_html())
+        else:
+            import pstats
+            self._profiler.disable()
+            path = os.path.join(output_dir, "profile.prof")
+            self._profiler.dump_stats(path)
+            with open(os.path.join(output_dir, "profile.txt"), 'w', encoding='utf-8') as f:
+                stats = pstats.Stats(self._profiler, stream=f)
+                stats.sort_stats("cumulative").print_stats(50)
+
+        self._profiler = None
+        logger.info(f"性能剖析结果已保存: {path}")
+        return path
@@ -0,0 +1,105 @@
+"""
+LLM回复的JSON解析：完整回复中提取JSON对象；流式回复逐段接收生成的文本，跳过前面的说明文字或思考过程，
+第一个完整的顶层JSON对象一到达就返回，调用方随即关闭流，不必等模型生成后面多余的内容
+"""
+
+import json
+import re
+from typing import Dict, Optional
+
+from loguru import logger
+
+
+def parse_json_response(response: str) -> Optional[Dict]:
+    """
+    解析LLM的JSON响应：直接解析，失败时提取 ```json 代码块或花括号包围的内容
+
+    Returns:
+        解析后的字典，无法提取JSON对象时返回None
+    """
+    try:
+        data = json.loads(response)
+    except json.JSONDecodeError:
+        try:
+            # 查找JSON代码块
+            json_match = re.search(r'```json\s*(.*?)\s*```', response, re.DOTALL)
+            if json_match:
+                data = json.loads(json_match.group(1))
+            else:
+                # 查找花括号包围的内容
+                json_match = re.search(r'\{.*\}', response, re.DOTALL)
+                if not json_match:
+                    logger.warning(f"无法从响应中提取JSON: {response[:200]}...")
+                    return None
+                data = json.loads(json_match.group(0))
+        except json.JSONDecodeError as e:
+            logger.warning(f"解析提取的JSON失败: {str(e)}")
+            return None
+    return data if isinstance(data, dict) else None
+
+
+class IncrementalJSONObjectParser:
+    """
+    从逐段到达的文本中找出第一个完整的顶层JSON对象
+
+    只跟踪花括号深度和字符串/转义状态，每段文本只扫描一次；括号配平后用 json.loads 校验，
+    校验失败（如前言里出现的花括号）时从该位置之后继续查找。
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.chunks = 0
+        self._pos = 0
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def _reset_scan(self, pos: int):
+        self._pos = pos
+        self._start = -1
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> Optional[Dict]:
+        """
+        追加一段文本
+
+        Returns:
+            第一个完整的顶层JSON对象；尚未到达时返回None
+        """
+        self.chunks += 1
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text):
+            ch = text[self._pos]
+            self._pos += 1
+            if self._start < 0:
+                if ch == "{":
+                    self._start = self._pos - 1
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    start = self._start
+                    try:
+                        value = json.loads(text[start:self._pos])
+                    except json.JSONDecodeError:
+                        value = None
+                    if isinstance(value, dict):
+                        return value
+                    self._reset_scan(start + 1)
+        return None
@@ -1,6 +1,24 @@
-from openai import OpenAI
+import os
 from loguru import logger
-from time import sleep
+from time import perf_counter, sleep
+from typing import Callable, Dict, Optional, TypeVar
+
+from concurrency_limiter import get_limiter
+from instrumentation import incr, record, span
+from json_stream import IncrementalJSONObjectParser, parse_json_response
+from llm_transport import get_http_client, get_timeout
+from metrics import observe_llm_request
+from retry_policy import MALFORMED_OUTPUT, RATE_LIMIT, MalformedOutputError, classify_error, get_retry_policy
+
+# 错误类型 -> 请求耗时指标的 outcome 标签
+_OUTCOMES = {RATE_LIMIT: "rate_limited", MALFORMED_OUTPUT: "malformed"}
+
+# 流式模式：需要JSON结果的调用（论文分析）使用 generate_json，完整JSON到达后即关闭流
+_settings = {
+    "stream": (os.environ.get("LLM_STREAM") or "").lower() in ("1", "true", "yes"),
+}
+
+T = TypeVar("T")
 
 GLOBAL_LLM = None
 
@@ -17,38 +35,155 @@ class LLM:
         """
         if not api_key:
             raise ValueError("API密钥不能为空")
-            
+        
+        # openai包导入较慢，只在真正创建客户端时导入
+        from openai import OpenAI
+        
+        # 重试由 retry_policy 统一处理，关闭openai客户端自带的重试，避免两层重试叠加；
+        # 所有LLM实例共享同一个按并发数配置的连接池
         self.llm = OpenAI(
             api_key=api_key, 
-            base_url=base_url or "https://api.openai.com/v1"
+            base_url=base_url or "https://api.openai.com/v1",
+            max_retries=0,
+            http_client=get_http_client(),
+            timeout=get_timeout()
         )
         self.model = model
         self.lang = lang
 
-    def generate(self, messages: list[dict]) -> str:
+    def generate(self, messages: list[dict], max_tokens: int = None) -> str:
         """
         生成回复
         
         Args:
             messages: 对话消息列表
+            max_tokens: 可选的最大输出token数
             
         Returns:
             生成的回复文本
         """
-        max_retries = 3
-        for attempt in range(max_retries):
+        return self._request(lambda: self._complete(messages, max_tokens))
+    
+    def generate_json(self, messages: list[dict], max_tokens: int = None) -> Dict:
+        """
+        生成JSON回复并返回解析结果，回复中没有可解析的JSON对象时按输出格式错误处理（立即重试一次）
+        
+        流式模式下第一个完整的顶层JSON对象到达后立即关闭流：回复前面的说明文字或思考过程会被跳过，
+        JSON之后多余的内容不再等待生成。
+        
+        Args:
+            messages: 对话消息列表
+            max_tokens: 可选的最大输出token数
+            
+        Returns:
+            解析后的字典
+        """
+        if streaming_enabled():
+            return self._request(lambda: self._stream_json(messages, max_tokens))
+        return self._request(lambda: self._complete_json(messages, max_tokens))
+    
+    def _complete(self, messages: list[dict], max_tokens: int = None) -> str:
+        extra_args = {"max_tokens": max_tokens} if max_tokens else {}
+        response = self.llm.chat.completions.create(
+            messages=messages, 
+            temperature=0, 
+            model=self.model,
+            **extra_args
+        )
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            incr("llm_prompt_tokens", usage.prompt_tokens or 0)
+            incr("llm_completion_tokens", usage.completion_tokens or 0)
+        content = response.choices[0].message.content if response.choices else None
+        if not content:
+            raise MalformedOutputError("LLM返回了空内容")
+        return content
+    
+    def _complete_json(self, messages: list[dict], max_tokens: int = None) -> Dict:
+        content = self._complete(messages, max_tokens)
+        with span("parse_llm_response"):
+            data = parse_json_response(content)
+        if data is None:
+            raise MalformedOutputError("回复中没有可解析的JSON对象")
+        return data
+    
+    def _stream_json(self, messages: list[dict], max_tokens: int = None) -> Dict:
+        extra_args = {"max_tokens": max_tokens} if max_tokens else {}
+        stream = self.llm.chat.completions.create(
+            messages=messages, 
+            temperature=0, 
+            model=self.model,
+            stream=True,
+            **extra_args
+        )
+        parser = IncrementalJSONObjectParser()
+        usage = None
+        # 解析与接收交替进行，累计每段的解析耗时，每次回复记录一次
+        parse_seconds = 0.0
+        try:
+            for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                start = perf_counter()
+                data = parser.feed(delta)
+                parse_seconds += perf_counter() - start
+                if data is not None:
+                    incr("llm_streams_closed_early")
+                    return data
+        finally:
+            record("parse_llm_response", parse_seconds)
+            # 提前关闭时服务端不再发送用量，按收到的文本片段数（约每段一个token）估算输出token
+            stream.close()
+            if usage is not None:
+                incr("llm_prompt_tokens", usage.prompt_tokens or 0)
+                incr("llm_completion_tokens", usage.completion_tokens or 0)
+            else:
+                incr("llm_completion_tokens", parser.chunks)
+        raise MalformedOutputError("流式回复中没有完整的JSON对象" if parser.text else "LLM返回了空内容")
+    
+    def _request(self, call: Callable[[], T]) -> T:
+        # 按错误类型决定是否重试：致命错误立即放弃，可重试错误和429按带抖动的指数退避等待，
+        # 整次运行共享重试预算；服务端持续不可用时断路器暂停所有线程的请求
+        policy = get_retry_policy()
+        policy.budget.record_request()
+        attempt = 0
+        while True:
+            policy.breaker.before_request()
+            start = perf_counter()
             try:
-                response = self.llm.chat.completions.create(
-                    messages=messages, 
-                    temperature=0, 
-                    model=self.model
-                )
-                return response.choices[0].message.content
+                # 全局自适应并发限制：等待名额的时间不计入请求耗时
+                with get_limiter().slot():
+                    start = perf_counter()
+                    result = call()
+                observe_llm_request(perf_counter() - start, "success")
+                policy.breaker.record_success()
+                return result
             except Exception as e:
-                logger.error(f"API调用失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt == max_retries - 1:
+                kind = classify_error(e)
+                policy.breaker.record_failure(kind)
+                observe_llm_request(perf_counter() - start, _OUTCOMES.get(kind, "error"))
+                if kind == RATE_LIMIT:
+                    incr("llm_rate_limited")
+                delay = policy.next_delay(attempt, e)
+                if delay is None:
+                    logger.error(f"API调用失败 ({kind}，共尝试 {attempt + 1} 次): {e}")
                     raise
-                sleep(3)
+                logger.warning(f"API调用失败 ({kind}，尝试 {attempt + 1}/{policy.max_attempts})，"
+                               f"{delay:.1f} 秒后重试: {e}")
+                incr("llm_retries")
+                sleep(delay)
+                attempt += 1
+
+def configure_streaming(stream: Optional[bool] = None):
+    """设置是否使用流式模式，参数为None时保持原值"""
+    if stream is not None:
+        _settings["stream"] = bool(stream)
+
+def streaming_enabled() -> bool:
+    """需要JSON结果的LLM调用是否使用流式模式"""
+    return _settings["stream"]
 
 def set_global_llm(api_key: str, base_url: str = None, model: str = "gpt-4o", lang: str = "Chinese"):
     """
@@ -63,6 +198,19 @@ def set_global_llm(api_key: str, base_url: str = None, model: str = "gpt-4o", la
     global GLOBAL_LLM
     GLOBAL_LLM = LLM(api_key=api_key, base_url=base_url, model=model, lang=lang)
 
+def ensure_global_llm(api_key: str, base_url: str = None, model: str = "gpt-4o", lang: str = "Chinese") -> LLM:
+    """
+    设置全局LLM实例，参数与当前实例相同时直接复用（多次进程内运行共享同一个HTTP客户端）
+    
+    Returns:
+        LLM实例
+    """
+    settings = (api_key, base_url, model, lang)
+    if GLOBAL_LLM is None or getattr(GLOBAL_LLM, "_settings", None) != settings:
+        set_global_llm(api_key=api_key, base_url=base_url, model=model, lang=lang)
+        GLOBAL_LLM._settings = settings
+    return GLOBAL_LLM
+
 def get_llm() -> LLM:
     """
     获取全局LLM实例
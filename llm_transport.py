@@ -0,0 +1,101 @@
+"""
+LLM客户端的HTTP传输层：所有LLM实例和分析线程共享一个连接池，连接池大小与LLM最大并发数一致，
+空闲连接保持较长时间，并发请求复用已建立的TCP/TLS连接而不是每次重新握手；HTTP/2和超时可配置
+"""
+
+import importlib.util
+import os
+import threading
+from typing import Optional
+
+from loguru import logger
+
+
+_settings = {
+    # 连接池大小，0表示与LLM最大并发数（concurrency_limiter 的 max_limit）一致
+    "max_connections": int(os.environ.get("LLM_MAX_CONNECTIONS") or 0),
+    # 空闲连接保持时间（秒），httpx默认只有5秒，请求间隔稍长就要重新握手
+    "keepalive_expiry": float(os.environ.get("LLM_KEEPALIVE_EXPIRY") or 60.0),
+    # 使用HTTP/2（需要安装h2），所有并发请求复用同一个连接
+    "http2": (os.environ.get("LLM_HTTP2") or "").lower() in ("1", "true", "yes"),
+    "connect_timeout": float(os.environ.get("LLM_CONNECT_TIMEOUT") or 10.0),
+    "read_timeout": float(os.environ.get("LLM_READ_TIMEOUT") or 180.0),
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _httpx():
+    """openai使用的HTTP库：httpx，较新的openai版本可能使用API相同的httpx2"""
+    try:
+        import httpx
+    except ImportError:
+        import httpx2 as httpx
+    return httpx
+
+
+def pool_size() -> int:
+    """连接池大小"""
+    if _settings["max_connections"] > 0:
+        return _settings["max_connections"]
+    from concurrency_limiter import get_limiter
+    return get_limiter().max_limit
+
+
+def get_timeout():
+    """LLM请求超时：连接超时单独设置，读取超时覆盖较长的生成时间"""
+    return _httpx().Timeout(_settings["read_timeout"], connect=_settings["connect_timeout"])
+
+
+def build_http_client(max_connections: Optional[int] = None, keepalive: bool = True,
+                      http2: Optional[bool] = None, verify=True):
+    """
+    创建HTTP客户端
+
+    Args:
+        max_connections: 连接池大小，默认为 pool_size()
+        keepalive: 为False时不保留空闲连接（每个请求新建连接，用于基准对比）
+        http2: 是否使用HTTP/2，默认按配置
+        verify: TLS证书校验（True、ssl.SSLContext或False）
+    """
+    httpx = _httpx()
+    max_connections = max_connections or pool_size()
+    http2 = _settings["http2"] if http2 is None else http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("未安装h2，无法使用HTTP/2，改用HTTP/1.1（pip install h2）")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections if keepalive else 0,
+        keepalive_expiry=_settings["keepalive_expiry"],
+    )
+    return httpx.Client(limits=limits, http2=http2, timeout=get_timeout(), verify=verify)
+
+
+def get_http_client():
+    """获取共享的HTTP客户端（所有LLM实例共用一个连接池）"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = build_http_client()
+            logger.debug(f"LLM连接池: {pool_size()} 个连接, keep-alive {_settings['keepalive_expiry']:.0f}s")
+        return _client
+
+
+def configure_transport(**overrides):
+    """
+    设置传输参数（键同 _settings，值为None时保持原值），之后创建的LLM实例使用新的共享客户端
+
+    已创建的LLM实例继续使用原客户端。
+    """
+    global _client
+    for key, value in overrides.items():
+        if key not in _settings:
+            raise ValueError(f"未知的传输参数: {key}")
+        if value is not None:
+            if key != "http2" and value < 0:
+                raise ValueError(f"{key} 不能小于0")
+            _settings[key] = type(_settings[key])(value)
+    with _client_lock:
+        _client = None
@@ -0,0 +1,183 @@
+"""
+进程内的Redis替身：实现工作队列Redis后端用到的一小部分命令和 WATCH/MULTI 事务
+（与 redis-py 的 decode_responses=True 行为一致），用于在没有Redis服务的环境中测试或单机运行 RedisWorkQueue
+"""
+
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set
+
+
+class _Pipeline:
+    """
+    与 redis-py 的事务管道行为一致：watch 之后命令立即执行并返回结果，
+    调用 multi() 之后的命令暂存，由 LocalRedis.transaction 在提交时一并执行
+    """
+
+    def __init__(self, redis: 'LocalRedis', watches):
+        self._redis = redis
+        with redis._lock:
+            self.watched = {name: redis._versions.get(name, 0) for name in watches}
+        self.commands = []
+        self._buffering = False
+
+    def multi(self):
+        self._buffering = True
+
+    def __getattr__(self, name):
+        command = getattr(self._redis, name)
+        if not self._buffering:
+            return command
+
+        def buffered(*args, **kwargs):
+            self.commands.append((command, args, kwargs))
+            return self
+        return buffered
+
+
+class LocalRedis:
+    """线程安全的内存版Redis子集"""
+
+    def __init__(self):
+        # 事务提交时在持有锁的情况下执行各命令，因此使用可重入锁
+        self._lock = threading.RLock()
+        self._hashes: Dict[str, Dict[str, str]] = {}
+        self._lists: Dict[str, Deque[str]] = {}
+        self._zsets: Dict[str, Dict[str, float]] = {}
+        self._sets: Dict[str, Set[str]] = {}
+        # 键的修改次数，用于实现WATCH
+        self._versions: Dict[str, int] = {}
+
+    def _touch(self, name: str):
+        self._versions[name] = self._versions.get(name, 0) + 1
+
+    # 事务
+    def transaction(self, func: Callable[[_Pipeline], object], *watches: str,
+                    value_from_callable: bool = False, **kwargs):
+        """
+        同 redis.Redis.transaction：WATCH watches 后调用 func，func 调用 multi() 之后的命令在提交时原子执行；
+        提交前被WATCH的键已被修改时重新调用 func
+        """
+        while True:
+            pipe = _Pipeline(self, watches)
+            value = func(pipe)
+            with self._lock:
+                if any(self._versions.get(name, 0) != version for name, version in pipe.watched.items()):
+                    continue
+                results = [command(*args, **kw) for command, args, kw in pipe.commands]
+            return value if value_from_callable else results
+
+    # 哈希
+    def hsetnx(self, name: str, key: str, value) -> int:
+        with self._lock:
+            table = self._hashes.setdefault(name, {})
+            if key in table:
+                return 0
+            table[key] = str(value)
+            self._touch(name)
+            return 1
+
+    def hset(self, name: str, key: str, value) -> int:
+        with self._lock:
+            table = self._hashes.setdefault(name, {})
+            created = key not in table
+            table[key] = str(value)
+            self._touch(name)
+            return int(created)
+
+    def hget(self, name: str, key: str) -> Optional[str]:
+        with self._lock:
+            return self._hashes.get(name, {}).get(key)
+
+    def hdel(self, name: str, *keys: str) -> int:
+        with self._lock:
+            table = self._hashes.get(name, {})
+            self._touch(name)
+            return sum(table.pop(key, None) is not None for key in keys)
+
+    def hincrby(self, name: str, key: str, amount: int = 1) -> int:
+        with self._lock:
+            table = self._hashes.setdefault(name, {})
+            value = int(table.get(key, 0)) + amount
+            table[key] = str(value)
+            self._touch(name)
+            return value
+
+    def hlen(self, name: str) -> int:
+        with self._lock:
+            return len(self._hashes.get(name, {}))
+
+    # 列表
+    def rpush(self, name: str, *values: str) -> int:
+        with self._lock:
+            items = self._lists.setdefault(name, deque())
+            items.extend(values)
+            self._touch(name)
+            return len(items)
+
+    def lpop(self, name: str) -> Optional[str]:
+        with self._lock:
+            items = self._lists.get(name)
+            if not items:
+                return None
+            self._touch(name)
+            return items.popleft()
+
+    def lindex(self, name: str, index: int) -> Optional[str]:
+        with self._lock:
+            items = self._lists.get(name, ())
+            return items[index] if -len(items) <= index < len(items) else None
+
+    def llen(self, name: str) -> int:
+        with self._lock:
+            return len(self._lists.get(name, ()))
+
+    # 有序集合
+    def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        with self._lock:
+            zset = self._zsets.setdefault(name, {})
+            added = sum(member not in zset for member in mapping)
+            zset.update({member: float(score) for member, score in mapping.items()})
+            self._touch(name)
+            return added
+
+    def zrem(self, name: str, *members: str) -> int:
+        with self._lock:
+            zset = self._zsets.get(name, {})
+            self._touch(name)
+            return sum(zset.pop(member, None) is not None for member in members)
+
+    def zscore(self, name: str, member: str) -> Optional[float]:
+        with self._lock:
+            return self._zsets.get(name, {}).get(member)
+
+    def zrangebyscore(self, name: str, min_score, max_score) -> List[str]:
+        with self._lock:
+            zset = self._zsets.get(name, {})
+            low, high = float(min_score), float(max_score)
+            return [member for member, score in sorted(zset.items(), key=lambda kv: kv[1]) if low <= score <= high]
+
+    def zcard(self, name: str) -> int:
+        with self._lock:
+            return len(self._zsets.get(name, {}))
+
+    # 集合
+    def sadd(self, name: str, *values: str) -> int:
+        with self._lock:
+            members = self._sets.setdefault(name, set())
+            added = sum(value not in members for value in values)
+            members.update(values)
+            self._touch(name)
+            return added
+
+    def sismember(self, name: str, value: str) -> bool:
+        with self._lock:
+            return value in self._sets.get(name, set())
+
+    def smembers(self, name: str) -> Set[str]:
+        with self._lock:
+            return set(self._sets.get(name, set()))
+
+    def scard(self, name: str) -> int:
+        with self._lock:
+            return len(self._sets.get(name, set()))
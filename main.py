@@ -3,14 +3,12 @@
 搜索包含"embodied"关键词的arXiv论文并进行结构化分析
 """
 
-import arxiv
 import argparse
 import os
 import sys
 from datetime import datetime
 from dotenv import load_dotenv
 from loguru import logger
-from tqdm import tqdm
 
 # 加载环境变量
 load_dotenv(override=True)
@@ -21,6 +19,8 @@ from paper import ArxivPaper
 from llm import set_global_llm
 from paper_analyzer import PaperAnalyzer
 from csv_exporter import CSVExporter
+from arxiv_replay import REPLAY_MODES, configure_arxiv_replay
+from search_executor import execute_search, title_abstract_clause
 
 
 def search_embodied_papers(max_results: int = 100) -> list[ArxivPaper]:
@@ -36,47 +36,23 @@ def search_embodied_papers(max_results: int = 100) -> list[ArxivPaper]:
     logger.info("开始搜索包含'embodied'关键词的论文...")
     
     # 构建搜索查询
-    # 搜索标题或摘要包含"embodied"的论文，时间范围2024-2025年
-    query = 'all:embodied AND submittedDate:[20240101 TO 20251231]'
+    # 标题/摘要条件直接下推到查询（ti:/abs:），时间范围2024-2025年
+    query = f'{title_abstract_clause("embodied")} AND submittedDate:[20240101 TO 20251231]'
     
-    client = arxiv.Client(num_retries=10, delay_seconds=3)
-    search = arxiv.Search(
-        query=query,
-        max_results=max_results,
-        sort_by=arxiv.SortCriterion.SubmittedDate,
-        sort_order=arxiv.SortOrder.Descending
-    )
+    # 本地仍确认标题或摘要确实包含"embodied"（不区分大小写），凑够 max_results 篇后停止翻页
+    def mentions_embodied(paper: ArxivPaper) -> bool:
+        return 'embodied' in paper.title.lower() or 'embodied' in paper.summary.lower()
     
-    papers = []
     logger.info(f"正在检索论文，最大数量: {max_results}")
     
     try:
-        with tqdm(desc="检索论文") as pbar:
-            for result in client.results(search):
-                paper = ArxivPaper(result)
-                papers.append(paper)
-                pbar.update(1)
-                
-                # 检查是否达到最大数量
-                if len(papers) >= max_results:
-                    break
-                    
+        outcome = execute_search(query, max_results, ArxivPaper, predicate=mentions_embodied)
     except Exception as e:
         logger.error(f"搜索论文时出错: {str(e)}")
         raise
     
-    logger.info(f"搜索完成，找到 {len(papers)} 篇论文")
-    
-    # 过滤确保标题或摘要确实包含"embodied"（不区分大小写）
-    filtered_papers = []
-    for paper in papers:
-        title_lower = paper.title.lower()
-        summary_lower = paper.summary.lower()
-        if 'embodied' in title_lower or 'embodied' in summary_lower:
-            filtered_papers.append(paper)
-    
-    logger.info(f"过滤后剩余 {len(filtered_papers)} 篇相关论文")
-    return filtered_papers
+    logger.info(f"搜索完成，找到 {outcome.matched} 篇相关论文")
+    return outcome.papers
 
 
 def setup_argument_parser():
@@ -116,6 +92,9 @@ def setup_argument_parser():
     add_argument('--output_dir', type=str, help='输出目录', default='output')
     add_argument('--use_local_llm', type=bool, help='使用本地LLM而非API', default=False)
     add_argument('--debug', action='store_true', help='调试模式')
+    add_argument('--arxiv_replay_mode', type=str, help='arXiv检索录制/回放模式', default='off',
+                choices=REPLAY_MODES)
+    add_argument('--arxiv_replay_dir', type=str, help='arXiv检索录制文件目录', default='output/arxiv_cassettes')
     
     return parser
 
@@ -135,6 +114,8 @@ def main():
         logger.remove()
         logger.add(sys.stdout, level="INFO")
     
+    configure_arxiv_replay(args.arxiv_replay_mode, args.arxiv_replay_dir)
+    
     # 验证API密钥（如果使用API）
     if not args.use_local_llm and not args.openai_api_key:
         logger.error("使用API模式时必须提供OpenAI API密钥")
@@ -0,0 +1,211 @@
+"""
+全文map-reduce分析：单个提示词放不下整篇论文时，把全文切分为若干片段，
+map阶段并发地对每个片段调用分析提示词，reduce阶段把各片段的JSON结果合并为一份分析结果。
+map阶段的结果按提示词内容缓存，修改reduce提示词后重新分析不会重复调用map阶段
+"""
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from enhanced_config import (
+    ENHANCED_FIELD_DESCRIPTIONS,
+    ENHANCED_MAP_CHUNK_PROMPT_TEMPLATE,
+    ENHANCED_REDUCE_PROMPT_TEMPLATE,
+)
+from fulltext import DEFAULT_CACHE_DIR, FullTextExtractor, _read_mmap, _write_atomic, split_sections
+from instrumentation import incr, span
+
+
+# 每个片段的默认token上限
+DEFAULT_CHUNK_TOKENS = 3000
+# 每篇论文最多的片段数，超出部分丢弃（控制单篇论文的LLM调用次数）
+DEFAULT_MAX_CHUNKS = 12
+# map阶段并发调用LLM的线程数
+DEFAULT_MAP_WORKERS = 4
+
+# 不参与分析的章节
+CHUNK_EXCLUDE = ("reference", "bibliography", "acknowledg")
+
+
+def chunk_fulltext(text: str, max_tokens: int = DEFAULT_CHUNK_TOKENS, counter=None) -> List[str]:
+    """
+    按章节和段落把全文切分为不超过 max_tokens 个token的片段
+
+    片段尽量在段落边界切分并保留章节标题；单个段落超过上限时按句子切分，单个句子仍超过上限时截断。
+    """
+    from prompt_builder import TokenCounter
+
+    counter = counter or TokenCounter()
+    pieces: List[str] = []
+    for section in split_sections(text):
+        if any(word in section.title.lower() for word in CHUNK_EXCLUDE):
+            continue
+        paragraphs = [p.strip() for p in re.split(r'\n\s*\n', section.text) if p.strip()]
+        if paragraphs:
+            paragraphs[0] = f"## {section.title}\n{paragraphs[0]}"
+        for paragraph in paragraphs:
+            if counter.count(paragraph) <= max_tokens:
+                pieces.append(paragraph)
+                continue
+            for sentence in re.split(r'(?<=[.!?])\s+', paragraph):
+                pieces.append(counter.truncate(sentence, max_tokens))
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current}\n\n{piece}" if current else piece
+        if current and counter.count(candidate) > max_tokens:
+            chunks.append(current)
+            candidate = piece
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ChunkCache:
+    """
+    map阶段结果缓存：键为模型和完整提示词的哈希，值为该片段解析后的JSON
+
+    Args:
+        directory: 缓存目录
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @staticmethod
+    def key_for(model: str, system_prompt: str, prompt: str) -> str:
+        return hashlib.sha256("\0".join((model, system_prompt, prompt)).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return json.loads(_read_mmap(path).decode("utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, data: Dict):
+        _write_atomic(self._path(key), json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+class MapReduceExtractor(FullTextExtractor):
+    """
+    全文map-reduce分析（下载、缓存和提取全文的方式与 FullTextExtractor 相同）
+
+    Args:
+        cache_dir: PDF/文本缓存目录，map阶段结果缓存在其下的 chunks/ 目录
+        chunk_tokens: 每个片段的token上限
+        max_chunks: 每篇论文最多的片段数
+        map_workers: map阶段并发调用LLM的线程数
+        **kwargs: 传给 FullTextExtractor 的其他参数
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                 max_chunks: int = DEFAULT_MAX_CHUNKS, map_workers: int = DEFAULT_MAP_WORKERS, **kwargs):
+        super().__init__(cache_dir=cache_dir, **kwargs)
+        self.chunk_tokens = chunk_tokens
+        self.max_chunks = max_chunks
+        self.map_workers = map_workers
+        self.chunk_cache = ChunkCache(os.path.join(cache_dir, "chunks"))
+
+    @property
+    def signature(self) -> str:
+        return f"{super().signature};mapreduce;chunk={self.chunk_tokens};max_chunks={self.max_chunks}"
+
+    def _map_chunk(self, system_prompt: str, prompt: str, parse: Callable[[str], Optional[Dict]]) -> Optional[Dict]:
+        from llm import get_llm
+
+        llm = get_llm()
+        key = ChunkCache.key_for(llm.model, system_prompt, prompt)
+        cached = self.chunk_cache.get(key)
+        if cached is not None:
+            incr("mapreduce_chunk_cache_hits")
+            return cached
+
+        incr("mapreduce_map_calls")
+        try:
+            response = llm.generate([
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ])
+        except Exception as e:
+            logger.warning(f"片段分析调用失败: {str(e)}")
+            return None
+        data = parse(response)
+        if data:
+            self.chunk_cache.put(key, data)
+        return data
+
+    def extract(self, paper, prompt: str, classification_table: str, system_prompt: str,
+                parse: Callable[[str], Optional[Dict]]) -> Optional[Dict]:
+        """
+        对论文全文做map-reduce分析
+
+        Args:
+            paper: EnhancedArxivPaper对象
+            prompt: 该论文的分析提示词（ENHANCED_EXTRACTION_PROMPT_TEMPLATE 或压缩后的提示词），每个片段附加在其后
+            classification_table: 分析提示词中使用的任务分类表，reduce阶段沿用
+            system_prompt: 系统提示词
+            parse: 解析LLM响应的函数
+
+        Returns:
+            合并后的分析字段字典；没有全文或全部片段都分析失败时返回None
+        """
+        text = self.get_text(paper)
+        if not text:
+            return None
+        chunks = chunk_fulltext(text, self.chunk_tokens)
+        if not chunks:
+            return None
+        if len(chunks) > self.max_chunks:
+            logger.warning(f"全文切分为 {len(chunks)} 个片段，只分析前 {self.max_chunks} 个: {paper.title[:50]}")
+            chunks = chunks[:self.max_chunks]
+        incr("mapreduce_chunks", len(chunks))
+
+        prompts = [
+            prompt + ENHANCED_MAP_CHUNK_PROMPT_TEMPLATE.format(index=i, total=len(chunks), chunk=chunk)
+            for i, chunk in enumerate(chunks, 1)
+        ]
+        with span("llm.map"):
+            workers = min(self.map_workers, len(prompts)) or 1
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-map") as executor:
+                partials = list(executor.map(lambda p: self._map_chunk(system_prompt, p, parse), prompts))
+        partials = [partial for partial in partials if partial]
+        if not partials:
+            return None
+        if len(partials) == 1:
+            return partials[0]
+        return self._reduce(paper, partials, classification_table, system_prompt, parse)
+
+    def _reduce(self, paper, partials: List[Dict], classification_table: str, system_prompt: str,
+                parse: Callable[[str], Optional[Dict]]) -> Optional[Dict]:
+        from llm import get_llm
+
+        prompt = ENHANCED_REDUCE_PROMPT_TEMPLATE.format(
+            title=paper.title,
+            abstract=paper.summary,
+            partials="\n".join(
+                f"片段{i}：{json.dumps(partial, ensure_ascii=False)}" for i, partial in enumerate(partials, 1)
+            ),
+            fields_spec=json.dumps(ENHANCED_FIELD_DESCRIPTIONS, ensure_ascii=False, indent=2),
+            classification_table=classification_table
+        )
+        incr("mapreduce_reduce_calls")
+        with span("llm.reduce"):
+            response = get_llm().generate([
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ])
+        return parse(response)
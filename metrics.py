@@ -0,0 +1,337 @@
+"""
+运行指标导出：以Prometheus文本格式发布论文数量、LLM延迟直方图、重试/429次数、token用量和队列深度，
+支持 node_exporter 的 textfile collector 和内置的HTTP /metrics 端点
+"""
+
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from instrumentation import get_instrumentation
+
+
+METRIC_PREFIX = "arxiv_daily"
+
+# LLM请求耗时直方图的分桶（秒）
+LLM_LATENCY_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (
+        name + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Gauge:
+    """可增可减的瞬时值（如队列深度）"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def inc(self, value: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(key)} {_format_value(value)}"
+                    for key, value in sorted(self._values.items())]
+
+
+class Counter(Gauge):
+    """只增不减的累计值"""
+
+    type_name = "counter"
+
+    def set(self, value: float, **labels):
+        raise TypeError("计数器不支持直接赋值")
+
+    def inc(self, value: float = 1, **labels):
+        if value < 0:
+            raise ValueError("计数器只能增加")
+        super().inc(value, **labels)
+
+
+class Histogram:
+    """累积分桶直方图"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LLM_LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._lock = threading.Lock()
+        # 标签 -> (各分桶计数, 总和, 总数)
+        self._values: Dict[LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def get_count(self, **labels) -> int:
+        with self._lock:
+            return self._values.get(_label_key(labels), ([], 0.0, 0))[2]
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    le = ("le", _format_value(bound))
+                    lines.append(f"{self.name}_bucket{_format_labels(key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    指标注册表
+
+    除显式注册的指标外，instrumentation 中的计数器（papers_fetched、papers_analyzed等）
+    会在导出时自动以 <前缀>_<名称>_total 的计数器形式发布，业务代码只需调用 incr()。
+    """
+
+    def __init__(self, prefix: str = METRIC_PREFIX):
+        self.prefix = prefix
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"指标 {metric.name} 已以其他类型注册")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._register(Counter(f"{self.prefix}_{name}", help_text))
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._register(Gauge(f"{self.prefix}_{name}", help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = LLM_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(f"{self.prefix}_{name}", help_text, buckets))
+
+    def render(self) -> str:
+        """生成Prometheus文本格式的指标"""
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+
+        registered = {metric.name for metric in metrics}
+        for name, value in get_instrumentation().snapshot()["counters"].items():
+            metric_name = f"{self.prefix}_{name}_total"
+            if metric_name in registered:
+                continue
+            lines.append(f"# HELP {metric_name} 计数器 {name}")
+            lines.append(f"# TYPE {metric_name} counter")
+            lines.append(f"{metric_name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: str):
+        """原子地写入textfile collector文件（先写临时文件再重命名）"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+LLM_REQUEST_SECONDS = REGISTRY.histogram("llm_request_seconds", "单次LLM请求耗时（秒）")
+LLM_QUEUE_DEPTH = REGISTRY.gauge("queue_depth", "等待处理的论文数量")
+LAST_PROGRESS = REGISTRY.gauge("last_progress_timestamp_seconds", "最近一篇论文处理完成的Unix时间戳")
+RUN_STARTED = REGISTRY.gauge("run_start_timestamp_seconds", "本次运行开始的Unix时间戳")
+LLM_CONCURRENCY_LIMIT = REGISTRY.gauge("llm_concurrency_limit", "当前允许同时进行的LLM请求数")
+LLM_INFLIGHT = REGISTRY.gauge("llm_inflight_requests", "正在进行的LLM请求数")
+LLM_CIRCUIT_OPEN = REGISTRY.gauge("llm_circuit_open", "LLM断路器是否打开（1表示暂停请求）")
+
+
+def observe_llm_request(seconds: float, outcome: str):
+    """记录一次LLM请求耗时，outcome 为 success / error / rate_limited / malformed"""
+    LLM_REQUEST_SECONDS.observe(seconds, outcome=outcome)
+
+
+def set_queue_depth(queue: str, depth: int):
+    """更新队列深度"""
+    LLM_QUEUE_DEPTH.set(depth, queue=queue)
+
+
+def set_llm_concurrency(limit: int, inflight: int):
+    """更新LLM并发上限和正在进行的请求数"""
+    LLM_CONCURRENCY_LIMIT.set(limit)
+    LLM_INFLIGHT.set(inflight)
+
+
+def set_llm_circuit_open(is_open: bool):
+    """更新LLM断路器状态"""
+    LLM_CIRCUIT_OPEN.set(1 if is_open else 0)
+
+
+def mark_progress():
+    """记录处理进度时间戳，用于吞吐下降告警（如 time() - last_progress > 600）"""
+    LAST_PROGRESS.set(time.time())
+
+
+def _make_handler(registry: MetricsRegistry):
+    """创建 /metrics 请求处理类（http.server 只在启动HTTP端点时才导入）"""
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"metrics请求: {format % args}")
+
+    return MetricsHandler
+
+
+class MetricsExporter:
+    """
+    指标导出器
+
+    Args:
+        port: HTTP /metrics 端口，为0时不启动HTTP服务
+        textfile: textfile collector 文件路径（如 /var/lib/node_exporter/arxiv_daily.prom），为空时不写文件
+        interval: textfile 刷新间隔（秒）
+        registry: 指标注册表
+    """
+
+    def __init__(self, port: int = 0, textfile: str = "", interval: float = 15.0,
+                 registry: MetricsRegistry = REGISTRY, host: str = "0.0.0.0"):
+        self.port = port
+        self.textfile = textfile
+        self.interval = interval
+        self.registry = registry
+        self.host = host
+        self._server = None
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.port or self.textfile)
+
+    @property
+    def server_port(self) -> Optional[int]:
+        """HTTP服务实际监听的端口"""
+        return self._server.server_address[1] if self._server else None
+
+    def start(self) -> 'MetricsExporter':
+        RUN_STARTED.set(time.time())
+        mark_progress()
+
+        if self.port:
+            from http.server import ThreadingHTTPServer
+            self._server = ThreadingHTTPServer((self.host, self.port), _make_handler(self.registry))
+            self._server.daemon_threads = True
+            thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            logger.info(f"指标HTTP端点已启动: http://{self.host}:{self.server_port}/metrics")
+
+        if self.textfile:
+            thread = threading.Thread(target=self._textfile_loop, name="metrics-textfile", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            logger.info(f"指标将定期写入: {self.textfile}")
+        return self
+
+    def _textfile_loop(self):
+        while True:
+            try:
+                self.registry.write_textfile(self.textfile)
+            except Exception as e:
+                logger.warning(f"写入指标文件失败: {str(e)}")
+            if self._stop_event.wait(self.interval):
+                return
+
+    def stop(self):
+        """停止导出，textfile 会在停止前再写入一次最终值"""
+        self._stop_event.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self.textfile:
+            try:
+                self.registry.write_textfile(self.textfile)
+            except Exception as e:
+                logger.warning(f"写入指标文件失败: {str(e)}")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
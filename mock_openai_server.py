@@ -0,0 +1,269 @@
+"""
+本地模拟的OpenAI兼容 chat completions 服务：可配置延迟、错误率、429比例和固定的JSON回复，
+支持流式（stream=true）回复和按token的生成耗时，用于在不产生API费用的情况下做端到端吞吐测试
+"""
+
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from loguru import logger
+
+
+# 默认回复：一条合法的论文分析结果（task_category 使用压缩分类表的代码）
+DEFAULT_ANALYSIS_RESPONSE = {
+    "task_category": "C01",
+    "research_field": "机器人学",
+    "methods": "基于Transformer的视觉-语言-动作模型，在仿真环境中进行强化学习微调",
+    "contributions": "提出了一种统一的具身导航框架。在多个基准上取得了最优结果。",
+    "training_dataset": "Habitat-Matterport 3D",
+    "testing_dataset": "R2R; REVERIE",
+    "evaluation_metrics": "成功率(SR); SPL",
+    "confidence": 0.85,
+    "novelty_score": 4,
+}
+
+
+class MockOpenAIServer:
+    """
+    模拟的OpenAI兼容服务
+
+    Args:
+        latency: 每次请求的基础延迟（秒）
+        jitter: 在基础延迟上叠加的均匀随机抖动（秒）
+        error_rate: 返回500错误的概率
+        rate_limit_rate: 返回429错误的概率
+        response_content: 回复内容，dict会被序列化为JSON字符串，默认为 DEFAULT_ANALYSIS_RESPONSE
+        host: 监听地址
+        port: 监听端口，0表示自动分配
+        seed: 随机数种子，保证错误注入可复现
+        certfile: TLS证书文件，与 keyfile 一起提供时以HTTPS提供服务（用于测量TLS握手开销）
+        keyfile: TLS私钥文件
+        token_delay: 每生成一个token（约4个字符）的耗时（秒），模拟模型的生成速度
+        trailing_content: 附加在回复之后的多余内容（模拟JSON之后继续输出说明文字的模型）
+    """
+
+    # 流式回复每个片段的字符数（约一个token）
+    STREAM_CHUNK_CHARS = 4
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, response_content=None, host: str = "127.0.0.1",
+                 port: int = 0, seed: int = 42, certfile: Optional[str] = None, keyfile: Optional[str] = None,
+                 token_delay: float = 0.0, trailing_content: str = ""):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        if response_content is None:
+            response_content = DEFAULT_ANALYSIS_RESPONSE
+        if not isinstance(response_content, str):
+            response_content = json.dumps(response_content, ensure_ascii=False)
+        self.response_content = response_content + trailing_content
+        self.token_delay = token_delay
+        self.host = host
+        self.port = port
+        self.certfile = certfile
+        self.keyfile = keyfile
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self.stats: Dict[str, int] = {"requests": 0, "errors": 0, "rate_limited": 0, "connections": 0,
+                                  "streams_aborted": 0}
+
+    @property
+    def base_url(self) -> str:
+        """OpenAI客户端使用的 base_url"""
+        if self._server is None:
+            raise RuntimeError("模拟服务尚未启动")
+        scheme = "https" if self.certfile else "http"
+        return f"{scheme}://{self.host}:{self._server.server_address[1]}/v1"
+
+    def _next_outcome(self) -> Tuple[str, float]:
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self._random.random()
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if roll < self.rate_limit_rate:
+                self.stats["rate_limited"] += 1
+                return "rate_limited", delay
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.stats["errors"] += 1
+                return "error", delay
+            return "success", delay
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # 头部和正文分两次写出，关闭Nagle算法避免与客户端的延迟ACK叠加出约40ms的额外延迟
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                # 每个新建的TCP连接调用一次，用于统计连接复用情况
+                with server._lock:
+                    server.stats["connections"] += 1
+                super().setup()
+
+            def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+                body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_stream(self, model: str):
+                """以SSE分块发送回复，客户端提前断开时停止生成"""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+                content = server.response_content
+                size = server.STREAM_CHUNK_CHARS
+                pieces = [{"content": content[i:i + size]} for i in range(0, len(content), size)]
+                try:
+                    for i, delta in enumerate(pieces + [{}]):
+                        if delta and server.token_delay:
+                            time.sleep(server.token_delay)
+                        event = {
+                            "id": completion_id,
+                            "object": "chat.completion.chunk",
+                            "created": int(time.time()),
+                            "model": model,
+                            "choices": [{"index": 0, "delta": delta, "finish_reason": None if delta else "stop"}],
+                        }
+                        self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n")
+                    self._write_chunk("data: [DONE]\n\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    with server._lock:
+                        server.stats["streams_aborted"] += 1
+                    self.close_connection = True
+
+            def _write_chunk(self, text: str):
+                data = text.encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path.rstrip("/").endswith("/models"):
+                    self._send_json(200, {"object": "list", "data": [{"id": "mock", "object": "model"}]})
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b""
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+
+                outcome, delay = server._next_outcome()
+                if delay > 0:
+                    time.sleep(delay)
+
+                if outcome == "rate_limited":
+                    self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                                    headers={"Retry-After": "0"})
+                    return
+                if outcome == "error":
+                    self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                    return
+
+                try:
+                    request = json.loads(raw or b"{}")
+                except json.JSONDecodeError:
+                    self._send_json(400, {"error": {"message": "invalid JSON"}})
+                    return
+
+                if request.get("stream"):
+                    self._send_stream(request.get("model", "mock"))
+                    return
+
+                prompt_chars = sum(len(str(m.get("content", ""))) for m in request.get("messages", []))
+                prompt_tokens = max(prompt_chars // 4, 1)
+                completion_tokens = max(len(server.response_content) // 4, 1)
+                if server.token_delay:
+                    time.sleep(server.token_delay * completion_tokens)
+                self._send_json(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "mock"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": server.response_content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'MockOpenAIServer':
+        self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+        self._server.daemon_threads = True
+        if self.certfile:
+            import ssl
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(self.certfile, self.keyfile)
+            # 握手推迟到处理请求的线程中进行，不阻塞接受连接的线程
+            self._server.socket = context.wrap_socket(self._server.socket, server_side=True,
+                                                      do_handshake_on_connect=False)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        logger.info(f"模拟OpenAI服务已启动: {self.base_url}")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="启动本地模拟的OpenAI兼容服务")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0)
+    parser.add_argument("--token_delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with MockOpenAIServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          rate_limit_rate=args.rate_limit_rate, port=args.port,
+                          token_delay=args.token_delay) as mock_server:
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            logger.info(f"模拟服务已停止，统计: {mock_server.stats}")
@@ -0,0 +1,212 @@
+"""
+论文去重：合并同一arXiv ID的不同版本，并基于MinHash/LSH识别标题+摘要近似重复的论文
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass, field, replace
+from typing import Dict, List
+
+import numpy as np
+from loguru import logger
+
+
+# MinHash参数：128个哈希函数，分为32个band（每个band 4行）做LSH候选召回，
+# 候选对再用MinHash估计的Jaccard相似度做最终确认
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 32
+SHINGLE_SIZE = 3
+DEFAULT_SIMILARITY_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_MAX_HASH = (1 << 31) - 1
+
+
+@dataclass
+class DedupResult:
+    """去重结果"""
+    representatives: List = field(default_factory=list)
+    # 代表论文arXiv ID -> 近似重复论文列表（不含代表论文本身）
+    duplicates: Dict[str, List] = field(default_factory=dict)
+    # 因为是同一论文的不同版本而被合并的数量
+    merged_versions: int = 0
+
+    @property
+    def near_duplicate_count(self) -> int:
+        return sum(len(group) for group in self.duplicates.values())
+
+
+class MinHasher:
+    """基于词级shingle的MinHash签名生成器"""
+
+    def __init__(self, num_permutations: int = NUM_PERMUTATIONS, shingle_size: int = SHINGLE_SIZE,
+                 seed: int = 42):
+        rng = np.random.RandomState(seed)
+        self.num_permutations = num_permutations
+        self.shingle_size = shingle_size
+        self._a = rng.randint(1, _MERSENNE_PRIME, size=num_permutations).astype(np.uint64)
+        self._b = rng.randint(0, _MERSENNE_PRIME, size=num_permutations).astype(np.uint64)
+
+    def shingles(self, text: str) -> set:
+        """将文本规范化后切分为词级shingle"""
+        tokens = re.findall(r'[a-z0-9]+', text.lower())
+        if len(tokens) < self.shingle_size:
+            return {" ".join(tokens)} if tokens else set()
+        return {
+            " ".join(tokens[i:i + self.shingle_size])
+            for i in range(len(tokens) - self.shingle_size + 1)
+        }
+
+    def signature(self, text: str) -> np.ndarray:
+        """计算文本的MinHash签名"""
+        shingles = self.shingles(text)
+        if not shingles:
+            return np.full(self.num_permutations, _MAX_HASH, dtype=np.uint64)
+
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=4).digest(), 'little') & _MAX_HASH
+                for s in shingles
+            ),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        # (a * x + b) mod p，a、x均小于2^31，乘积不会溢出uint64
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+
+def estimate_similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    """用MinHash签名估计Jaccard相似度"""
+    return float(np.mean(sig_a == sig_b))
+
+
+def _paper_version(paper) -> int:
+    """从arXiv短ID中解析版本号"""
+    match = re.search(r'v(\d+)$', paper._paper.get_short_id())
+    return int(match.group(1)) if match else 0
+
+
+def _collapse_versions(papers: List) -> List:
+    """合并同一arXiv ID的多个版本，保留最新版本，保持原始顺序"""
+    latest = {}
+    order = []
+    for paper in papers:
+        arxiv_id = paper.arxiv_id
+        if arxiv_id not in latest:
+            latest[arxiv_id] = paper
+            order.append(arxiv_id)
+        elif _paper_version(paper) > _paper_version(latest[arxiv_id]):
+            latest[arxiv_id] = paper
+    return [latest[arxiv_id] for arxiv_id in order]
+
+
+def deduplicate_papers(papers: List, threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                       num_bands: int = LSH_BANDS, hasher: MinHasher = None) -> DedupResult:
+    """
+    论文去重
+
+    先按arXiv ID合并同一论文的不同版本，再用MinHash/LSH对标题+摘要做近似重复分组。
+    每组保留检索结果中排在最前的论文作为代表，只有代表论文会被送去LLM分析。
+
+    Args:
+        papers: EnhancedArxivPaper对象列表
+        threshold: 近似重复的Jaccard相似度阈值，<=0 表示只做版本合并
+        num_bands: LSH分带数量，必须能整除签名长度
+        hasher: 可选的MinHasher实例
+
+    Returns:
+        DedupResult对象
+    """
+    unique_papers = _collapse_versions(papers)
+    result = DedupResult(merged_versions=len(papers) - len(unique_papers))
+
+    if threshold <= 0 or len(unique_papers) < 2:
+        result.representatives = unique_papers
+        return result
+
+    hasher = hasher or MinHasher()
+    if hasher.num_permutations % num_bands != 0:
+        raise ValueError("签名长度必须能被LSH分带数量整除")
+    rows_per_band = hasher.num_permutations // num_bands
+
+    signatures = [hasher.signature(f"{paper.title} {paper.summary}") for paper in unique_papers]
+
+    # 并查集：父节点总是索引更小（检索排序更靠前）的论文
+    parent = list(range(len(unique_papers)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for band in range(num_bands):
+        buckets: Dict[bytes, List[int]] = {}
+        start = band * rows_per_band
+        for i, signature in enumerate(signatures):
+            key = signature[start:start + rows_per_band].tobytes()
+            buckets.setdefault(key, []).append(i)
+
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            for pos, i in enumerate(members):
+                for j in members[pos + 1:]:
+                    if (i, j) in checked:
+                        continue
+                    checked.add((i, j))
+                    if estimate_similarity(signatures[i], signatures[j]) >= threshold:
+                        root_i, root_j = find(i), find(j)
+                        if root_i != root_j:
+                            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(len(unique_papers)):
+        groups.setdefault(find(i), []).append(i)
+
+    for root in sorted(groups):
+        representative = unique_papers[root]
+        result.representatives.append(representative)
+        members = [unique_papers[i] for i in groups[root] if i != root]
+        if members:
+            result.duplicates[representative.arxiv_id] = members
+
+    logger.info(
+        f"去重完成: {len(papers)} 篇 -> {len(result.representatives)} 篇代表论文 "
+        f"(合并版本 {result.merged_versions} 篇, 近似重复 {result.near_duplicate_count} 篇)"
+    )
+    return result
+
+
+def expand_duplicate_analyses(analyses: List, dedup_result: DedupResult) -> List:
+    """
+    将代表论文的分析结果复用到同组的近似重复论文
+
+    Args:
+        analyses: 代表论文的EnhancedPaperAnalysis列表
+        dedup_result: deduplicate_papers的返回结果
+
+    Returns:
+        包含近似重复论文的完整分析结果列表
+    """
+    if not dedup_result.duplicates:
+        return analyses
+
+    expanded = []
+    for analysis in analyses:
+        expanded.append(analysis)
+        arxiv_id = re.sub(r'v\d+$', '', analysis.arxiv_url.rstrip('/').split('/')[-1])
+        for paper in dedup_result.duplicates.get(arxiv_id, []):
+            expanded.append(replace(
+                analysis,
+                title=paper.title,
+                authors="; ".join(paper.authors),
+                authors_with_affiliations=paper.authors_with_affiliations,
+                primary_affiliations=paper.primary_affiliations,
+                publication_date=paper.published_date,
+                arxiv_url=paper.entry_id,
+                arxiv_categories="; ".join(paper.categories),
+            ))
+    return expanded
@@ -0,0 +1,211 @@
+"""
+提示词构建器：用本地分词器统计token，限制作者数量、压缩分类表并按每篇论文的token预算裁剪摘要
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from loguru import logger
+
+from enhanced_config import ENHANCED_EXTRACTION_PROMPT_TEMPLATE, format_compact_classification_table
+
+
+# 摘要至少保留的token数，避免固定部分过长时摘要被完全裁掉
+MIN_ABSTRACT_TOKENS = 64
+
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+
+_encoding_lock = threading.Lock()
+_encodings: Dict[str, object] = {}
+
+
+def _load_encoding(encoding_name: str):
+    """加载tiktoken分词表（进程内只尝试一次，多个分析线程同时首次调用时只有一个线程加载），失败时返回None"""
+    if encoding_name in _encodings:
+        return _encodings[encoding_name]
+    with _encoding_lock:
+        if encoding_name not in _encodings:
+            try:
+                import tiktoken
+                _encodings[encoding_name] = tiktoken.get_encoding(encoding_name)
+            except Exception as e:
+                logger.warning(f"无法加载tiktoken分词表 {encoding_name}: {str(e)}，改为按字符估算token")
+                _encodings[encoding_name] = None
+        return _encodings[encoding_name]
+
+
+class TokenCounter:
+    """
+    token计数器
+
+    优先使用tiktoken的本地分词器；分词表不可用（如离线环境）时退化为按字符估算：
+    中日韩字符按1个token计，其余字符按每4个字符1个token计。
+    """
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        self.encoding_name = encoding_name
+
+    def _get_encoding(self):
+        return _load_encoding(self.encoding_name)
+
+    def count(self, text: str) -> int:
+        """统计文本的token数"""
+        encoding = self._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text))
+        cjk_chars = len(_CJK_PATTERN.findall(text))
+        return cjk_chars + (len(text) - cjk_chars + 3) // 4
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """将文本裁剪到不超过max_tokens个token，尽量在句子边界截断"""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+
+        # 为末尾的省略号预留token
+        max_tokens = max(max_tokens - 2, 1)
+        encoding = self._get_encoding()
+        if encoding is not None:
+            truncated = encoding.decode(encoding.encode(text)[:max_tokens])
+        else:
+            # 估算模式下用二分查找最长的合规前缀
+            low, high = 0, len(text)
+            while low < high:
+                mid = (low + high + 1) // 2
+                if self.count(text[:mid]) <= max_tokens:
+                    low = mid
+                else:
+                    high = mid - 1
+            truncated = text[:low]
+
+        boundary = max(truncated.rfind(". "), truncated.rfind("。"))
+        if boundary > len(truncated) // 2:
+            truncated = truncated[:boundary + 1]
+        return truncated.rstrip() + " …"
+
+
+@dataclass
+class PromptBudget:
+    """单篇论文的提示词预算"""
+    max_tokens: int = 2000
+    max_authors: int = 10
+    compact_table: bool = True
+    max_definition_chars: int = 40
+
+
+@dataclass
+class BuiltPrompt:
+    """构建完成的提示词"""
+    text: str
+    tokens: int
+    original_tokens: int
+    abstract_truncated: bool
+
+
+class PromptBuilder:
+    """按token预算构建论文分析提示词"""
+
+    def __init__(self, custom_categories: Optional[Dict] = None, budget: Optional[PromptBudget] = None,
+                 counter: Optional[TokenCounter] = None, full_classification_table: str = ""):
+        self.budget = budget or PromptBudget()
+        self.counter = counter or TokenCounter()
+        self.full_classification_table = full_classification_table
+        self.code_map: Dict[str, str] = {}
+        if self.budget.compact_table:
+            self.classification_table, self.code_map = format_compact_classification_table(
+                custom_categories, max_definition_chars=self.budget.max_definition_chars
+            )
+        else:
+            self.classification_table = full_classification_table
+
+        # 累计统计，用于衡量压缩效果（多个分析线程共用一个构建器，更新时加锁）
+        self._stats_lock = threading.Lock()
+        self.prompt_count = 0
+        self.total_tokens = 0
+        self.total_original_tokens = 0
+
+    @property
+    def signature(self) -> str:
+        """构建参数签名，参与分析结果的输入指纹"""
+        return (f"budget={self.budget.max_tokens};authors={self.budget.max_authors};"
+                f"compact={self.budget.compact_table};defs={self.budget.max_definition_chars}")
+
+    def format_authors(self, paper) -> str:
+        """作者列表最多保留max_authors位，其余以人数概括"""
+        authors = [a for a in paper.authors_with_affiliations.split("; ") if a]
+        if len(authors) <= self.budget.max_authors:
+            return "; ".join(authors)
+        kept = "; ".join(authors[:self.budget.max_authors])
+        return f"{kept} 等{len(authors)}位作者"
+
+    def build(self, paper) -> BuiltPrompt:
+        """
+        构建单篇论文的分析提示词
+
+        Args:
+            paper: EnhancedArxivPaper对象
+
+        Returns:
+            BuiltPrompt对象
+        """
+        authors = self.format_authors(paper)
+        fixed_tokens = self.counter.count(ENHANCED_EXTRACTION_PROMPT_TEMPLATE.format(
+            title=paper.title,
+            abstract="",
+            authors=authors,
+            classification_table=self.classification_table
+        ))
+        abstract_budget = max(self.budget.max_tokens - fixed_tokens, MIN_ABSTRACT_TOKENS)
+        abstract = self.counter.truncate(paper.summary, abstract_budget)
+
+        text = ENHANCED_EXTRACTION_PROMPT_TEMPLATE.format(
+            title=paper.title,
+            abstract=abstract,
+            authors=authors,
+            classification_table=self.classification_table
+        )
+        original_tokens = self.counter.count(ENHANCED_EXTRACTION_PROMPT_TEMPLATE.format(
+            title=paper.title,
+            abstract=paper.summary,
+            authors=paper.authors_with_affiliations,
+            classification_table=self.full_classification_table
+        ))
+        built = BuiltPrompt(
+            text=text,
+            tokens=self.counter.count(text),
+            original_tokens=original_tokens,
+            abstract_truncated=abstract != paper.summary,
+        )
+
+        with self._stats_lock:
+            self.prompt_count += 1
+            self.total_tokens += built.tokens
+            self.total_original_tokens += built.original_tokens
+        return built
+
+    def decode_category(self, value: str) -> str:
+        """将LLM返回的类别代码映射回类别名称（如 "C03" 或 "C03 主动物体检测"）"""
+        if not self.code_map or not isinstance(value, str):
+            return value
+        match = re.match(r'\s*(C\d{2,})\b', value)
+        if match and match.group(1) in self.code_map:
+            return self.code_map[match.group(1)]
+        return value
+
+    def log_stats(self):
+        """输出累计的token统计"""
+        with self._stats_lock:
+            prompt_count, total_tokens, total_original_tokens = (
+                self.prompt_count, self.total_tokens, self.total_original_tokens)
+        if not prompt_count:
+            return
+        average = total_tokens / prompt_count
+        original_average = total_original_tokens / prompt_count
+        reduction = 1 - total_tokens / total_original_tokens if total_original_tokens else 0
+        logger.info(
+            f"提示词token统计: 平均 {average:.0f} (压缩前 {original_average:.0f}，减少 {reduction * 100:.1f}%)"
+        )
@@ -0,0 +1,236 @@
+"""
+arXiv检索查询规划：把检索词和研究领域过多、或结果数超过arXiv结果窗口的大查询
+按 检索词 × 研究领域 × 日期区间 拆分为多个子查询，并发执行后去重合并
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from user_config import UserConfig
+from instrumentation import incr, span
+
+if TYPE_CHECKING:
+    from enhanced_paper import EnhancedArxivPaper
+    from search_executor import SearchOutcome
+
+
+# arXiv API深翻页时会返回空页或报错，单个查询能可靠取回的结果数
+DEFAULT_RESULT_WINDOW = 10000
+
+# Atom分页头中查询结果总数的元素
+OPENSEARCH_TOTAL_RESULTS = "{http://a9.com/-/spec/opensearch/1.1/}totalResults"
+ESTIMATE_RETRIES = 3
+
+_settings = {
+    # 单个子查询最多包含的检索词/研究领域数量
+    "max_keywords": int(os.environ.get("QUERY_MAX_KEYWORDS") or 8),
+    "max_categories": int(os.environ.get("QUERY_MAX_CATEGORIES") or 4),
+    "result_window": int(os.environ.get("QUERY_RESULT_WINDOW") or DEFAULT_RESULT_WINDOW),
+    # 并发执行子查询的线程数（所有线程共享arXiv请求间隔，并发只重叠解析和过滤，不提高请求频率）
+    "workers": int(os.environ.get("QUERY_WORKERS") or 3),
+}
+
+
+def configure_query_planner(max_keywords: Optional[int] = None, max_categories: Optional[int] = None,
+                            result_window: Optional[int] = None, workers: Optional[int] = None):
+    """设置查询拆分阈值和并发数，参数为None时保持原值"""
+    for name, value in (("max_keywords", max_keywords), ("max_categories", max_categories),
+                        ("result_window", result_window), ("workers", workers)):
+        if value is not None:
+            if value <= 0:
+                raise ValueError(f"{name} 必须大于0")
+            _settings[name] = value
+
+
+@dataclass
+class QueryShard:
+    """一个子查询：检索词、研究领域和日期区间的一个分片"""
+    keywords: List[str]
+    categories: List[str]
+    start_date: str
+    end_date: str
+    estimated_results: Optional[int] = None
+
+    def to_config(self, base: UserConfig) -> UserConfig:
+        return replace(base, search_keywords=list(self.keywords), research_categories=list(self.categories),
+                       start_date=self.start_date, end_date=self.end_date)
+
+    def split_dates(self) -> List['QueryShard']:
+        """按日期区间对半拆分，区间只有一天时无法再拆分"""
+        start = datetime.strptime(self.start_date, "%Y-%m-%d")
+        end = datetime.strptime(self.end_date, "%Y-%m-%d")
+        if end <= start:
+            return [self]
+        middle = start + (end - start) // 2
+        return [
+            replace(self, end_date=middle.strftime("%Y-%m-%d"), estimated_results=None),
+            replace(self, start_date=(middle + timedelta(days=1)).strftime("%Y-%m-%d"), estimated_results=None),
+        ]
+
+
+@dataclass
+class QueryPlan:
+    """查询规划结果"""
+    base: UserConfig
+    shards: List[QueryShard] = field(default_factory=list)
+
+    @property
+    def is_split(self) -> bool:
+        return len(self.shards) > 1
+
+    def queries(self) -> List[str]:
+        from enhanced_main import build_search_query
+        return [build_search_query(shard.to_config(self.base)) for shard in self.shards]
+
+
+def _chunks(items: List[str], size: int) -> List[List[str]]:
+    if not items:
+        return [[]]
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def estimate_result_count(query: str) -> int:
+    """
+    只请求一条结果，从原始Atom响应的 opensearch:totalResults 读取查询的结果总数
+
+    直接解析响应XML，不依赖arxiv库内部的分页解析结果（不同版本的字段不同）。
+    """
+    from urllib.parse import urlencode
+    from xml.etree import ElementTree
+    from arxiv_replay import make_arxiv_client
+
+    client = make_arxiv_client(num_retries=3, delay_seconds=3, page_size=1)
+    url = client.query_url_format.format(urlencode({
+        "search_query": query, "id_list": "", "sortBy": "submittedDate", "sortOrder": "descending",
+        "start": 0, "max_results": 1,
+    }))
+    for attempt in range(ESTIMATE_RETRIES + 1):
+        response = client._session.get(url)
+        if response.status_code == 200:
+            break
+        logger.warning(f"估计结果数请求失败 (HTTP {response.status_code})，第 {attempt + 1} 次")
+    else:
+        raise RuntimeError(f"估计结果数请求失败 (HTTP {response.status_code}): {query}")
+
+    total = ElementTree.fromstring(response.content).findtext(OPENSEARCH_TOTAL_RESULTS)
+    if total is None:
+        raise ValueError(f"arXiv响应中没有 opensearch:totalResults: {query}")
+    return int(total)
+
+
+def plan_query(config: UserConfig, estimate: Optional[Callable[[str], int]] = None) -> QueryPlan:
+    """
+    规划检索查询
+
+    1. 检索词/研究领域超过阈值时按 检索词分组 × 研究领域分组 拆分（不需要额外请求）；
+    2. 需要的论文数超过结果窗口时，估计各子查询的结果数，超过窗口的子查询按日期区间继续对半拆分，
+       估计结果为0的子查询直接丢弃。
+
+    Args:
+        config: 用户配置
+        estimate: 查询 -> 结果数的估计函数，默认为 estimate_result_count
+
+    Returns:
+        QueryPlan对象，只有一个分片时与不拆分的原查询相同
+    """
+    from enhanced_main import build_search_query
+
+    estimate = estimate or estimate_result_count
+    window = _settings["result_window"]
+    shards = [
+        QueryShard(keywords, categories, config.start_date, config.end_date)
+        for keywords in _chunks(config.search_keywords, _settings["max_keywords"])
+        for categories in _chunks(config.research_categories, _settings["max_categories"])
+    ]
+
+    if config.max_papers > window:
+        pending, shards = shards, []
+        with span("search.plan_estimate"):
+            while pending:
+                shard = pending.pop(0)
+                shard.estimated_results = estimate(build_search_query(shard.to_config(config)))
+                incr("query_estimates")
+                if shard.estimated_results == 0:
+                    continue
+                parts = shard.split_dates() if shard.estimated_results > window else [shard]
+                if len(parts) == 1:
+                    if shard.estimated_results > window:
+                        logger.warning(f"子查询在单日内仍有 {shard.estimated_results} 篇结果，超出结果窗口部分将被截断")
+                    shards.append(shard)
+                else:
+                    pending = parts + pending
+
+    plan = QueryPlan(base=config, shards=shards)
+    if plan.is_split:
+        logger.info(f"检索查询拆分为 {len(shards)} 个子查询（检索词 {len(config.search_keywords)} 个，"
+                    f"研究领域 {len(config.research_categories)} 个）")
+    return plan
+
+
+def _fetch_shard(plan: QueryPlan, shard: QueryShard, predicate: Optional[Callable] = None,
+                 skip: Optional[Callable] = None) -> 'SearchOutcome':
+    from enhanced_main import build_search_query
+    from enhanced_paper import EnhancedArxivPaper
+    from search_executor import default_max_fetch, execute_search
+
+    max_papers = plan.base.max_papers
+    max_fetch = None
+    if shard.estimated_results is not None:
+        # 多取一篇：取回的论文数不超过估计结果数时说明子查询的结果已取完
+        max_fetch = min(default_max_fetch(max_papers, predicate is not None or skip is not None),
+                        shard.estimated_results + 1)
+    return execute_search(build_search_query(shard.to_config(plan.base)), max_papers, EnhancedArxivPaper,
+                          predicate=predicate, max_fetch=max_fetch, skip=skip, desc="检索子查询")
+
+
+def execute_plan(plan: QueryPlan, workers: Optional[int] = None) -> List['EnhancedArxivPaper']:
+    """
+    并发执行各子查询，按arXiv ID（不含版本号）去重后按提交日期倒序合并
+
+    每个子查询都按提交日期倒序取至多 max_papers 篇，因此合并后的前 max_papers 篇与不拆分时一致。
+
+    Returns:
+        EnhancedArxivPaper列表，至多 max_papers 篇
+    """
+    return search_plan(plan, workers).papers
+
+
+def search_plan(plan: QueryPlan, workers: Optional[int] = None, predicate: Optional[Callable] = None,
+                skip: Optional[Callable] = None) -> 'SearchOutcome':
+    """
+    同 execute_plan，但各子查询在翻页时就应用过滤条件（见 execute_search），每个子查询凑够 max_papers 篇
+    匹配论文后停止翻页，合并的是过滤后的论文
+
+    Args:
+        plan: 查询规划
+        workers: 并发线程数
+        predicate: 本地过滤条件
+        skip: 在包装之前判断是否跳过的条件（如已处理过的论文）
+
+    Returns:
+        SearchOutcome对象：fetched/skipped 为各子查询的合计；每个子查询都已取完、且合并后没有截断时 exhausted 为True
+    """
+    from search_executor import SearchOutcome
+
+    max_papers = plan.base.max_papers
+    workers = min(workers or _settings["workers"], len(plan.shards)) or 1
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arxiv-shard") as executor:
+        shard_outcomes = list(executor.map(lambda shard: _fetch_shard(plan, shard, predicate, skip), plan.shards))
+
+    merged: Dict[str, 'EnhancedArxivPaper'] = {}
+    for shard_outcome in shard_outcomes:
+        for paper in shard_outcome.papers:
+            merged.setdefault(paper.arxiv_id, paper)
+
+    fetched = sum(shard_outcome.fetched for shard_outcome in shard_outcomes)
+    incr("query_shards", len(plan.shards))
+    logger.info(f"{len(plan.shards)} 个子查询共获取 {fetched} 篇论文，匹配的论文去重后 {len(merged)} 篇")
+    papers = sorted(merged.values(), key=lambda paper: paper._paper.published, reverse=True)
+    exhausted = len(papers) <= max_papers and all(shard_outcome.exhausted for shard_outcome in shard_outcomes)
+    return SearchOutcome(papers=papers[:max_papers], fetched=fetched,
+                         skipped=sum(shard_outcome.skipped for shard_outcome in shard_outcomes), exhausted=exhausted)
@@ -163,35 +163,76 @@ def confirm_config(preset_name, config):
 
 
 def run_analysis(api_key, config, output_dir="output"):
-    """运行论文分析"""
-    # 保存配置
+    """在当前进程中运行论文分析（多次运行复用同一个LLM客户端）"""
+    # 延迟导入：只有真正开始分析时才加载检索/分析相关模块
+    from enhanced_main import DEFAULT_DEDUP_THRESHOLD, make_prompt_budget, run_pipeline
+    from llm import ensure_global_llm
+    
+    # 保存配置，便于之后用 enhanced_main.py reanalyze/reclassify 复用
     save_user_config(config)
     print("✅ 配置已保存")
     
-    # 构建命令行参数
-    cmd_args = [
-        "python", "enhanced_main.py",
-        "--openai_api_key", api_key,
-        "--output_dir", output_dir,
-        "--skip_setup"  # 跳过交互配置
-    ]
-    
     print(f"\n🚀 开始分析论文...")
     print(f"📁 结果将保存到: {output_dir}")
     print("-" * 40)
     
-    # 执行分析
-    import subprocess
     try:
-        result = subprocess.run(cmd_args, check=True, capture_output=False)
-        print("\n✅ 分析完成！")
-        return True
-    except subprocess.CalledProcessError as e:
+        ensure_global_llm(
+            api_key=api_key,
+            base_url=os.environ.get('OPENAI_API_BASE') or 'https://api.openai.com/v1',
+            model=os.environ.get('MODEL_NAME') or 'gpt-4o',
+            lang="Chinese"
+        )
+        # 与 enhanced_main.py 命令行的默认去重阈值和提示词预算相同
+        result = run_pipeline(config, output_dir, dedup_threshold=DEFAULT_DEDUP_THRESHOLD,
+                              prompt_budget=make_prompt_budget())
+    except KeyboardInterrupt:
+        print("\n⚠️ 用户中断分析")
+        return False
+    except Exception as e:
         print(f"\n❌ 分析失败: {e}")
         return False
+    
+    if not result.analyses:
+        print("\n⚠️ 没有得到分析结果")
+        return False
+    
+    print("\n✅ 分析完成！")
+    print(f"📄 详细结果: {result.csv_path}")
+    return True
+
+
+def run_batch_analysis(api_key, preset_keys, output_dir="output"):
+    """批量运行多个预设配置：共享一次检索，相同分类表下每篇论文只分析一次，结果按预设写入各自的子目录"""
+    from batch_runner import run_batch
+    from llm import ensure_global_llm
+    
+    presets = get_preset_configs()
+    configs = {f"preset_{key}": presets[key]["config"] for key in preset_keys}
+    
+    print(f"\n🚀 批量分析 {len(configs)} 个预设配置...")
+    print(f"📁 结果将保存到: {output_dir}/preset_<编号>")
+    print("-" * 40)
+    
+    try:
+        ensure_global_llm(
+            api_key=api_key,
+            base_url=os.environ.get('OPENAI_API_BASE') or 'https://api.openai.com/v1',
+            model=os.environ.get('MODEL_NAME') or 'gpt-4o',
+            lang="Chinese"
+        )
+        results = run_batch(configs, output_dir)
     except KeyboardInterrupt:
         print("\n⚠️ 用户中断分析")
         return False
+    except Exception as e:
+        print(f"\n❌ 批量分析失败: {e}")
+        return False
+    
+    for name, result in results.items():
+        status = f"{len(result.analyses)} 篇 -> {result.csv_path}" if result.analyses else "没有得到分析结果"
+        print(f"  {name}: {status}")
+    return any(result.analyses for result in results.values())
 
 
 def main():
@@ -199,8 +240,13 @@ def main():
     parser = argparse.ArgumentParser(description='快速启动学术论文分析')
     parser.add_argument('--api_key', type=str, help='OpenAI API密钥')
     parser.add_argument('--output_dir', type=str, default='output', help='输出目录')
+    parser.add_argument('--batch', type=str, default='',
+                        help='非交互地批量运行预设配置（编号逗号分隔，如 1,2,3；all表示全部预设）')
     args = parser.parse_args()
     
+    from dotenv import load_dotenv
+    load_dotenv(override=True)
+    
     # 获取API密钥
     api_key = args.api_key or os.environ.get('OPENAI_API_KEY')
     if not api_key:
@@ -209,6 +255,15 @@ def main():
         print("方法2: 设置环境变量 OPENAI_API_KEY")
         sys.exit(1)
     
+    if args.batch:
+        presets = get_preset_configs()
+        keys = list(presets) if args.batch == 'all' else [key.strip() for key in args.batch.split(',') if key.strip()]
+        unknown = [key for key in keys if key not in presets]
+        if unknown:
+            print(f"❌ 未知的预设编号: {', '.join(unknown)}")
+            sys.exit(1)
+        sys.exit(0 if run_batch_analysis(api_key, keys, args.output_dir) else 1)
+    
     try:
         while True:
             display_presets()
@@ -220,8 +275,8 @@ def main():
             elif choice == '7':
                 print("🔧 启动交互式配置模式...")
                 # 运行完整的交互式配置
-                cmd_args = ["python", "enhanced_main.py", "--openai_api_key", api_key]
-                subprocess.run(cmd_args)
+                from enhanced_main import interactive_setup
+                run_analysis(api_key, interactive_setup(), args.output_dir)
                 break
             else:
                 # 使用预设配置
@@ -0,0 +1,211 @@
+"""
+检索结果的并行规范化：翻页线程只从arxiv.Result中取出原始字段，按批交给进程池做ID规范化、
+作者/日期格式化和计算机科学相关性判断，得到紧凑、可pickle的PaperRecord，
+大批量检索时网络翻页不会被CPU计算阻塞
+"""
+
+import os
+import queue
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Tuple, Union
+
+from loguru import logger
+
+from instrumentation import incr
+
+if TYPE_CHECKING:
+    import arxiv
+
+
+_settings = {
+    # 规范化进程数，0表示在当前线程中直接包装arxiv.Result（默认）
+    "workers": int(os.environ.get("NORMALIZE_WORKERS") or 0),
+    # 每批交给进程池的结果数，与arXiv API的默认分页大小一致
+    "batch_size": int(os.environ.get("NORMALIZE_BATCH_SIZE") or 100),
+}
+
+_DONE = object()
+
+# 翻页线程取出的原始字段:
+# (entry_id, title, summary, authors, categories, primary_category, published, pdf_url)
+RawResult = Tuple[str, str, str, Tuple[str, ...], Tuple[str, ...], str, datetime, Optional[str]]
+
+
+def configure_normalizer(workers: Optional[int] = None, batch_size: Optional[int] = None):
+    """设置规范化进程数和批大小，参数为None时保持原值"""
+    if workers is not None:
+        if workers < 0:
+            raise ValueError("workers 不能小于0")
+        _settings["workers"] = workers
+    if batch_size is not None:
+        if batch_size <= 0:
+            raise ValueError("batch_size 必须大于0")
+        _settings["batch_size"] = batch_size
+
+
+@dataclass
+class PaperRecord:
+    """规范化后的检索结果"""
+    entry_id: str
+    short_id: str
+    arxiv_id: str
+    version: int
+    title: str
+    summary: str
+    authors: Tuple[str, ...]
+    categories: Tuple[str, ...]
+    primary_category: str
+    published: datetime
+    published_date: str
+    pdf_url: Optional[str]
+    cs_related: bool
+
+    def get_short_id(self) -> str:
+        """与 arxiv.Result.get_short_id 相同，可直接传给 SeenFilter.contains_result"""
+        return self.short_id
+
+    def to_result(self) -> 'arxiv.Result':
+        """重建arxiv.Result"""
+        import arxiv
+
+        links = []
+        if self.pdf_url:
+            links.append(arxiv.Result.Link(self.pdf_url, title="pdf", content_type="application/pdf"))
+        return arxiv.Result(
+            entry_id=self.entry_id,
+            published=self.published,
+            title=self.title,
+            authors=[arxiv.Result.Author(name) for name in self.authors],
+            summary=self.summary,
+            primary_category=self.primary_category,
+            categories=list(self.categories),
+            links=links,
+        )
+
+
+def raw_result(result) -> RawResult:
+    """翻页线程中只做属性读取，不做任何格式化"""
+    return (result.entry_id, result.title, result.summary, tuple(author.name for author in result.authors),
+            tuple(result.categories), result.primary_category, result.published, result.pdf_url)
+
+
+def normalize_raw(raw: RawResult) -> PaperRecord:
+    """规范化一条原始结果：解析ID和版本号、格式化日期、判断计算机科学相关性"""
+    from enhanced_paper import is_cs_related_text
+
+    entry_id, title, summary, authors, categories, primary_category, published, pdf_url = raw
+    short_id = entry_id.split("arxiv.org/abs/")[-1]
+    match = re.search(r'v(\d+)$', short_id)
+    return PaperRecord(
+        entry_id=entry_id,
+        short_id=short_id,
+        arxiv_id=short_id[:match.start()] if match else short_id,
+        version=int(match.group(1)) if match else 0,
+        title=title,
+        summary=summary,
+        authors=authors,
+        categories=categories,
+        primary_category=primary_category or "",
+        published=published,
+        published_date=published.strftime("%Y-%m-%d"),
+        pdf_url=pdf_url,
+        cs_related=is_cs_related_text(categories, title, summary),
+    )
+
+
+def normalize_batch(raws: List[RawResult]) -> List[PaperRecord]:
+    """进程池任务：规范化一批原始结果"""
+    return [normalize_raw(raw) for raw in raws]
+
+
+def wrap_result(wrap, item: Union['arxiv.Result', PaperRecord]):
+    """
+    把 iter_results 产出的元素包装为论文对象
+
+    wrap 提供 from_record（如 EnhancedArxivPaper）时直接使用规范化结果，否则先重建arxiv.Result。
+    """
+    if isinstance(item, PaperRecord):
+        from_record = getattr(wrap, "from_record", None)
+        return from_record(item) if from_record is not None else wrap(item.to_result())
+    return wrap(item)
+
+
+def iter_results(results: Iterable, workers: Optional[int] = None,
+                 batch_size: Optional[int] = None) -> Iterator[Union['arxiv.Result', PaperRecord]]:
+    """
+    按原顺序产出检索结果
+
+    规范化进程数为0时原样产出arxiv.Result；否则由后台线程翻页，按批交给进程池规范化后产出PaperRecord。
+    调用方提前停止迭代时后台线程在取完当前结果后停止翻页。
+    """
+    workers = _settings["workers"] if workers is None else workers
+    if workers <= 0:
+        yield from results
+        return
+    yield from _iter_pooled(results, workers, batch_size or _settings["batch_size"])
+
+
+def _iter_pooled(results: Iterable, workers: int, batch_size: int) -> Iterator[PaperRecord]:
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # 队列容量限制了翻页线程最多领先消费方的批数，提前停止时不会多翻太多页
+    pending: queue.Queue = queue.Queue(maxsize=max(2, workers))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(executor):
+        try:
+            batch: List[RawResult] = []
+            for result in results:
+                if stop.is_set():
+                    return
+                batch.append(raw_result(result))
+                if len(batch) >= batch_size:
+                    if not put(executor.submit(normalize_batch, batch)):
+                        return
+                    batch = []
+            if batch:
+                put(executor.submit(normalize_batch, batch))
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    # 翻页线程运行时创建子进程，使用spawn避免fork复制其他线程持有的锁
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        producer = threading.Thread(target=produce, args=(executor,), name="arxiv-fetch", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                records = item.result()
+                incr("normalize_batches")
+                incr("normalize_records", len(records))
+                yield from records
+        finally:
+            stop.set()
+            while True:
+                try:
+                    item = pending.get_nowait()
+                except queue.Empty:
+                    break
+                if hasattr(item, "cancel"):
+                    item.cancel()
+            producer.join(timeout=1)
+            if producer.is_alive():
+                logger.debug("翻页线程仍在等待当前请求返回，已在后台停止")
@@ -0,0 +1,299 @@
+"""
+分析结果存储：使用SQLite保存论文元数据和分析结果，并记录生成分析时的提示词/分类表/模型指纹
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import asdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from enhanced_paper_analyzer import EnhancedPaperAnalysis
+
+
+# 指纹字段：任何一项变化都意味着已存储的分析结果需要重新生成
+FINGERPRINT_FIELDS = ("template_hash", "taxonomy_hash", "model")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS papers (
+    arxiv_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    entry_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    authors TEXT NOT NULL,
+    categories TEXT NOT NULL,
+    primary_category TEXT NOT NULL,
+    published TEXT NOT NULL,
+    pdf_url TEXT,
+    analysis TEXT,
+    template_hash TEXT,
+    taxonomy_hash TEXT,
+    model TEXT,
+    analyzed_at TEXT,
+    one_line_summary TEXT
+);
+"""
+
+# 旧版本数据库缺少的列
+_MIGRATIONS = {
+    "one_line_summary": "ALTER TABLE papers ADD COLUMN one_line_summary TEXT",
+}
+
+# 一句话摘要的最大长度（字符）
+ONE_LINE_SUMMARY_MAX_CHARS = 120
+
+
+class ResultsStore:
+    """基于SQLite的论文分析结果存储"""
+
+    DB_FILE = "results.db"
+
+    def __init__(self, db_path: str = "output/results.db"):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        existing_columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(papers)")}
+        for column, statement in _MIGRATIONS.items():
+            if column not in existing_columns:
+                self._conn.execute(statement)
+        self._conn.commit()
+
+    @classmethod
+    def for_output_dir(cls, output_dir: str) -> 'ResultsStore':
+        """打开输出目录下的结果存储"""
+        return cls(os.path.join(output_dir, cls.DB_FILE))
+
+    def close(self):
+        self._conn.close()
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def save_analysis(self, paper, analysis: EnhancedPaperAnalysis, fingerprint: Dict[str, str]):
+        """
+        保存论文元数据和分析结果
+
+        Args:
+            paper: EnhancedArxivPaper对象
+            analysis: 分析结果
+            fingerprint: 生成该分析结果时的输入指纹（见 EnhancedPaperAnalyzer.input_fingerprint）
+        """
+        record = _paper_record(paper)
+        record.update({
+            "analysis": json.dumps(asdict(analysis), ensure_ascii=False),
+            "template_hash": fingerprint.get("template_hash"),
+            "taxonomy_hash": fingerprint.get("taxonomy_hash"),
+            "model": fingerprint.get("model"),
+            "analyzed_at": datetime.now().isoformat(),
+            "one_line_summary": make_one_line_summary(analysis),
+        })
+        columns = ", ".join(record.keys())
+        placeholders = ", ".join("?" for _ in record)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO papers ({columns}) VALUES ({placeholders})",
+                list(record.values()),
+            )
+            self._conn.commit()
+
+    def save_analyses(self, papers: List, analyses: List[EnhancedPaperAnalysis], fingerprint: Dict[str, str]) -> int:
+        """
+        批量保存分析结果，按arXiv链接将分析结果与论文对应
+
+        Returns:
+            保存的记录数量
+        """
+        papers_by_url = {paper.entry_id: paper for paper in papers}
+        saved = 0
+        for analysis in analyses:
+            paper = papers_by_url.get(analysis.arxiv_url)
+            if paper is None:
+                continue
+            self.save_analysis(paper, analysis, fingerprint)
+            saved += 1
+        logger.info(f"已保存 {saved} 条分析结果到 {self.db_path}")
+        return saved
+
+    def update_classification(self, arxiv_id: str, task_category: str, confidence: float, taxonomy_hash: str):
+        """
+        原地更新已存储分析结果的任务分类和置信度
+
+        Args:
+            arxiv_id: arXiv ID（不含版本号）
+            task_category: 新的任务分类
+            confidence: 新的分类置信度
+            taxonomy_hash: 新分类表的指纹
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT analysis FROM papers WHERE arxiv_id = ?", (arxiv_id,)).fetchone()
+            if row is None or not row["analysis"]:
+                raise KeyError(f"结果存储中没有论文 {arxiv_id} 的分析结果")
+            data = json.loads(row["analysis"])
+            data["task_category"] = task_category
+            data["confidence"] = confidence
+            self._conn.execute(
+                "UPDATE papers SET analysis = ?, taxonomy_hash = ?, analyzed_at = ? WHERE arxiv_id = ?",
+                (json.dumps(data, ensure_ascii=False), taxonomy_hash, datetime.now().isoformat(), arxiv_id),
+            )
+            self._conn.commit()
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    def get_one_line_summary(self, arxiv_id: str) -> Optional[Dict[str, str]]:
+        """
+        获取重新分类所需的缓存信息
+
+        Returns:
+            {"title": 标题, "one_line_summary": 一句话摘要} 或None
+        """
+        row = self._fetchone("SELECT title, one_line_summary, analysis FROM papers WHERE arxiv_id = ?", (arxiv_id,))
+        if row is None:
+            return None
+        summary = row["one_line_summary"]
+        if not summary and row["analysis"]:
+            summary = make_one_line_summary(EnhancedPaperAnalysis(**json.loads(row["analysis"])))
+        return {"title": row["title"], "one_line_summary": summary or row["title"]}
+
+    def get_analysis(self, arxiv_id: str) -> Optional[EnhancedPaperAnalysis]:
+        """按arXiv ID（不含版本号）获取分析结果"""
+        row = self._fetchone("SELECT analysis FROM papers WHERE arxiv_id = ?", (arxiv_id,))
+        if row is None or not row["analysis"]:
+            return None
+        return EnhancedPaperAnalysis(**json.loads(row["analysis"]))
+
+    def get_fingerprint(self, arxiv_id: str) -> Optional[Dict[str, str]]:
+        """获取已存储分析结果的输入指纹"""
+        row = self._fetchone(
+            "SELECT template_hash, taxonomy_hash, model FROM papers WHERE arxiv_id = ?", (arxiv_id,)
+        )
+        if row is None:
+            return None
+        return {name: row[name] for name in FINGERPRINT_FIELDS}
+
+    def load_paper(self, arxiv_id: str):
+        """
+        从存储中重建EnhancedArxivPaper对象，无需重新请求arXiv
+
+        Returns:
+            EnhancedArxivPaper对象或None
+        """
+        row = self._fetchone("SELECT * FROM papers WHERE arxiv_id = ?", (arxiv_id,))
+        if row is None:
+            return None
+        return _paper_from_row(row)
+
+    def all_analyses(self) -> List[EnhancedPaperAnalysis]:
+        """获取全部分析结果"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT analysis FROM papers WHERE analysis IS NOT NULL ORDER BY published DESC"
+            ).fetchall()
+        return [EnhancedPaperAnalysis(**json.loads(row["analysis"])) for row in rows]
+
+    def find_stale(self, fingerprint: Dict[str, str]) -> Dict[str, List[str]]:
+        """
+        查找输入指纹与当前不一致的分析结果
+
+        Args:
+            fingerprint: 当前的输入指纹
+
+        Returns:
+            {arxiv_id: [发生变化的指纹字段]}
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT arxiv_id, template_hash, taxonomy_hash, model FROM papers WHERE analysis IS NOT NULL"
+            ).fetchall()
+
+        stale = {}
+        for row in rows:
+            changed = [name for name in FINGERPRINT_FIELDS if row[name] != fingerprint.get(name)]
+            if changed:
+                stale[row["arxiv_id"]] = changed
+        return stale
+
+    def count(self) -> int:
+        """已存储的论文数量"""
+        return self._fetchone("SELECT COUNT(*) AS n FROM papers")["n"]
+
+    def count_analyzed(self) -> int:
+        """已有分析结果的论文数量"""
+        return self._fetchone("SELECT COUNT(*) AS n FROM papers WHERE analysis IS NOT NULL")["n"]
+
+    def has_analysis(self, arxiv_id: str, version: int = 0) -> bool:
+        """该论文的此版本（或更新的版本）是否已有分析结果，存储中没有版本号的记录视为v1"""
+        row = self._fetchone("SELECT version FROM papers WHERE arxiv_id = ? AND analysis IS NOT NULL", (arxiv_id,))
+        return row is not None and max(row["version"], 1) >= version
+
+    def analyzed_versions(self) -> List[Tuple[str, int]]:
+        """已有分析结果的 (arXiv ID, 版本号) 列表"""
+        with self._lock:
+            rows = self._conn.execute("SELECT arxiv_id, version FROM papers WHERE analysis IS NOT NULL").fetchall()
+        return [(row["arxiv_id"], row["version"]) for row in rows]
+
+    def _fetchone(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+
+def make_one_line_summary(analysis: EnhancedPaperAnalysis) -> str:
+    """从分析结果的贡献（或方法）描述中截取第一句作为一句话摘要"""
+    for text in (analysis.contributions, analysis.methods):
+        text = (text or "").strip()
+        if not text or text == "未明确说明":
+            continue
+        sentence = re.split(r'(?<=[。！？!?；;])|(?<=\.)\s', text, maxsplit=1)[0].strip()
+        return sentence[:ONE_LINE_SUMMARY_MAX_CHARS]
+    return analysis.title[:ONE_LINE_SUMMARY_MAX_CHARS]
+
+
+def _paper_record(paper) -> Dict:
+    """将EnhancedArxivPaper转换为数据库记录"""
+    short_id = paper._paper.get_short_id()
+    match = re.search(r'v(\d+)$', short_id)
+    return {
+        "arxiv_id": paper.arxiv_id,
+        "version": int(match.group(1)) if match else 0,
+        "entry_id": paper.entry_id,
+        "title": paper.title,
+        "summary": paper.summary,
+        "authors": json.dumps(paper.authors, ensure_ascii=False),
+        "categories": json.dumps(list(paper.categories), ensure_ascii=False),
+        "primary_category": paper.primary_category or "",
+        "published": paper._paper.published.isoformat(),
+        "pdf_url": paper.pdf_url,
+    }
+
+
+def _paper_from_row(row):
+    """用存储的元数据重建arxiv.Result，再包装为EnhancedArxivPaper"""
+    import arxiv
+    from enhanced_paper import EnhancedArxivPaper
+
+    links = []
+    if row["pdf_url"]:
+        links.append(arxiv.Result.Link(row["pdf_url"], title="pdf", content_type="application/pdf"))
+
+    result = arxiv.Result(
+        entry_id=row["entry_id"],
+        published=datetime.fromisoformat(row["published"]),
+        title=row["title"],
+        authors=[arxiv.Result.Author(name) for name in json.loads(row["authors"])],
+        summary=row["summary"],
+        primary_category=row["primary_category"],
+        categories=json.loads(row["categories"]),
+        links=links,
+    )
+    return EnhancedArxivPaper(result)
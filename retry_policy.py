@@ -0,0 +1,279 @@
+"""
+LLM请求的重试策略：按错误类型（可重试、限流、致命、输出格式错误）决定是否重试，
+使用带上限和随机抖动的指数退避，整次运行共享一个重试预算，服务端持续不可用时由断路器暂停所有worker
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+from loguru import logger
+
+from instrumentation import incr
+from metrics import set_llm_circuit_open
+
+
+# 错误类型
+RETRYABLE = "retryable"              # 5xx、超时、连接错误：服务端暂时不可用
+RATE_LIMIT = "rate_limit"            # 429：按 Retry-After 或退避时间等待后重试
+FATAL = "fatal"                      # 认证失败、请求参数错误等：重试没有意义
+MALFORMED_OUTPUT = "malformed_output"  # 返回内容为空或无法解析：立即重试
+
+_settings = {
+    # 每次调用最多的尝试次数（含第一次）
+    "max_attempts": int(os.environ.get("LLM_MAX_ATTEMPTS") or 5),
+    # 指数退避的基础等待时间和上限（秒）
+    "base_delay": float(os.environ.get("LLM_RETRY_BASE_DELAY") or 1.0),
+    "max_delay": float(os.environ.get("LLM_RETRY_MAX_DELAY") or 60.0),
+    # 重试预算：整次运行的重试次数不超过 budget_min + budget_ratio × 请求次数
+    "budget_ratio": float(os.environ.get("LLM_RETRY_BUDGET_RATIO") or 0.2),
+    "budget_min": int(os.environ.get("LLM_RETRY_BUDGET_MIN") or 20),
+    # 断路器：连续失败多少次后打开，打开后暂停多少秒再放行一个探测请求
+    "circuit_threshold": int(os.environ.get("LLM_CIRCUIT_THRESHOLD") or 5),
+    "circuit_reset_seconds": float(os.environ.get("LLM_CIRCUIT_RESET_SECONDS") or 30.0),
+}
+
+# 输出格式错误最多的重试次数（不等待）
+MALFORMED_OUTPUT_RETRIES = 1
+
+_policy: Optional['RetryPolicy'] = None
+_policy_lock = threading.Lock()
+
+
+class MalformedOutputError(Exception):
+    """LLM返回了空内容或无法使用的回复"""
+
+
+def classify_error(error: BaseException) -> str:
+    """
+    判断LLM请求错误的类型
+
+    按openai异常的 status_code 判断，没有状态码时按异常类型名判断，无法识别的异常视为致命错误。
+    """
+    if isinstance(error, MalformedOutputError):
+        return MALFORMED_OUTPUT
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        if status_code == 429:
+            return RATE_LIMIT
+        if status_code in (408, 409) or status_code >= 500:
+            return RETRYABLE
+        return FATAL
+    name = type(error).__name__
+    if "ResponseValidation" in name:
+        return MALFORMED_OUTPUT
+    if isinstance(error, (TimeoutError, ConnectionError)) or "Timeout" in name or "Connection" in name:
+        return RETRYABLE
+    return FATAL
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """读取429响应的 Retry-After 头（秒）"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryBudget:
+    """
+    整次运行共享的重试预算，避免服务端大面积失败时重试请求把流量放大数倍
+
+    Args:
+        ratio: 允许的重试次数占请求次数的比例
+        min_retries: 请求次数较少时至少允许的重试次数
+    """
+
+    def __init__(self, ratio: float = 0.2, min_retries: int = 20):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.requests = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_spend(self) -> bool:
+        """预算未用完时记一次重试并返回True"""
+        with self._lock:
+            if self.retries >= self.min_retries + self.ratio * self.requests:
+                return False
+            self.retries += 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    断路器：连续 failure_threshold 次服务端错误后打开，打开期间所有请求等待；
+    reset_seconds 后放行一个探测请求（半开），成功则关闭，失败则重新打开
+
+    Args:
+        failure_threshold: 打开断路器的连续失败次数
+        reset_seconds: 打开后等待多久放行探测请求
+        clock: 当前时间（秒），测试时可替换
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+        self._cond = threading.Condition()
+
+    def before_request(self):
+        """断路器打开或探测请求进行中时等待"""
+        with self._cond:
+            while True:
+                if self.state == self.CLOSED:
+                    return
+                if self.state == self.OPEN:
+                    remaining = self._opened_at + self.reset_seconds - self.clock()
+                    if remaining <= 0:
+                        self.state = self.HALF_OPEN
+                        self._probe_started = self.clock()
+                        logger.info("LLM断路器半开，放行一个探测请求")
+                        return
+                    self._cond.wait(timeout=remaining)
+                else:
+                    # 探测请求长时间没有结果（如所在线程已退出）时再放行一个
+                    remaining = self._probe_started + self.reset_seconds - self.clock()
+                    if remaining <= 0:
+                        self._probe_started = self.clock()
+                        return
+                    self._cond.wait(timeout=remaining)
+
+    def record_success(self):
+        with self._cond:
+            if self.state != self.CLOSED:
+                logger.info("LLM服务已恢复，断路器关闭")
+                set_llm_circuit_open(False)
+            self.state = self.CLOSED
+            self.failures = 0
+            self._cond.notify_all()
+
+    def record_failure(self, kind: str):
+        """记录一次失败，只有服务端不可用（RETRYABLE）计入连续失败次数"""
+        with self._cond:
+            if kind != RETRYABLE:
+                if self.state == self.HALF_OPEN:
+                    # 探测请求得到了服务端的响应（如429），说明服务可达
+                    self.state = self.CLOSED
+                    set_llm_circuit_open(False)
+                    self._cond.notify_all()
+                return
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    incr("llm_circuit_opened")
+                    logger.error(f"LLM服务连续 {self.failures} 次失败，断路器打开，暂停请求 {self.reset_seconds:.0f} 秒")
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+                set_llm_circuit_open(True)
+                self._cond.notify_all()
+
+
+class RetryPolicy:
+    """
+    带上限和随机抖动的指数退避（full jitter）：第n次重试等待 uniform(0, min(max_delay, base_delay × 2^n))，
+    429且响应给出 Retry-After 时至少等待该时长
+
+    Args:
+        max_attempts: 每次调用最多的尝试次数（含第一次）
+        base_delay: 基础等待时间（秒）
+        max_delay: 等待时间上限（秒）
+        budget: 整次运行共享的重试预算
+        breaker: 断路器
+        rng: 随机抖动使用的随机数生成器
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 60.0,
+                 budget: Optional[RetryBudget] = None, breaker: Optional[CircuitBreaker] = None,
+                 rng: Optional[random.Random] = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self.rng = rng or random.Random()
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次重试（从0开始）的等待时间"""
+        return self.rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def next_delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """
+        第 attempt 次尝试（从0开始）失败后的等待时间
+
+        Returns:
+            重试前等待的秒数；不应重试（致命错误、达到尝试次数上限或重试预算用完）时返回None
+        """
+        kind = classify_error(error)
+        if kind == FATAL:
+            incr("llm_fatal_errors")
+            return None
+        if kind == MALFORMED_OUTPUT and attempt >= MALFORMED_OUTPUT_RETRIES:
+            return None
+        if attempt + 1 >= self.max_attempts:
+            return None
+        if not self.budget.try_spend():
+            incr("llm_retry_budget_exhausted")
+            logger.warning("本次运行的LLM重试预算已用完，不再重试")
+            return None
+
+        if kind == MALFORMED_OUTPUT:
+            return 0.0
+        delay = self.backoff(attempt)
+        if kind == RATE_LIMIT:
+            retry_after = retry_after_seconds(error)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+def configure_retry(**overrides):
+    """
+    设置重试参数（键同 _settings，值为None时保持原值）并重建全局重试策略，
+    同时重置重试预算和断路器（新的一次运行）
+    """
+    global _policy
+    for key, value in overrides.items():
+        if key not in _settings:
+            raise ValueError(f"未知的重试参数: {key}")
+        if value is not None:
+            if value < 0 or (key in ("max_attempts", "circuit_threshold") and value < 1):
+                raise ValueError(f"{key} 取值无效: {value}")
+            _settings[key] = type(_settings[key])(value)
+    with _policy_lock:
+        _policy = None
+    set_llm_circuit_open(False)
+
+
+def get_retry_policy() -> RetryPolicy:
+    """获取全局重试策略（所有LLM请求共享重试预算和断路器）"""
+    global _policy
+    with _policy_lock:
+        if _policy is None:
+            _policy = RetryPolicy(
+                max_attempts=_settings["max_attempts"],
+                base_delay=_settings["base_delay"],
+                max_delay=_settings["max_delay"],
+                budget=RetryBudget(_settings["budget_ratio"], _settings["budget_min"]),
+                breaker=CircuitBreaker(_settings["circuit_threshold"], _settings["circuit_reset_seconds"]),
+            )
+        return _policy
@@ -0,0 +1,280 @@
+"""
+内置调度器：按各自的间隔周期性运行已登记的配置，每次只检索上次水位线之后的论文、只分析新论文，
+结果追加到各配置的结果存储并刷新报告；带随机抖动和单实例文件锁，每日开销只与新论文数量成正比
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from loguru import logger
+
+from instrumentation import incr
+from user_config import UserConfig
+
+
+DEFAULT_SCHEDULE_FILE = "schedules.json"
+STATE_FILE = "scheduler_state.json"
+LOCK_FILE = "scheduler.lock"
+
+DEFAULT_INTERVAL_HOURS = 24.0
+DEFAULT_JITTER_MINUTES = 10.0
+
+# 水位线回看天数：arXiv的提交日期早于公布日期，回看几天补上晚公布的论文（已分析的论文会被跳过）
+WATERMARK_OVERLAP_DAYS = 2
+
+# 没有到期任务时最长的等待间隔（秒），便于及时响应停止信号
+MAX_IDLE_SECONDS = 60.0
+
+
+@dataclass
+class ScheduleEntry:
+    """一个定期运行的配置"""
+    name: str
+    config: UserConfig
+    interval_seconds: float = DEFAULT_INTERVAL_HOURS * 3600
+    jitter_seconds: float = DEFAULT_JITTER_MINUTES * 60
+
+
+def load_schedules(path: str = DEFAULT_SCHEDULE_FILE) -> List[ScheduleEntry]:
+    """
+    读取调度配置文件
+
+    文件格式::
+
+        {"schedules": [
+            {"name": "embodied", "preset": "embodied_ai", "interval_hours": 24, "jitter_minutes": 10},
+            {"name": "custom", "config": {"search_keywords": ["world model"], "max_papers": 100}}
+        ]}
+
+    preset 为 enhanced_config.PRESET_CONFIGS 中的预设名，config 中的字段覆盖预设（或 user_config.json）。
+    文件不存在时按 user_config.json 登记一个每天运行的 default 配置。
+    """
+    from batch_runner import preset_user_config
+    from user_config import config_from_dict, load_user_config
+
+    if not os.path.exists(path):
+        logger.info(f"调度配置文件 {path} 不存在，每天运行一次 user_config.json 中的配置")
+        return [ScheduleEntry("default", load_user_config())]
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    entries = []
+    for item in data.get("schedules", []):
+        name = item["name"]
+        base = preset_user_config(item["preset"]) if item.get("preset") else load_user_config()
+        entries.append(ScheduleEntry(
+            name=name,
+            config=config_from_dict(item.get("config", {}), base),
+            interval_seconds=float(item.get("interval_hours", DEFAULT_INTERVAL_HOURS)) * 3600,
+            jitter_seconds=float(item.get("jitter_minutes", DEFAULT_JITTER_MINUTES)) * 60,
+        ))
+    names = [entry.name for entry in entries]
+    if len(set(names)) != len(names):
+        raise ValueError("调度配置名不能重复")
+    return entries
+
+
+class InstanceLock:
+    """
+    基于 flock 的单实例锁，进程退出时由操作系统自动释放
+
+    不支持 fcntl 的平台上不加锁。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def acquire(self) -> bool:
+        """尝试加锁，已有其他实例持有锁时返回False"""
+        try:
+            import fcntl
+        except ImportError:
+            logger.warning("当前平台不支持 fcntl，调度器不加单实例锁")
+            return True
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a+")
+        try:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self._file.close()
+            self._file = None
+            return False
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.write(str(os.getpid()))
+        self._file.flush()
+        return True
+
+    def release(self):
+        if self._file is not None:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class Scheduler:
+    """
+    周期性增量检索与分析
+
+    每个配置的结果写入 <output_dir>/<配置名>/，调度状态（水位线、下次运行时间）保存在
+    <output_dir>/scheduler_state.json。调用前需要先通过 set_global_llm() 设置LLM。
+
+    Args:
+        entries: 登记的配置
+        output_dir: 输出根目录
+        dedup_threshold: 近似重复论文的相似度阈值
+        prompt_budget: 提示词token预算
+        fulltext: FullTextExtractor对象（全文模式）
+        refresh_reports: 有新结果时是否重新生成Markdown报告和JSON摘要
+        clock: 当前时间（秒），测试时可替换
+        rng: 随机抖动使用的随机数生成器
+    """
+
+    def __init__(self, entries: List[ScheduleEntry], output_dir: str = "output", dedup_threshold: float = 0.8,
+                 prompt_budget=None, fulltext=None, refresh_reports: bool = True,
+                 clock: Callable[[], float] = time.time, rng: Optional[random.Random] = None):
+        self.entries = {entry.name: entry for entry in entries}
+        self.output_dir = output_dir
+        self.dedup_threshold = dedup_threshold
+        self.prompt_budget = prompt_budget
+        self.fulltext = fulltext
+        self.refresh_reports = refresh_reports
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self.state_path = os.path.join(output_dir, STATE_FILE)
+        self.lock = InstanceLock(os.path.join(output_dir, LOCK_FILE))
+        self.state: Dict[str, Dict] = self._load_state()
+
+    def _load_state(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取调度状态失败: {str(e)}，所有配置视为首次运行")
+            return {}
+
+    def _save_state(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def next_run(self, name: str) -> float:
+        """配置的下次运行时间（秒），从未运行过的配置立即到期"""
+        return self.state.get(name, {}).get("next_run", 0.0)
+
+    def due_entries(self) -> List[ScheduleEntry]:
+        now = self.clock()
+        return [entry for name, entry in self.entries.items() if self.next_run(name) <= now]
+
+    def incremental_config(self, entry: ScheduleEntry) -> UserConfig:
+        """本次运行的检索配置：从水位线（回看几天）检索到今天"""
+        today = datetime.fromtimestamp(self.clock()).strftime("%Y-%m-%d")
+        config = replace(entry.config, end_date=max(entry.config.end_date, today))
+        watermark = self.state.get(entry.name, {}).get("watermark")
+        if watermark:
+            start = datetime.strptime(watermark, "%Y-%m-%d") - timedelta(days=WATERMARK_OVERLAP_DAYS)
+            config = replace(config, start_date=max(config.start_date, start.strftime("%Y-%m-%d")))
+        return config
+
+    def run_entry(self, entry: ScheduleEntry):
+        """
+        运行一次增量检索与分析并更新水位线
+
+        只有本次检索取回了时间范围内的全部结果（没有因达到 max_papers 或翻页上限而提前停止，
+        即水位线之后的新论文已全部取完）时才推进水位线，否则下次运行从原水位线继续，已分析的论文会被跳过。
+
+        Returns:
+            PipelineResult对象，运行出错时为None
+        """
+        from enhanced_main import run_pipeline
+
+        state = self.state.setdefault(entry.name, {})
+        config = self.incremental_config(entry)
+        output_dir = os.path.join(self.output_dir, entry.name)
+        logger.info(f"调度运行 {entry.name}: {config.start_date} ~ {config.end_date}")
+
+        result = None
+        started = self.clock()
+        try:
+            result = run_pipeline(config, output_dir, dedup_threshold=self.dedup_threshold,
+                                  prompt_budget=self.prompt_budget, skip_seen=True, fulltext=self.fulltext)
+            state["last_error"] = None
+            state["last_new_papers"] = len(result.analyses)
+            incr("scheduler_runs")
+            incr("scheduler_new_papers", len(result.analyses))
+
+            newest = max((analysis.publication_date for analysis in result.analyses), default=None)
+            if not result.search_exhausted:
+                logger.warning(f"{entry.name}: 检索在达到 max_papers 或翻页上限时提前停止，水位线保持不变，下次运行继续补齐")
+            elif newest and newest > state.get("watermark", ""):
+                state["watermark"] = newest
+
+            if result.analyses and self.refresh_reports:
+                from generate_report import generate_reports
+                generate_reports(output_dir)
+        except Exception as e:
+            logger.error(f"调度运行 {entry.name} 失败: {str(e)}")
+            state["last_error"] = str(e)
+            incr("scheduler_failures")
+
+        state["last_run"] = started
+        state["next_run"] = started + entry.interval_seconds + self.rng.uniform(0, entry.jitter_seconds)
+        self._save_state()
+        logger.info(f"{entry.name} 下次运行时间: {datetime.fromtimestamp(state['next_run']):%Y-%m-%d %H:%M:%S}")
+        return result
+
+    def run_pending(self) -> int:
+        """运行全部到期的配置，返回运行的配置数"""
+        due = self.due_entries()
+        for entry in due:
+            self.run_entry(entry)
+        return len(due)
+
+    def run(self, once: bool = False, stop_event: Optional[threading.Event] = None) -> bool:
+        """
+        加单实例锁后运行调度循环
+
+        Args:
+            once: 只运行一次到期的配置后退出（适合由cron等外部定时器触发）
+            stop_event: 设置后退出循环
+
+        Returns:
+            是否获得了单实例锁
+        """
+        if not self.lock.acquire():
+            logger.warning(f"已有调度器实例在运行（{self.lock.path}），本次退出")
+            return False
+
+        stop_event = stop_event or threading.Event()
+        try:
+            for name, entry in self.entries.items():
+                # 首次运行的配置加上随机延迟，避免多个配置同时启动
+                if name not in self.state and not once:
+                    self.state[name] = {"next_run": self.clock() + self.rng.uniform(0, entry.jitter_seconds)}
+            while not stop_event.is_set():
+                self.run_pending()
+                if once:
+                    break
+                wait = min((self.next_run(name) for name in self.entries), default=self.clock()) - self.clock()
+                stop_event.wait(min(max(wait, 1.0), MAX_IDLE_SECONDS))
+        except KeyboardInterrupt:
+            logger.info("收到中断信号，停止调度器")
+        finally:
+            self.lock.release()
+        return True
@@ -0,0 +1,121 @@
+"""
+arXiv检索执行：尽量把本地过滤条件下推到arXiv查询（ti:/abs: 字段、cat:cs.* 分类），
+无法下推的条件在翻页时逐篇检查，凑够所需数量的匹配论文后立即停止翻页，并统计过滤命中率
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from loguru import logger
+
+from instrumentation import incr
+
+
+# 翻页获取的论文数上限 = 所需匹配数 × 该系数，避免命中率很低时一直翻页到结果耗尽
+MAX_FETCH_FACTOR = 10
+
+
+def title_abstract_clause(term: str) -> str:
+    """只在标题和摘要中匹配检索词的查询子句（all: 还会匹配作者、评论等字段）"""
+    term = f'"{term}"' if " " in term else term
+    return f"(ti:{term} OR abs:{term})"
+
+
+def default_max_fetch(max_matches: int, filtered: bool) -> int:
+    """翻页获取的论文数上限：有本地过滤或跳过条件时为 max_matches × MAX_FETCH_FACTOR，否则为 max_matches"""
+    return max_matches * MAX_FETCH_FACTOR if filtered else max_matches
+
+
+def cs_filter_for(categories: List[str]) -> Optional[Callable]:
+    """
+    返回计算机科学相关性的本地过滤条件
+
+    研究领域全部是 cs.* 时，查询中的 cat: 子句已保证每篇结果都属于计算机科学，过滤条件已下推到查询，
+    返回None；研究领域混合了其他学科时，非cs分类的论文仍需按标题/摘要关键词在本地判断。
+    """
+    if not any(cat.startswith('cs') for cat in categories) or all(cat.startswith('cs') for cat in categories):
+        return None
+    return lambda paper: paper.is_cs_related()
+
+
+@dataclass
+class SearchOutcome:
+    """一次检索的结果和过滤统计"""
+    papers: List = field(default_factory=list)
+    fetched: int = 0
+    skipped: int = 0
+    # 是否已取完查询的全部结果（没有因凑够匹配数或达到获取上限而提前停止）
+    exhausted: bool = False
+
+    @property
+    def matched(self) -> int:
+        return len(self.papers)
+
+    @property
+    def hit_rate(self) -> float:
+        """获取的论文中通过本地过滤的比例"""
+        return self.matched / self.fetched if self.fetched else 1.0
+
+
+def execute_search(query: str, max_matches: int, wrap: Callable, predicate: Optional[Callable] = None,
+                   max_fetch: Optional[int] = None, skip: Optional[Callable] = None,
+                   desc: str = "检索论文") -> SearchOutcome:
+    """
+    按提交日期倒序翻页检索，凑够 max_matches 篇通过过滤的论文后停止
+
+    Args:
+        query: arXiv检索式
+        max_matches: 所需的匹配论文数
+        wrap: 将arxiv.Result包装为论文对象（如EnhancedArxivPaper）
+        predicate: 本地过滤条件，为None时不过滤
+        max_fetch: 最多获取的论文数，默认为 max_matches × MAX_FETCH_FACTOR（无过滤条件时为 max_matches）
+        skip: 在包装之前对arxiv.Result（或PaperRecord）判断是否跳过（如已处理过的论文，见 SeenFilter.contains_result）
+
+    Returns:
+        SearchOutcome对象
+    """
+    import arxiv
+    from tqdm import tqdm
+    from arxiv_replay import make_arxiv_client
+    from result_normalizer import iter_results, wrap_result
+
+    if max_fetch is None:
+        max_fetch = default_max_fetch(max_matches, predicate is not None or skip is not None)
+
+    client = make_arxiv_client(num_retries=10, delay_seconds=3)
+    search = arxiv.Search(
+        query=query,
+        max_results=max_fetch,
+        sort_by=arxiv.SortCriterion.SubmittedDate,
+        sort_order=arxiv.SortOrder.Descending
+    )
+
+    outcome = SearchOutcome()
+    with tqdm(desc=desc, total=max_matches) as pbar:
+        # 开启规范化进程池时由后台线程翻页，产出的是规范化后的PaperRecord
+        for result in iter_results(client.results(search)):
+            outcome.fetched += 1
+            if skip is not None and skip(result):
+                outcome.skipped += 1
+                continue
+            paper = wrap_result(wrap, result)
+            if predicate is not None and not predicate(paper):
+                logger.debug(f"过滤掉: {paper.title}")
+                continue
+            outcome.papers.append(paper)
+            pbar.update(1)
+            if outcome.matched >= max_matches:
+                break
+        else:
+            # 取到 max_fetch 篇时结果可能只是被截断，不能视为已取完
+            outcome.exhausted = outcome.fetched < max_fetch
+
+    incr("search_filter_checked", outcome.fetched)
+    incr("search_filter_matched", outcome.matched)
+    if outcome.skipped:
+        logger.info(f"跳过 {outcome.skipped} 篇已处理的论文")
+    if predicate is not None or skip is not None:
+        logger.info(f"过滤命中率: {outcome.matched}/{outcome.fetched} ({outcome.hit_rate:.0%})")
+        if outcome.matched < max_matches and outcome.fetched >= max_fetch:
+            logger.warning(f"已获取 {outcome.fetched} 篇论文仍未凑够 {max_matches} 篇匹配论文，停止翻页")
+    return outcome
@@ -0,0 +1,187 @@
+"""
+已处理论文的布隆过滤器：以mmap方式持久化的紧凑概率集合，记录已分析过的 arXiv ID+版本，
+增量运行时在构造论文对象和调用LLM之前跳过已处理论文，命中时再到结果存储中精确确认
+"""
+
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+from typing import Iterable, Optional, Tuple
+
+from loguru import logger
+
+from instrumentation import incr
+
+
+_MAGIC = b"ADBF"
+_FORMAT_VERSION = 1
+# 文件头: 魔数、格式版本、位数、哈希函数个数、已插入数量、设计容量
+_HEADER = struct.Struct("<4sIQIQQ")
+
+DEFAULT_CAPACITY = 1_000_000
+DEFAULT_ERROR_RATE = 0.001
+
+
+def _optimal_parameters(capacity: int, error_rate: float) -> Tuple[int, int]:
+    """按设计容量和误判率计算位数和哈希函数个数"""
+    num_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+    num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+    return num_bits, num_hashes
+
+
+class BloomFilter:
+    """
+    基于mmap文件的布隆过滤器
+
+    Args:
+        path: 过滤器文件路径，已存在时沿用文件中的参数
+        capacity: 设计容量（新建时使用）
+        error_rate: 设计误判率（新建时使用）
+    """
+
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY, error_rate: float = DEFAULT_ERROR_RATE):
+        self.path = path
+        if not os.path.exists(path):
+            self._create(path, capacity, error_rate)
+
+        self._file = open(path, "r+b")
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        magic, version, self.num_bits, self.num_hashes, self.count, self.capacity = \
+            _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or version != _FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"不是有效的布隆过滤器文件: {path}")
+
+    @staticmethod
+    def _create(path: str, capacity: int, error_rate: float):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        num_bits, num_hashes = _optimal_parameters(capacity, error_rate)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, num_bits, num_hashes, 0, capacity))
+            f.truncate(_HEADER.size + (num_bits + 7) // 8)
+        os.replace(tmp_path, path)
+
+    def _positions(self, key: str):
+        # 双重哈希：k 个位置由两个64位哈希值线性组合得到
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            index = _HEADER.size + position // 8
+            self._mmap[index] |= 1 << (position % 8)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        for position in self._positions(key):
+            if not self._mmap[_HEADER.size + position // 8] & (1 << (position % 8)):
+                return False
+        return True
+
+    def flush(self):
+        """写回插入数量并同步到磁盘"""
+        _HEADER.pack_into(self._mmap, 0, _MAGIC, _FORMAT_VERSION, self.num_bits, self.num_hashes,
+                          self.count, self.capacity)
+        self._mmap.flush()
+
+    def close(self):
+        if self._mmap is not None and not self._mmap.closed:
+            self.flush()
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def seen_key(short_id: str) -> str:
+    """arXiv短ID（如 2401.12345v2）-> 过滤器键，没有版本号时视为v1"""
+    return short_id if re.search(r'v\d+$', short_id) else f"{short_id}v1"
+
+
+def _split_key(key: str) -> Tuple[str, int]:
+    arxiv_id, version = re.match(r'^(.*)v(\d+)$', key).groups()
+    return arxiv_id, int(version)
+
+
+class SeenFilter:
+    """
+    已处理论文集合：布隆过滤器负责快速排除新论文，命中时再到结果存储中确认，不会误跳过新论文
+
+    Args:
+        store: ResultsStore对象
+        path: 过滤器文件路径
+        capacity: 设计容量，结果存储中的论文数超过容量时以两倍容量重建
+    """
+
+    FILE_NAME = "seen_ids.bloom"
+
+    def __init__(self, store, path: str, capacity: int = DEFAULT_CAPACITY):
+        self.store = store
+        self.path = path
+        self.bloom = BloomFilter(path, capacity=capacity)
+
+        # 过滤器缺失或落后于结果存储（如旧版本写入的数据库）时从结果存储重建
+        analyzed = store.count_analyzed()
+        if analyzed > self.bloom.capacity:
+            self.rebuild(capacity=analyzed * 2)
+        elif analyzed > self.bloom.count:
+            self.rebuild()
+
+    @classmethod
+    def for_output_dir(cls, output_dir: str, store=None) -> 'SeenFilter':
+        """打开输出目录下与结果存储配套的过滤器"""
+        from results_store import ResultsStore
+        store = store or ResultsStore.for_output_dir(output_dir)
+        return cls(store, os.path.join(output_dir, cls.FILE_NAME))
+
+    def rebuild(self, capacity: Optional[int] = None):
+        """用结果存储中已分析的 ID+版本 重建过滤器"""
+        capacity = capacity or self.bloom.capacity
+        self.bloom.close()
+        os.remove(self.path)
+        self.bloom = BloomFilter(self.path, capacity=capacity)
+        for arxiv_id, version in self.store.analyzed_versions():
+            self.bloom.add(f"{arxiv_id}v{max(version, 1)}")
+        self.bloom.flush()
+        logger.info(f"已用结果存储重建已处理论文过滤器，共 {self.bloom.count} 条")
+
+    def contains(self, short_id: str) -> bool:
+        """
+        判断该 ID+版本 是否已分析过
+
+        布隆过滤器未命中时一定是新论文；命中时查询结果存储确认，排除误判。
+        """
+        key = seen_key(short_id)
+        if key not in self.bloom:
+            return False
+        arxiv_id, version = _split_key(key)
+        if self.store.has_analysis(arxiv_id, version):
+            incr("seen_skipped")
+            return True
+        incr("seen_false_positives")
+        return False
+
+    def contains_result(self, result) -> bool:
+        """判断arxiv.Result是否已处理（在构造EnhancedArxivPaper之前调用）"""
+        return self.contains(result.get_short_id())
+
+    def add_papers(self, papers: Iterable):
+        """记录已分析的论文"""
+        for paper in papers:
+            self.bloom.add(seen_key(paper._paper.get_short_id()))
+        self.bloom.flush()
+
+    def close(self):
+        self.bloom.close()
@@ -0,0 +1,395 @@
+"""
+常驻服务模式：在一个进程中保持LLM客户端、分析器和结果存储，通过HTTP API提交检索分析任务、
+流式获取任务进度、同步分析单篇arXiv论文和查询已有结果；已分析过的论文直接从内存返回
+"""
+
+import json
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+from loguru import logger
+
+from instrumentation import incr, span
+from results_store import ResultsStore
+from user_config import UserConfig, config_from_dict
+
+
+# 任务事件流在没有新事件时的心跳间隔（秒）
+EVENT_HEARTBEAT_SECONDS = 15.0
+
+
+def _arxiv_id_from_url(url: str) -> str:
+    return re.sub(r'v\d+$', '', url.rstrip("/").split("/")[-1])
+
+
+@dataclass
+class Job:
+    """一个检索分析任务"""
+    job_id: str
+    config: UserConfig
+    skip_seen: bool = True
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    papers_found: int = 0
+    analyzed: int = 0
+    csv_path: Optional[str] = None
+    error: Optional[str] = None
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    _condition: threading.Condition = field(default_factory=threading.Condition, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def emit(self, event: str, data: Optional[Dict[str, Any]] = None):
+        with self._condition:
+            self.events.append({"event": event, "time": time.time(), **(data or {})})
+            self._condition.notify_all()
+
+    def wait_events(self, cursor: int, timeout: float) -> Tuple[List[Dict[str, Any]], bool]:
+        """等待 cursor 之后的新事件，返回 (新事件, 任务是否已结束)"""
+        with self._condition:
+            if len(self.events) <= cursor and not self.finished:
+                self._condition.wait(timeout)
+            return self.events[cursor:], self.finished
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "papers_found": self.papers_found,
+            "analyzed": self.analyzed,
+            "csv_path": self.csv_path,
+            "error": self.error,
+            "config": asdict(self.config),
+        }
+
+
+class AnalysisService:
+    """
+    常驻分析服务
+
+    启动时打开结果存储并把已有分析结果载入内存；检索分析任务在后台线程中依次执行（共享全局LLM客户端），
+    单篇分析请求在HTTP请求线程中同步执行。调用前需要先通过 set_global_llm() 设置LLM。
+
+    Args:
+        config: 默认用户配置（任务请求中未给出的字段和单篇分析使用）
+        output_dir: 输出目录（结果存储所在目录）
+        dedup_threshold: 近似重复论文的相似度阈值
+        prompt_budget: 提示词token预算
+        fulltext: FullTextExtractor对象（全文模式）
+        job_workers: 同时执行的检索分析任务数
+    """
+
+    def __init__(self, config: UserConfig, output_dir: str = "output", dedup_threshold: float = 0.8,
+                 prompt_budget=None, fulltext=None, job_workers: int = 1):
+        from enhanced_paper_analyzer import EnhancedPaperAnalyzer
+
+        self.config = config
+        self.output_dir = output_dir
+        self.dedup_threshold = dedup_threshold
+        self.prompt_budget = prompt_budget
+        self.fulltext = fulltext
+        self.store = ResultsStore.for_output_dir(output_dir)
+        self.analyzer = EnhancedPaperAnalyzer(config, prompt_budget=prompt_budget, fulltext=fulltext)
+        self.jobs: Dict[str, Job] = {}
+        self._executor = ThreadPoolExecutor(max_workers=job_workers, thread_name_prefix="service-job")
+        self._lock = threading.Lock()
+        self._paper_locks: Dict[str, threading.Lock] = {}
+        self._analyses: Dict[str, Dict[str, Any]] = {}
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self.reload_cache()
+
+    # ------------------------------------------------------------------
+    # 结果缓存
+    # ------------------------------------------------------------------
+    def reload_cache(self):
+        """从结果存储重新载入全部分析结果"""
+        with span("service.load_cache"):
+            analyses = {_arxiv_id_from_url(a.arxiv_url): asdict(a) for a in self.store.all_analyses()}
+        with self._lock:
+            self._analyses = analyses
+        logger.info(f"已载入 {len(analyses)} 条分析结果")
+
+    def _cache_analyses(self, analyses: List):
+        with self._lock:
+            for analysis in analyses:
+                self._analyses[_arxiv_id_from_url(analysis.arxiv_url)] = asdict(analysis)
+
+    def get_result(self, arxiv_id: str) -> Optional[Dict[str, Any]]:
+        """已分析论文的结果（不含版本号的arXiv ID）"""
+        with self._lock:
+            return self._analyses.get(re.sub(r'v\d+$', '', arxiv_id))
+
+    def query_results(self, category: Optional[str] = None, keyword: Optional[str] = None,
+                      limit: int = 50, offset: int = 0) -> Tuple[int, List[Dict[str, Any]]]:
+        """按任务类别和标题/方法关键词查询已有结果，按发表日期倒序，返回 (总数, 当前页)"""
+        with self._lock:
+            results = list(self._analyses.values())
+        if category:
+            results = [r for r in results if r["task_category"] == category]
+        if keyword:
+            keyword = keyword.lower()
+            results = [r for r in results if keyword in r["title"].lower() or keyword in r["methods"].lower()]
+        results.sort(key=lambda r: r["publication_date"], reverse=True)
+        return len(results), results[offset:offset + limit]
+
+    # ------------------------------------------------------------------
+    # 单篇分析
+    # ------------------------------------------------------------------
+    def analyze_arxiv_id(self, arxiv_id: str, force: bool = False) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        同步分析单篇论文，已分析过的论文直接返回缓存结果
+
+        Returns:
+            (分析结果, 是否来自缓存)；arXiv上找不到该论文或分析失败时分析结果为None
+        """
+        key = re.sub(r'v\d+$', '', arxiv_id)
+        if not force:
+            cached = self.get_result(key)
+            if cached is not None:
+                incr("service_cache_hits")
+                return cached, True
+
+        with self._lock:
+            paper_lock = self._paper_locks.setdefault(key, threading.Lock())
+        # 同一论文的并发请求只分析一次
+        with paper_lock:
+            if not force:
+                cached = self.get_result(key)
+                if cached is not None:
+                    incr("service_cache_hits")
+                    return cached, True
+
+            paper = fetch_paper(arxiv_id)
+            if paper is None:
+                return None, False
+            analysis = self.analyzer.analyze_paper(paper)
+            if analysis is None:
+                return None, False
+            self.store.save_analysis(paper, analysis, self.analyzer.input_fingerprint())
+            self._cache_analyses([analysis])
+            incr("service_analyzed")
+            return asdict(analysis), False
+
+    # ------------------------------------------------------------------
+    # 检索分析任务
+    # ------------------------------------------------------------------
+    def submit_job(self, config: UserConfig, skip_seen: bool = True) -> Job:
+        job = Job(job_id=uuid.uuid4().hex[:12], config=config, skip_seen=skip_seen)
+        with self._lock:
+            self.jobs[job.job_id] = job
+        job.emit("queued")
+        self._executor.submit(self._run_job, job)
+        logger.info(f"已提交任务 {job.job_id}")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _run_job(self, job: Job):
+        from enhanced_main import run_pipeline
+
+        def progress(stage: str, data: Dict[str, Any]):
+            if stage == "searched":
+                job.papers_found = data["papers_found"]
+            job.emit(stage, data)
+
+        job.status = "running"
+        job.emit("running")
+        try:
+            result = run_pipeline(job.config, self.output_dir, dedup_threshold=self.dedup_threshold,
+                                  prompt_budget=self.prompt_budget, skip_seen=job.skip_seen,
+                                  fulltext=self.fulltext, progress=progress)
+            self._cache_analyses(result.analyses)
+            job.analyzed = len(result.analyses)
+            job.csv_path = result.csv_path
+            job.status = "done"
+        except Exception as e:
+            logger.error(f"任务 {job.job_id} 失败: {str(e)}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            job.emit(job.status, {"analyzed": job.analyzed, "error": job.error})
+
+    # ------------------------------------------------------------------
+    # HTTP服务
+    # ------------------------------------------------------------------
+    @property
+    def server_port(self) -> Optional[int]:
+        return self._server.server_address[1] if self._server else None
+
+    @property
+    def base_url(self) -> str:
+        host = self._server.server_address[0]
+        return f"http://{host}:{self.server_port}"
+
+    def start(self, host: str = "127.0.0.1", port: int = 8000) -> 'AnalysisService':
+        from http.server import ThreadingHTTPServer
+
+        self._server = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="service-http", daemon=True)
+        self._thread.start()
+        logger.info(f"分析服务已启动: {self.base_url}")
+        return self
+
+    def serve_forever(self, host: str = "127.0.0.1", port: int = 8000):
+        """启动服务并阻塞直到中断"""
+        self.start(host, port)
+        try:
+            while self._thread.is_alive():
+                self._thread.join(timeout=1)
+        except KeyboardInterrupt:
+            logger.info("收到中断信号，停止分析服务")
+        finally:
+            self.stop()
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def fetch_paper(arxiv_id: str):
+    """按arXiv ID获取单篇论文，找不到时返回None"""
+    import arxiv
+    from arxiv_replay import make_arxiv_client
+    from enhanced_paper import EnhancedArxivPaper
+
+    client = make_arxiv_client(num_retries=3, delay_seconds=3)
+    with span("service.fetch_paper"):
+        results = list(client.results(arxiv.Search(id_list=[arxiv_id], max_results=1)))
+    return EnhancedArxivPaper(results[0]) if results else None
+
+
+def _make_handler(service: AnalysisService):
+    class ServiceHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _send_json(self, status: int, payload: Dict):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self) -> Dict:
+            length = int(self.headers.get("Content-Length", 0))
+            data = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            if not isinstance(data, dict):
+                raise ValueError("请求体必须是JSON对象")
+            return data
+
+        def _stream_events(self, job: Job):
+            # 事件流以换行分隔的JSON（NDJSON）输出，任务结束后关闭连接
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            cursor = 0
+            while True:
+                events, finished = job.wait_events(cursor, EVENT_HEARTBEAT_SECONDS)
+                lines = events or ([] if finished else [{"event": "heartbeat", "time": time.time()}])
+                for event in lines:
+                    self.wfile.write(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+                self.wfile.flush()
+                cursor += len(events)
+                if finished and not events:
+                    return
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            try:
+                if parts == ["health"]:
+                    self._send_json(200, {"status": "ok", "results": len(service._analyses),
+                                          "jobs": len(service.jobs)})
+                elif parts == ["jobs"]:
+                    with service._lock:
+                        jobs = list(service.jobs.values())
+                    self._send_json(200, {"jobs": [job.to_dict() for job in jobs]})
+                elif len(parts) in (2, 3) and parts[0] == "jobs":
+                    job = service.get_job(parts[1])
+                    if job is None:
+                        self._send_json(404, {"error": "任务不存在"})
+                    elif len(parts) == 3 and parts[2] == "events":
+                        self._stream_events(job)
+                    elif len(parts) == 2:
+                        self._send_json(200, job.to_dict())
+                    else:
+                        self._send_json(404, {"error": "not found"})
+                elif parts == ["papers"]:
+                    total, results = service.query_results(
+                        category=query.get("category"), keyword=query.get("q"),
+                        limit=int(query.get("limit", 50)), offset=int(query.get("offset", 0)))
+                    self._send_json(200, {"total": total, "results": results})
+                elif len(parts) == 2 and parts[0] == "papers":
+                    result = service.get_result(parts[1])
+                    if result is None:
+                        self._send_json(404, {"error": "该论文尚未分析"})
+                    else:
+                        self._send_json(200, result)
+                else:
+                    self._send_json(404, {"error": "not found"})
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+            except Exception as e:
+                logger.error(f"处理请求 {self.path} 出错: {str(e)}")
+                self._send_json(500, {"error": str(e)})
+
+        def do_POST(self):
+            parts = [part for part in urlparse(self.path).path.split("/") if part]
+            try:
+                data = self._read_json()
+                if parts == ["jobs"]:
+                    config = config_from_dict(data.get("config", {}), service.config)
+                    job = service.submit_job(config, skip_seen=bool(data.get("skip_seen", True)))
+                    self._send_json(202, job.to_dict())
+                elif parts == ["analyze"]:
+                    arxiv_id = data.get("arxiv_id")
+                    if not arxiv_id:
+                        raise ValueError("缺少 arxiv_id")
+                    analysis, cached = service.analyze_arxiv_id(arxiv_id, force=bool(data.get("force", False)))
+                    if analysis is None:
+                        self._send_json(404, {"error": f"无法获取或分析论文 {arxiv_id}"})
+                    else:
+                        self._send_json(200, {"cached": cached, "analysis": analysis})
+                else:
+                    self._send_json(404, {"error": "not found"})
+            except (ValueError, TypeError) as e:
+                self._send_json(400, {"error": str(e)})
+            except Exception as e:
+                logger.error(f"处理请求 {self.path} 出错: {str(e)}")
+                self._send_json(500, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            logger.debug(f"{self.address_string()} {format % args}")
+
+    return ServiceHandler
@@ -12,6 +12,25 @@ from datetime import datetime, timedelta
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+def make_test_paper(short_id, title, summary, categories=None, published=None):
+    """构造用于测试的EnhancedArxivPaper对象"""
+    import arxiv
+    from enhanced_paper import EnhancedArxivPaper
+    
+    categories = categories or ["cs.RO"]
+    result = arxiv.Result(
+        entry_id=f"http://arxiv.org/abs/{short_id}",
+        published=published or datetime(2024, 1, 2),
+        title=title,
+        authors=[arxiv.Result.Author("John Doe")],
+        summary=summary,
+        primary_category=categories[0],
+        categories=categories,
+        links=[arxiv.Result.Link(f"http://arxiv.org/pdf/{short_id}", title="pdf", content_type="application/pdf")],
+    )
+    return EnhancedArxivPaper(result)
+
+
 def test_user_config():
     """测试用户配置模块"""
     print("🧪 测试用户配置模块...")
@@ -205,6 +224,1814 @@ def test_search_query_building():
         return False
 
 
+def test_trend_analytics():
+    """测试跨运行趋势汇总"""
+    print("🧪 测试跨运行趋势汇总...")
+    
+    try:
+        import tempfile
+        from trend_analytics import TrendStore
+        from enhanced_paper_analyzer import EnhancedPaperAnalysis
+        
+        def make_analysis(arxiv_id, date, category):
+            return EnhancedPaperAnalysis(
+                title=f"Paper {arxiv_id}", authors="A", authors_with_affiliations="A",
+                primary_affiliations="未知机构", task_category=category, methods="", contributions="",
+                training_dataset="", testing_dataset="", evaluation_metrics="",
+                publication_date=date, arxiv_url=f"http://arxiv.org/abs/{arxiv_id}v1",
+                confidence=0.8, research_field="机器人学", novelty_score=3, arxiv_categories="cs.RO"
+            )
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = TrendStore(tmp_dir)
+            store.ingest_analyses([
+                make_analysis("2401.00001", "2024-01-02", "导航"),
+                make_analysis("2401.00002", "2024-01-10", "导航"),
+                make_analysis("2401.00003", "2024-01-11", "导航"),
+                make_analysis("2401.00004", "2024-01-11", "强化学习"),
+            ], source="run1.csv")
+            # 同一数据源和重复论文不会被重复计数
+            store.ingest_analyses([make_analysis("2401.00001", "2024-01-02", "导航")], source="run1.csv")
+            store.ingest_analyses([make_analysis("2401.00001", "2024-01-02", "导航")], source="run2.csv")
+            store.save()
+            
+            reloaded = TrendStore(tmp_dir)
+            assert reloaded.total_papers == 4
+            
+            periods, labels, matrix = reloaded.period_counts("task_category", "week")
+            assert periods == ["2024-01-01", "2024-01-08"]
+            assert matrix[:, labels.index("导航")].tolist() == [1, 2]
+            
+            growth = {item["label"]: item for item in reloaded.growth_rates("task_category", "week")}
+            assert growth["导航"]["growth_rate"] == 1.0
+            assert growth["强化学习"]["growth_rate"] is None
+
+            from generate_report import format_trend_section
+            assert "按月" in format_trend_section(reloaded, period="month")[0]
+
+        print("✅ 跨运行趋势汇总测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 跨运行趋势汇总测试失败: {e}")
+        return False
+
+
+def test_paper_dedup():
+    """测试论文去重"""
+    print("🧪 测试论文去重...")
+    
+    try:
+        from enhanced_paper import EnhancedArxivPaper
+        from paper_dedup import deduplicate_papers
+        
+        class MockArxivResult:
+            def __init__(self, short_id, title, summary):
+                self.title = title
+                self.summary = summary
+                self.authors = ["John Doe"]
+                self.categories = ["cs.RO"]
+                self.primary_category = "cs.RO"
+                self.published = datetime.now()
+                self.entry_id = f"http://arxiv.org/abs/{short_id}"
+                self.pdf_url = f"http://arxiv.org/pdf/{short_id}"
+                self._short_id = short_id
+            
+            def get_short_id(self):
+                return self._short_id
+        
+        abstract = ("We present a vision language navigation agent that follows natural language "
+                    "instructions in unseen indoor environments and reaches state of the art success "
+                    "rate on the R2R and RxR benchmarks with a lightweight topological memory. "
+                    "The agent builds a graph of visited viewpoints, grounds each sub-instruction "
+                    "to candidate nodes with a cross-modal transformer, and plans globally over "
+                    "the graph so that it can backtrack when the local decision turns out wrong. "
+                    "Experiments on real robots show robust transfer from simulation.")
+        papers = [EnhancedArxivPaper(r) for r in [
+            MockArxivResult("2401.00001v1", "Embodied Navigation Agent", abstract),
+            MockArxivResult("2401.00001v2", "Embodied Navigation Agent", abstract),
+            MockArxivResult("2402.00002v1", "Embodied Navigation Agent (Workshop Version)", abstract),
+            MockArxivResult("2403.00003v1", "Dexterous Grasping", "A reinforcement learning method for dexterous in-hand manipulation of rigid objects."),
+        ]]
+        
+        result = deduplicate_papers(papers)
+        
+        assert result.merged_versions == 1
+        assert [p.arxiv_id for p in result.representatives] == ["2401.00001", "2403.00003"]
+        assert result.representatives[0]._paper.get_short_id() == "2401.00001v2"
+        assert [p.arxiv_id for p in result.duplicates["2401.00001"]] == ["2402.00002"]
+        
+        print("✅ 论文去重测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 论文去重测试失败: {e}")
+        return False
+
+
+def test_results_store_reanalyze():
+    """测试结果存储与增量重新分析"""
+    print("🧪 测试结果存储与增量重新分析...")
+    
+    try:
+        import tempfile
+        import arxiv
+        import llm
+        from enhanced_paper import EnhancedArxivPaper
+        from enhanced_paper_analyzer import EnhancedPaperAnalyzer
+        from results_store import ResultsStore
+        from user_config import UserConfig
+        
+        class FakeLLM:
+            model = "fake-model"
+            
+            def __init__(self):
+                self.prompts = []
+            
+            def generate(self, messages):
+                self.prompts.append(messages[-1]["content"])
+                return json.dumps({
+                    "task_category": "导航", "methods": "拓扑记忆", "contributions": "新方法",
+                    "training_dataset": "R2R", "testing_dataset": "R2R", "evaluation_metrics": "SR",
+                    "confidence": 0.9, "research_field": "机器人学", "novelty_score": 4
+                }, ensure_ascii=False)
+            
+            def generate_json(self, messages, max_tokens=None):
+                return json.loads(self.generate(messages))
+        
+        fake_llm = FakeLLM()
+        llm.GLOBAL_LLM = fake_llm
+        
+        result = arxiv.Result(
+            entry_id="http://arxiv.org/abs/2401.00001v2",
+            published=datetime(2024, 1, 2),
+            title="Embodied Navigation Agent",
+            authors=[arxiv.Result.Author("John Doe")],
+            summary="A navigation agent.",
+            primary_category="cs.RO",
+            categories=["cs.RO"],
+        )
+        paper = EnhancedArxivPaper(result)
+        config = UserConfig.create_default()
+        analyzer = EnhancedPaperAnalyzer(config)
+        analysis = analyzer.analyze_paper(paper)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = ResultsStore.for_output_dir(tmp_dir)
+            store.save_analyses([paper], [analysis], analyzer.input_fingerprint())
+            
+            # 指纹未变化时不需要重新分析
+            assert store.find_stale(analyzer.input_fingerprint()) == {}
+            assert store.get_analysis("2401.00001").task_category == "导航"
+            assert store.load_paper("2401.00001").title == paper.title
+            
+            # 只修改分类表时，只有分类表指纹变化
+            config.custom_task_categories = {"新任务": {"definition": "测试", "typical_output": "", "datasets_metrics": ""}}
+            new_analyzer = EnhancedPaperAnalyzer(config)
+            assert store.find_stale(new_analyzer.input_fingerprint()) == {"2401.00001": ["taxonomy_hash"]}
+            
+            updated = new_analyzer.reextract_fields(paper, store.get_analysis("2401.00001"), ["task_category", "confidence"])
+            assert updated.methods == "拓扑记忆"
+            assert '"methods"' not in fake_llm.prompts[-1]
+            store.close()
+        
+        llm.GLOBAL_LLM = None
+        print("✅ 结果存储与增量重新分析测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 结果存储与增量重新分析测试失败: {e}")
+        return False
+
+
+def test_reclassify_fast_path():
+    """测试仅重新分类的快速路径"""
+    print("🧪 测试仅重新分类的快速路径...")
+    
+    try:
+        import tempfile
+        import llm
+        from enhanced_main import reclassify_stored_results
+        from enhanced_paper_analyzer import EnhancedPaperAnalysis, EnhancedPaperAnalyzer
+        from results_store import ResultsStore
+        from user_config import UserConfig
+        
+        class FakeLLM:
+            model = "fake-model"
+            
+            def __init__(self):
+                self.calls = []
+            
+            def generate(self, messages, max_tokens=None):
+                self.calls.append((messages[-1]["content"], max_tokens))
+                return '{"task_category": "具身导航", "confidence": 0.95}'
+            
+            def generate_json(self, messages, max_tokens=None):
+                return json.loads(self.generate(messages, max_tokens))
+        
+        fake_llm = FakeLLM()
+        llm.GLOBAL_LLM = fake_llm
+        
+        config = UserConfig.create_default()
+        paper = make_test_paper("2401.00001v1", "Embodied Navigation Agent", "A very long abstract. " * 50)
+        analysis = EnhancedPaperAnalysis(
+            title=paper.title, authors="John Doe", authors_with_affiliations="John Doe",
+            primary_affiliations="未知机构", task_category="导航", methods="拓扑图",
+            contributions="提出拓扑记忆导航智能体。在R2R上取得最好结果。", training_dataset="R2R",
+            testing_dataset="R2R", evaluation_metrics="SR", publication_date="2024-01-02",
+            arxiv_url=paper.entry_id, confidence=0.7, research_field="机器人学", novelty_score=4,
+            arxiv_categories="cs.RO"
+        )
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = ResultsStore.for_output_dir(tmp_dir)
+            store.save_analysis(paper, analysis, EnhancedPaperAnalyzer(config).input_fingerprint())
+            
+            config.custom_task_categories = {"具身导航": {"definition": "具身环境中的导航", "typical_output": "", "datasets_metrics": ""}}
+            assert reclassify_stored_results(config, tmp_dir) == 1
+            
+            prompt, max_tokens = fake_llm.calls[-1]
+            assert "提出拓扑记忆导航智能体。" in prompt
+            assert "A very long abstract" not in prompt
+            assert max_tokens is not None
+            
+            updated = store.get_analysis("2401.00001")
+            assert updated.task_category == "具身导航"
+            assert updated.confidence == 0.95
+            assert updated.methods == "拓扑图"
+            assert store.find_stale(EnhancedPaperAnalyzer(config).input_fingerprint()) == {}
+            store.close()
+        
+        llm.GLOBAL_LLM = None
+        print("✅ 仅重新分类的快速路径测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 仅重新分类的快速路径测试失败: {e}")
+        return False
+
+
+def test_prompt_builder():
+    """测试token预算提示词构建"""
+    print("🧪 测试token预算提示词构建...")
+    
+    try:
+        import arxiv
+        from enhanced_paper import EnhancedArxivPaper
+        from enhanced_config import format_enhanced_classification_table
+        from prompt_builder import PromptBudget, PromptBuilder, TokenCounter
+        
+        result = arxiv.Result(
+            entry_id="http://arxiv.org/abs/2401.00001v1",
+            published=datetime(2024, 1, 2),
+            title="A Large Collaborative Embodied Benchmark",
+            authors=[arxiv.Result.Author(f"Author {i}") for i in range(50)],
+            summary="We study embodied agents in household environments. " * 80,
+            primary_category="cs.RO",
+            categories=["cs.RO"],
+        )
+        paper = EnhancedArxivPaper(result)
+        
+        counter = TokenCounter()
+        builder = PromptBuilder(
+            budget=PromptBudget(max_tokens=1500, max_authors=5),
+            counter=counter,
+            full_classification_table=format_enhanced_classification_table()
+        )
+        built = builder.build(paper)
+        
+        assert built.tokens <= 1500
+        assert built.tokens < built.original_tokens
+        assert built.abstract_truncated
+        assert "Author 4" in built.text and "Author 5;" not in built.text
+        assert "等50位作者" in built.text
+        
+        # 多个分析线程共用构建器时累计统计不丢失
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: builder.build(paper), range(20)))
+        assert builder.prompt_count == 21
+        assert builder.total_tokens == 21 * built.tokens
+        
+        # 类别代码映射回类别名称
+        assert builder.decode_category("C01") == "动作识别"
+        assert builder.decode_category("C02 手物交互检测 (HOI)") == "手物交互检测 (HOI)"
+        assert builder.decode_category("未分类") == "未分类"
+        
+        print("✅ token预算提示词构建测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ token预算提示词构建测试失败: {e}")
+        return False
+
+
+def test_instrumentation():
+    """测试阶段耗时埋点"""
+    print("🧪 测试阶段耗时埋点...")
+    
+    try:
+        import tempfile
+        from instrumentation import Instrumentation, get_instrumentation, timed, write_run_info
+        
+        instrumentation = Instrumentation()
+        with instrumentation.span("search"):
+            pass
+        with instrumentation.span("search"):
+            pass
+        instrumentation.incr("papers_fetched", 5)
+        
+        snapshot = instrumentation.snapshot()
+        assert snapshot["stages"]["search"]["count"] == 2
+        assert snapshot["counters"]["papers_fetched"] == 5
+        
+        @timed("test.decorated")
+        def decorated():
+            return 42
+        
+        assert decorated() == 42
+        assert get_instrumentation().snapshot()["stages"]["test.decorated"]["count"] >= 1
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, "run_info.json"), 'w', encoding='utf-8') as f:
+                json.dump({"preset_used": "embodied_ai"}, f)
+            
+            path = write_run_info(tmp_dir)
+            with open(path, 'r', encoding='utf-8') as f:
+                run_info = json.load(f)
+            
+            assert run_info["preset_used"] == "embodied_ai"
+            assert "test.decorated" in run_info["stage_timings"]
+        
+        print("✅ 阶段耗时埋点测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 阶段耗时埋点测试失败: {e}")
+        return False
+
+
+def test_metrics_exporter():
+    """测试Prometheus指标导出"""
+    print("🧪 测试Prometheus指标导出...")
+    
+    try:
+        import tempfile
+        import urllib.request
+        from instrumentation import incr
+        from metrics import MetricsExporter, MetricsRegistry
+        
+        registry = MetricsRegistry(prefix="test")
+        latency = registry.histogram("llm_request_seconds", "LLM请求耗时", buckets=(1.0, 5.0))
+        latency.observe(0.5, outcome="success")
+        latency.observe(3.0, outcome="success")
+        registry.gauge("queue_depth", "队列深度").set(7, queue="analysis")
+        incr("papers_analyzed")
+        
+        text = registry.render()
+        assert '# TYPE test_llm_request_seconds histogram' in text
+        assert 'test_llm_request_seconds_bucket{outcome="success",le="1"} 1' in text
+        assert 'test_llm_request_seconds_bucket{outcome="success",le="+Inf"} 2' in text
+        assert 'test_llm_request_seconds_count{outcome="success"} 2' in text
+        assert 'test_queue_depth{queue="analysis"} 7' in text
+        assert 'test_papers_analyzed_total ' in text
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            textfile = os.path.join(tmp_dir, "metrics.prom")
+            exporter = MetricsExporter(port=0, textfile=textfile, registry=registry)
+            exporter.start()
+            exporter.stop()
+            with open(textfile, 'r', encoding='utf-8') as f:
+                assert 'test_queue_depth' in f.read()
+        
+        with MetricsExporter(port=_free_port(), registry=registry, host="127.0.0.1") as exporter:
+            url = f"http://127.0.0.1:{exporter.server_port}/metrics"
+            body = urllib.request.urlopen(url, timeout=5).read().decode('utf-8')
+            assert 'test_queue_depth{queue="analysis"} 7' in body
+        
+        print("✅ Prometheus指标导出测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Prometheus指标导出测试失败: {e}")
+        return False
+
+
+def test_benchmark_harness():
+    """测试基准测试工具（模拟OpenAI服务+合成语料）"""
+    print("🧪 测试基准测试工具...")
+    
+    try:
+        import llm
+        from benchmark import compare_results, make_synthetic_corpus, run_benchmark
+        from mock_openai_server import MockOpenAIServer
+        
+        corpus = make_synthetic_corpus(5, seed=1)
+        assert len(corpus) == 5
+        assert [p.title for p in corpus] == [p.title for p in make_synthetic_corpus(5, seed=1)]
+        
+        original_llm = llm.GLOBAL_LLM
+        try:
+            with MockOpenAIServer() as server:
+                run = run_benchmark(5, server.base_url)
+                assert server.stats["requests"] == 5
+        finally:
+            llm.GLOBAL_LLM = original_llm
+        
+        assert run["analyzed"] == 5
+        assert run["papers_per_second"] > 0
+        assert run["prompt_tokens"] > 0
+        
+        baseline = {"runs": [dict(run, papers_per_second=run["papers_per_second"] * 2)]}
+        assert compare_results({"runs": [run]}, baseline)
+        assert not compare_results({"runs": [run]}, {"runs": [run]})
+        
+        print("✅ 基准测试工具测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 基准测试工具测试失败: {e}")
+        return False
+
+
+def test_arxiv_replay():
+    """测试arXiv检索录制/回放"""
+    print("🧪 测试arXiv检索录制/回放...")
+    
+    try:
+        import tempfile
+        import threading
+        import time
+        import arxiv
+        from arxiv_replay import (Cassette, RecordingSession, ThrottledSession, configure_arxiv_replay,
+                                  make_arxiv_client)
+        from benchmark import render_atom_page, make_synthetic_corpus, write_synthetic_cassette
+        from enhanced_main import build_search_query, search_papers_with_config
+        from user_config import UserConfig
+        
+        config = UserConfig.create_default()
+        config.research_categories = ["cs.RO"]
+        config.max_papers = 30
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # 回放：检索流程完全从磁盘读取
+            write_synthetic_cassette(tmp_dir, 30, query=build_search_query(config), page_size=100)
+            configure_arxiv_replay("replay", tmp_dir)
+            try:
+                papers = search_papers_with_config(config)
+            finally:
+                configure_arxiv_replay("off")
+            assert len(papers) == 30
+            assert papers[0].title == make_synthetic_corpus(1)[0].title
+            
+            # 录制：成功的分页按查询和偏移量保存
+            class FakeResponse:
+                status_code = 200
+                content = render_atom_page(make_synthetic_corpus(2), 2, 0, 100)
+            
+            class FakeSession:
+                def get(self, url, **kwargs):
+                    return FakeResponse()
+            
+            record_dir = os.path.join(tmp_dir, "recorded")
+            client = arxiv.Client(page_size=100, delay_seconds=0)
+            client._session = RecordingSession(FakeSession(), Cassette(record_dir))
+            search = arxiv.Search(query="all:robot", max_results=2)
+            assert len(list(client.results(search))) == 2
+            assert Cassette(record_dir).queries()[0]["search_query"] == "all:robot"
+            
+            configure_arxiv_replay("replay", record_dir)
+            try:
+                replayed = list(make_arxiv_client().results(search))
+            finally:
+                configure_arxiv_replay("off")
+            assert [r.title for r in replayed] == [p.title for p in make_synthetic_corpus(2)]
+            
+            # 多个线程各自的客户端共享请求间隔
+            request_times = []
+            
+            class TimedSession(FakeSession):
+                def get(self, url, **kwargs):
+                    request_times.append(time.monotonic())
+                    return super().get(url, **kwargs)
+            
+            clients = [make_arxiv_client(delay_seconds=0.1) for _ in range(3)]
+            for client in clients:
+                assert isinstance(client._session, ThrottledSession)
+                client._session._session = TimedSession()
+            threads = [threading.Thread(target=lambda c=client: list(c.results(search))) for client in clients]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            request_times.sort()
+            assert len(request_times) == 3
+            assert all(later - earlier >= 0.09 for earlier, later in zip(request_times, request_times[1:]))
+        
+        print("✅ arXiv检索录制/回放测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ arXiv检索录制/回放测试失败: {e}")
+        return False
+
+
+def test_lazy_imports():
+    """测试命令行入口不会提前导入较重的依赖"""
+    print("🧪 测试延迟导入...")
+    
+    try:
+        import subprocess
+        
+        heavy_modules = ("openai", "arxiv", "numpy", "tqdm", "dotenv")
+        code = (
+            "import sys, enhanced_main, generate_report, quick_start; "
+            f"print(','.join(m for m in {heavy_modules!r} if m in sys.modules))"
+        )
+        proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        loaded = proc.stdout.strip()
+        assert loaded == "", f"启动时导入了: {loaded}"
+        
+        from benchmark import _parse_importtime
+        assert _parse_importtime("import time:       120 |       5300 | user_config", "user_config") == 5.3
+        
+        print("✅ 延迟导入测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 延迟导入测试失败: {e}")
+        return False
+
+
+def test_run_pipeline_in_process():
+    """测试在当前进程中直接调用分析流程"""
+    print("🧪 测试进程内分析流程...")
+    
+    try:
+        import tempfile
+        import llm
+        from arxiv_replay import configure_arxiv_replay
+        from benchmark import write_synthetic_cassette
+        from enhanced_main import build_search_query, run_pipeline
+        from mock_openai_server import MockOpenAIServer
+        from user_config import UserConfig
+        
+        config = UserConfig.create_default()
+        config.research_categories = ["cs.RO"]
+        config.max_papers = 4
+        
+        original_llm = llm.GLOBAL_LLM
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_synthetic_cassette(os.path.join(tmp_dir, "cassettes"), 4, query=build_search_query(config))
+            configure_arxiv_replay("replay", os.path.join(tmp_dir, "cassettes"))
+            try:
+                with MockOpenAIServer() as server:
+                    llm.ensure_global_llm(api_key="test", base_url=server.base_url, model="mock")
+                    first_llm = llm.GLOBAL_LLM
+                    llm.ensure_global_llm(api_key="test", base_url=server.base_url, model="mock")
+                    assert llm.GLOBAL_LLM is first_llm, "相同设置下应复用已创建的LLM客户端"
+                    
+                    result = run_pipeline(config, os.path.join(tmp_dir, "output"))
+                    assert server.stats["requests"] == 4
+            finally:
+                configure_arxiv_replay("off")
+                llm.GLOBAL_LLM = original_llm
+            
+            assert result.papers_found == 4
+            assert len(result.analyses) == 4
+            assert result.csv_path and os.path.exists(result.csv_path)
+            assert result.summary_path and os.path.exists(result.summary_path)
+            
+            # 进程内入口使用与命令行相同的默认提示词预算和去重阈值
+            import enhanced_main
+            import generate_github_config
+            calls = []
+            original_run_pipeline, original_key = enhanced_main.run_pipeline, os.environ.get("OPENAI_API_KEY")
+            enhanced_main.run_pipeline = lambda *args, **kwargs: calls.append(kwargs) or result
+            os.environ["OPENAI_API_KEY"] = "test"
+            try:
+                assert generate_github_config.run_analysis(config, os.path.join(tmp_dir, "output"))
+            finally:
+                enhanced_main.run_pipeline = original_run_pipeline
+                llm.GLOBAL_LLM = original_llm
+                if original_key is None:
+                    os.environ.pop("OPENAI_API_KEY")
+                else:
+                    os.environ["OPENAI_API_KEY"] = original_key
+            assert calls[0]["prompt_budget"] == enhanced_main.make_prompt_budget()
+            assert calls[0]["prompt_budget"].max_tokens == enhanced_main.DEFAULT_PROMPT_TOKEN_BUDGET
+            assert calls[0]["dedup_threshold"] == enhanced_main.DEFAULT_DEDUP_THRESHOLD
+        
+        print("✅ 进程内分析流程测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 进程内分析流程测试失败: {e}")
+        return False
+
+
+def test_batch_runner():
+    """测试多配置批量运行共享检索和分析"""
+    print("🧪 测试多配置批量运行...")
+    
+    try:
+        import tempfile
+        from dataclasses import replace
+        import llm
+        from arxiv_replay import configure_arxiv_replay
+        from batch_runner import ConfigMatcher, build_union_config, harvest_papers, run_batch
+        from benchmark import write_synthetic_cassette
+        from enhanced_main import build_search_query
+        from mock_openai_server import MockOpenAIServer
+        from user_config import UserConfig
+        
+        base = replace(UserConfig.create_default(), start_date="2024-01-01", end_date="2024-12-31", max_papers=5)
+        configs = {
+            "manipulation": replace(base, search_keywords=["robotic manipulation", "navigation"],
+                                    research_categories=["cs.RO"]),
+            "navigation": replace(base, search_keywords=["navigation", "world model", "robotic manipulation"],
+                                  research_categories=["cs.RO", "cs.AI"]),
+            "custom_taxonomy": replace(base, search_keywords=["navigation", "robotic manipulation"],
+                                       research_categories=["cs.RO"],
+                                       custom_task_categories={"具身导航": {
+                                           "definition": "智能体在环境中导航到目标", "typical_output": "动作序列",
+                                           "datasets_metrics": "R2R, SPL"}}),
+        }
+        
+        union = build_union_config(configs)
+        assert union.search_keywords == ["robotic manipulation", "navigation", "world model"]
+        assert union.research_categories == ["cs.RO", "cs.AI"]
+        
+        matcher = ConfigMatcher(replace(base, search_keywords=["RL"], research_categories=[]))
+        assert not matcher.matches(type("Paper", (), {"published_date": "2024-03-01", "categories": ["cs.LG"],
+                                                      "title": "World models", "summary": ""})())
+        
+        original_llm = llm.GLOBAL_LLM
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_synthetic_cassette(os.path.join(tmp_dir, "cassettes"), 200, query=build_search_query(union))
+            configure_arxiv_replay("replay", os.path.join(tmp_dir, "cassettes"))
+            try:
+                with MockOpenAIServer() as server:
+                    llm.ensure_global_llm(api_key="test", base_url=server.base_url, model="mock")
+                    results = run_batch(configs, os.path.join(tmp_dir, "output"), dedup_threshold=0,
+                                        max_fetch=200)
+                    requests = server.stats["requests"]
+            finally:
+                configure_arxiv_replay("off")
+                llm.GLOBAL_LLM = original_llm
+            
+            shared = {a.arxiv_url for name in ("manipulation", "navigation") for a in results[name].analyses}
+            assert all(len(result.analyses) == 5 for result in results.values())
+            assert len(shared) < 10, "重叠的配置应共享论文"
+            # 相同分类表的配置共享分析结果，不同分类表的配置单独分析
+            assert requests == len(shared) + len(results["custom_taxonomy"].analyses)
+            for name, result in results.items():
+                assert os.path.dirname(result.csv_path) == os.path.join(tmp_dir, "output", name)
+        
+        # 合并查询拆分为子查询时翻页阶段只记录一次
+        from instrumentation import get_instrumentation
+        from query_planner import _settings, configure_query_planner, plan_query
+        
+        def paging_count():
+            return get_instrumentation().snapshot()["stages"].get("search.arxiv_paging", {}).get("count", 0)
+        
+        original_settings = dict(_settings)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            try:
+                configure_query_planner(max_keywords=1)
+                for query in plan_query(replace(union, max_papers=30)).queries():
+                    write_synthetic_cassette(tmp_dir, 10, query=query)
+                configure_arxiv_replay("replay", tmp_dir)
+                paging_before = paging_count()
+                papers, _ = harvest_papers(configs, max_fetch=30)
+            finally:
+                configure_arxiv_replay("off")
+                _settings.update(original_settings)
+        assert papers and paging_count() == paging_before + 1
+        
+        print("✅ 多配置批量运行测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 多配置批量运行测试失败: {e}")
+        return False
+
+
+def test_query_planner():
+    """测试大查询拆分与并发合并"""
+    print("🧪 测试检索查询规划...")
+    
+    try:
+        import tempfile
+        from dataclasses import replace
+        from datetime import datetime
+        from arxiv_replay import configure_arxiv_replay
+        from benchmark import write_synthetic_cassette
+        from enhanced_main import search_with_config
+        from query_planner import (_settings, configure_query_planner, estimate_result_count, execute_plan, plan_query,
+                                   search_plan)
+        from user_config import UserConfig
+        
+        original_settings = dict(_settings)
+        base = replace(UserConfig.create_default(), start_date="2024-01-01", end_date="2024-12-31")
+        try:
+            # 检索词 × 研究领域拆分，不需要估计结果数
+            configure_query_planner(max_keywords=4, max_categories=2)
+            config = replace(base, search_keywords=[f"kw{i}" for i in range(10)],
+                             research_categories=["cs.AI", "cs.RO", "cs.CV", "cs.LG", "cs.CL"], max_papers=50)
+            
+            def no_estimate(query):
+                raise AssertionError("不应估计结果数")
+            
+            plan = plan_query(config, estimate=no_estimate)
+            assert len(plan.shards) == 9
+            assert all(len(shard.keywords) <= 4 and len(shard.categories) <= 2 for shard in plan.shards)
+            assert not plan_query(replace(config, search_keywords=["a"], research_categories=["cs.AI"]),
+                                  estimate=no_estimate).is_split
+            
+            # 超过结果窗口时按日期拆分（估计每天2篇）
+            configure_query_planner(max_keywords=8, max_categories=4, result_window=100)
+            
+            def estimate(query):
+                start, end = query.split("submittedDate:[")[1].rstrip("]").split(" TO ")
+                days = (datetime.strptime(end, "%Y%m%d") - datetime.strptime(start, "%Y%m%d")).days + 1
+                return days * 2
+            
+            plan = plan_query(replace(config, search_keywords=["a"], research_categories=["cs.AI"], max_papers=500),
+                              estimate=estimate)
+            assert plan.is_split
+            assert all(shard.estimated_results <= 100 for shard in plan.shards)
+            assert sum(shard.estimated_results for shard in plan.shards) == 366 * 2
+            
+            # 并发执行子查询并去重合并
+            configure_query_planner(max_keywords=1, result_window=10000)
+            config = replace(base, search_keywords=["robot", "navigation"], research_categories=["cs.RO"],
+                             max_papers=25)
+            plan = plan_query(config)
+            queries = plan.queries()
+            assert len(queries) == 2
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                write_synthetic_cassette(tmp_dir, 30, query=queries[0])
+                write_synthetic_cassette(tmp_dir, 20, query=queries[1])
+                configure_arxiv_replay("replay", tmp_dir)
+                try:
+                    papers = execute_plan(plan, workers=2)
+                    # 过滤条件在各子查询翻页时应用，合并的是过滤后的论文
+                    def even(paper):
+                        return int(paper.arxiv_id[-1]) % 2 == 0
+                    
+                    filtered = search_plan(plan, workers=2, predicate=even)
+                    capped = search_plan(replace(plan, base=replace(config, max_papers=5)), workers=2, predicate=even)
+                    
+                    # 已处理的论文在各子查询翻页时跳过并计数，跳过后仍已取完全部结果
+                    class OldPapers:
+                        def contains_result(self, result):
+                            return int(result.get_short_id().split("v")[0][-2:]) < 10
+                    
+                    searched = search_with_config(config, seen=OldPapers())
+                finally:
+                    configure_arxiv_replay("off")
+            assert len(papers) == 25
+            assert len({paper.arxiv_id for paper in papers}) == 25
+            dates = [paper._paper.published for paper in papers]
+            assert dates == sorted(dates, reverse=True)
+            assert len(filtered.papers) == 15 and all(even(paper) for paper in filtered.papers)
+            assert filtered.fetched == 50 and filtered.exhausted
+            assert len(capped.papers) == 5 and capped.fetched < 50 and not capped.exhausted
+            assert len(searched.papers) == 20 and searched.skipped == 20 and searched.exhausted
+
+            # 结果数从原始Atom响应的 opensearch:totalResults 读取
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                write_synthetic_cassette(tmp_dir, 3, query=queries[0], page_size=1)
+                configure_arxiv_replay("replay", tmp_dir)
+                try:
+                    assert estimate_result_count(queries[0]) == 3
+                finally:
+                    configure_arxiv_replay("off")
+        finally:
+            _settings.update(original_settings)
+        
+        print("✅ 检索查询规划测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 检索查询规划测试失败: {e}")
+        return False
+
+
+def test_search_executor():
+    """测试过滤条件下推与提前停止翻页"""
+    print("🧪 测试检索执行器...")
+    
+    try:
+        import tempfile
+        from arxiv_replay import configure_arxiv_replay
+        from benchmark import make_synthetic_corpus, write_synthetic_cassette
+        from enhanced_paper import EnhancedArxivPaper
+        from search_executor import cs_filter_for, execute_search, title_abstract_clause
+        
+        assert title_abstract_clause("embodied") == "(ti:embodied OR abs:embodied)"
+        assert title_abstract_clause("world model") == '(ti:"world model" OR abs:"world model")'
+        
+        # 研究领域全部为cs.*时过滤条件已由cat:子句下推，混合其他学科时才需要本地过滤
+        assert cs_filter_for(["cs.AI", "cs.RO"]) is None
+        assert cs_filter_for(["physics.optics"]) is None
+        assert cs_filter_for(["cs.AI", "physics.optics"]) is not None
+        
+        query = "(ti:navigation OR abs:navigation)"
+        corpus = make_synthetic_corpus(150)
+        expected = [p.title for p in corpus if "navigation" in p.title.lower()][:3]
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_synthetic_cassette(tmp_dir, 150, query=query)
+            configure_arxiv_replay("replay", tmp_dir)
+            try:
+                outcome = execute_search(query, 3, EnhancedArxivPaper, max_fetch=150,
+                                         predicate=lambda paper: "navigation" in paper.title.lower())
+                capped = execute_search(query, 3, EnhancedArxivPaper, max_fetch=20,
+                                        predicate=lambda paper: "navigation" in paper.title.lower())
+                unfiltered = execute_search(query, 5, EnhancedArxivPaper)
+            finally:
+                configure_arxiv_replay("off")
+        
+        assert [p.title for p in outcome.papers] == expected
+        assert outcome.fetched < 150, "凑够匹配数量后应停止翻页"
+        assert outcome.hit_rate == 3 / outcome.fetched
+        assert unfiltered.matched == unfiltered.fetched == 5
+        assert capped.fetched == 20 and capped.matched < 3
+        
+        print("✅ 检索执行器测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 检索执行器测试失败: {e}")
+        return False
+
+
+def test_seen_filter():
+    """测试已处理论文过滤器与增量运行"""
+    print("🧪 测试已处理论文过滤器...")
+    
+    try:
+        import tempfile
+        import llm
+        from arxiv_replay import configure_arxiv_replay
+        from benchmark import write_synthetic_cassette
+        from enhanced_main import build_search_query, run_pipeline
+        from mock_openai_server import MockOpenAIServer
+        from seen_filter import BloomFilter, SeenFilter, seen_key
+        from user_config import UserConfig
+        
+        assert seen_key("2401.00001") == "2401.00001v1"
+        assert seen_key("2401.00001v3") == "2401.00001v3"
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test.bloom")
+            with BloomFilter(path, capacity=1000, error_rate=0.001) as bloom:
+                for i in range(1000):
+                    bloom.add(f"2401.{i:05d}v1")
+            with BloomFilter(path) as bloom:
+                assert bloom.count == 1000 and bloom.capacity == 1000
+                assert all(f"2401.{i:05d}v1" in bloom for i in range(1000))
+                false_positives = sum(f"2402.{i:05d}v1" in bloom for i in range(10000))
+                assert false_positives < 100, f"误判过多: {false_positives}"
+            
+            config = UserConfig.create_default()
+            config.research_categories = ["cs.RO"]
+            config.max_papers = 4
+            output_dir = os.path.join(tmp_dir, "output")
+            
+            original_llm = llm.GLOBAL_LLM
+            write_synthetic_cassette(os.path.join(tmp_dir, "cassettes"), 10, query=build_search_query(config))
+            configure_arxiv_replay("replay", os.path.join(tmp_dir, "cassettes"))
+            try:
+                with MockOpenAIServer() as server:
+                    llm.ensure_global_llm(api_key="test", base_url=server.base_url, model="mock")
+                    first = run_pipeline(config, output_dir, dedup_threshold=0, skip_seen=True)
+                    second = run_pipeline(config, output_dir, dedup_threshold=0, skip_seen=True)
+                    assert server.stats["requests"] == 8
+            finally:
+                configure_arxiv_replay("off")
+                llm.GLOBAL_LLM = original_llm
+            
+            first_ids = {a.arxiv_url for a in first.analyses}
+            second_ids = {a.arxiv_url for a in second.analyses}
+            assert len(first_ids) == 4 and len(second_ids) == 4
+            assert not first_ids & second_ids, "第二次运行应跳过已分析的论文"
+            
+            seen = SeenFilter.for_output_dir(output_dir)
+            arxiv_id = first.analyses[0].arxiv_url.rstrip("/").split("/")[-1]
+            assert seen.contains(arxiv_id)
+            # 布隆过滤器命中但结果存储中没有的论文不会被误跳过
+            seen.bloom.add("9999.99999v1")
+            assert not seen.contains("9999.99999v1")
+            seen.close()
+        
+        print("✅ 已处理论文过滤器测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 已处理论文过滤器测试失败: {e}")
+        return False
+
+
+def test_fulltext_mode():
+    """测试全文分析模式"""
+    print("🧪 测试全文分析模式...")
+    
+    try:
+        import glob
+        import tempfile
+        import llm
+        from benchmark import make_synthetic_corpus, render_text_pdf
+        from enhanced_paper_analyzer import EnhancedPaperAnalyzer
+        from fulltext import FullTextExtractor, PDFCache, split_sections, select_sections
+        from mock_openai_server import MockOpenAIServer
+        from user_config import UserConfig
+        
+        pdf_bytes = render_text_pdf([
+            "Abstract",
+            "We study grasping with a mobile manipulator.",
+            "1 Introduction",
+            "Robots need to grasp objects in clutter.",
+            "4 Experiments",
+            "We evaluate on the YCB-Video dataset.",
+            "Metrics: success rate and grasp time.",
+            "References",
+            "[1] A. Author. Some paper. 2020.",
+        ])
+        fetched = []
+        
+        def fetch(url):
+            fetched.append(url)
+            return pdf_bytes
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache_dir = os.path.join(tmp_dir, "cache")
+            papers = make_synthetic_corpus(3)
+            
+            extractor = FullTextExtractor(cache_dir, fetch=fetch, workers=2, download_delay=0)
+            extractor.prepare(papers)
+            assert len(fetched) == 3
+            excerpt = extractor.get_excerpt(papers[0])
+            assert "YCB-Video dataset" in excerpt and "success rate" in excerpt
+            assert "Some paper" not in excerpt, "参考文献不应进入节选"
+            
+            sections = split_sections(PDFCache(cache_dir).get_text(
+                PDFCache(cache_dir).digest_for(papers[0]._paper.get_short_id()), extractor.extractor))
+            titles = [section.title for section in sections]
+            assert "Experiments" in titles and "References" in titles
+            assert "Introduction" not in select_sections(sections, max_tokens=1500)
+            
+            # 内容相同的PDF只保存一份；新的提取器命中缓存，不再下载
+            assert len(glob.glob(os.path.join(cache_dir, "pdf", "*", "*.pdf"))) == 1
+            second = FullTextExtractor(cache_dir, fetch=fetch, workers=1, download_delay=0)
+            assert second.get_excerpt(papers[1]) == excerpt
+            assert len(fetched) == 3
+            
+            config = UserConfig.create_default()
+            original_llm = llm.GLOBAL_LLM
+            try:
+                with MockOpenAIServer() as server:
+                    llm.ensure_global_llm(api_key="test", base_url=server.base_url, model="mock")
+                    plain = EnhancedPaperAnalyzer(config)
+                    analyzer = EnhancedPaperAnalyzer(config, fulltext=second)
+                    assert plain.input_fingerprint() != analyzer.input_fingerprint()
+                    analysis = analyzer.analyze_paper(papers[1])
+                    assert analysis is not None
+            finally:
+                llm.GLOBAL_LLM = original_llm
+        
+        print("✅ 全文分析模式测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 全文分析模式测试失败: {e}")
+        return False
+
+
+def test_mapreduce_extractor():
+    """测试全文map-reduce分析"""
+    print("🧪 测试全文map-reduce分析...")
+    
+    try:
+        import tempfile
+        import llm
+        import mapreduce_extractor
+        from benchmark import make_synthetic_corpus, render_text_pdf
+        from enhanced_paper_analyzer import EnhancedPaperAnalyzer
+        from instrumentation import get_instrumentation
+        from fulltext import FullTextExtractor
+        from mapreduce_extractor import MapReduceExtractor, chunk_fulltext
+        from mock_openai_server import MockOpenAIServer
+        from prompt_builder import TokenCounter
+        from user_config import UserConfig
+        
+        lines = []
+        for heading in ("1 Introduction", "2 Method", "3 Experiments", "4 Conclusion"):
+            lines.append(heading)
+            lines.extend(f"{heading[2:]} sentence number {i} describes the approach in detail." for i in range(20))
+        lines.extend(["References", "[1] A. Author. Some paper. 2020."])
+        pdf_bytes = render_text_pdf(lines)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            extractor = MapReduceExtractor(os.path.join(tmp_dir, "cache"), chunk_tokens=200, map_workers=3,
+                                           fetch=lambda url: pdf_bytes, workers=1, download_delay=0)
+            paper = make_synthetic_corpus(1)[0]
+            text = extractor.get_text(paper)
+            chunks = chunk_fulltext(text, 200)
+            counter = TokenCounter()
+            assert len(chunks) >= 3
+            assert all(counter.count(chunk) <= 200 for chunk in chunks)
+            assert "## Experiments" in "".join(chunks) and "Some paper" not in "".join(chunks)
+            
+            config = UserConfig.create_default()
+            original_llm = llm.GLOBAL_LLM
+            original_reduce = mapreduce_extractor.ENHANCED_REDUCE_PROMPT_TEMPLATE
+            try:
+                with MockOpenAIServer() as server:
+                    llm.ensure_global_llm(api_key="test", base_url=server.base_url, model="mock")
+                    analyzer = EnhancedPaperAnalyzer(config, fulltext=extractor)
+                    assert analyzer.analyze_paper(paper) is not None
+                    assert server.stats["requests"] == len(chunks) + 1
+                    
+                    # reduce提示词变化时map阶段的结果命中缓存，只重新调用reduce
+                    hits = get_instrumentation().snapshot()["counters"].get("mapreduce_chunk_cache_hits", 0)
+                    mapreduce_extractor.ENHANCED_REDUCE_PROMPT_TEMPLATE = original_reduce + "\n合并时保留数据集的版本号"
+                    assert analyzer.analyze_paper(paper) is not None
+                    assert server.stats["requests"] == len(chunks) + 2
+                    counters = get_instrumentation().snapshot()["counters"]
+                    assert counters["mapreduce_chunk_cache_hits"] - hits == len(chunks)
+                    
+                    excerpt_mode = EnhancedPaperAnalyzer(config, fulltext=FullTextExtractor(
+                        os.path.join(tmp_dir, "cache"), fetch=lambda url: pdf_bytes, download_delay=0))
+                    assert excerpt_mode.input_fingerprint() != analyzer.input_fingerprint()
+            finally:
+                mapreduce_extractor.ENHANCED_REDUCE_PROMPT_TEMPLATE = original_reduce
+                llm.GLOBAL_LLM = original_llm
+        
+        print("✅ 全文map-reduce分析测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 全文map-reduce分析测试失败: {e}")
+        return False
+
+
+def test_result_normalizer():
+    """测试检索结果的并行规范化"""
+    print("🧪 测试检索结果并行规范化...")
+    
+    try:
+        import pickle
+        import tempfile
+        from arxiv_replay import configure_arxiv_replay
+        from benchmark import make_synthetic_corpus, write_synthetic_cassette
+        from enhanced_paper import EnhancedArxivPaper
+        from result_normalizer import (PaperRecord, configure_normalizer, iter_results, normalize_raw,
+                                       raw_result, wrap_result)
+        from search_executor import execute_search
+        
+        corpus = make_synthetic_corpus(60)
+        results = [paper._paper for paper in corpus]
+        
+        record = normalize_raw(raw_result(results[0]))
+        assert record == pickle.loads(pickle.dumps(record))
+        assert record.get_short_id() == results[0].get_short_id()
+        assert record.arxiv_id == corpus[0].arxiv_id and record.published_date == corpus[0].published_date
+        
+        records = list(iter_results(results, workers=2, batch_size=7))
+        assert all(isinstance(r, PaperRecord) for r in records)
+        assert [r.entry_id for r in records] == [p.entry_id for p in corpus], "应保持检索结果的顺序"
+        for paper, r in zip(corpus, records):
+            wrapped = wrap_result(EnhancedArxivPaper, r)
+            assert (wrapped.arxiv_id, wrapped.title, wrapped.authors, wrapped.is_cs_related()) == \
+                (paper.arxiv_id, paper.title, paper.authors, paper.is_cs_related())
+        
+        # 消费方提前停止时翻页线程随之停止
+        consumed = []
+        
+        def endless():
+            for i in range(100000):
+                consumed.append(i)
+                yield results[i % len(results)]
+        
+        for i, _ in enumerate(iter_results(endless(), workers=1, batch_size=10)):
+            if i == 5:
+                break
+        assert len(consumed) < 100, f"提前停止后仍翻页了 {len(consumed)} 条"
+        
+        query = "(ti:navigation OR abs:navigation)"
+        predicate = lambda paper: "navigation" in paper.title.lower()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_synthetic_cassette(tmp_dir, 150, query=query)
+            configure_arxiv_replay("replay", tmp_dir)
+            try:
+                inline = execute_search(query, 3, EnhancedArxivPaper, max_fetch=150, predicate=predicate)
+                configure_normalizer(workers=2, batch_size=20)
+                pooled = execute_search(query, 3, EnhancedArxivPaper, max_fetch=150, predicate=predicate)
+            finally:
+                configure_normalizer(workers=0, batch_size=100)
+                configure_arxiv_replay("off")
+        assert [p.entry_id for p in pooled.papers] == [p.entry_id for p in inline.papers]
+        
+        print("✅ 检索结果并行规范化测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 检索结果并行规范化测试失败: {e}")
+        return False
+
+
+def test_service_mode():
+    """测试常驻服务模式的HTTP API"""
+    print("🧪 测试常驻服务模式...")
+    
+    try:
+        import tempfile
+        import time
+        import urllib.error
+        import urllib.request
+        import llm
+        from arxiv_replay import configure_arxiv_replay
+        from benchmark import write_synthetic_cassette
+        from enhanced_main import build_search_query
+        from mock_openai_server import MockOpenAIServer
+        from service import AnalysisService
+        from user_config import UserConfig
+        
+        def request(method, url, payload=None):
+            data = json.dumps(payload).encode("utf-8") if payload is not None else None
+            req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+            try:
+                with urllib.request.urlopen(req, timeout=30) as response:
+                    return response.status, response.read().decode("utf-8")
+            except urllib.error.HTTPError as e:
+                return e.code, e.read().decode("utf-8")
+        
+        config = UserConfig.create_default()
+        config.research_categories = ["cs.RO"]
+        config.max_papers = 4
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            original_llm = llm.GLOBAL_LLM
+            write_synthetic_cassette(os.path.join(tmp_dir, "cassettes"), 10, query=build_search_query(config))
+            configure_arxiv_replay("replay", os.path.join(tmp_dir, "cassettes"))
+            try:
+                with MockOpenAIServer() as server:
+                    llm.ensure_global_llm(api_key="test", base_url=server.base_url, model="mock")
+                    with AnalysisService(UserConfig.create_default(), os.path.join(tmp_dir, "output")) as service:
+                        base_url = service.start(port=0).base_url
+                        
+                        status, body = request("POST", f"{base_url}/jobs", {"config": {"unknown": 1}})
+                        assert status == 400
+                        status, body = request("POST", f"{base_url}/jobs", {
+                            "config": {"research_categories": ["cs.RO"], "max_papers": 4,
+                                       "start_date": config.start_date, "end_date": config.end_date}})
+                        assert status == 202
+                        job_id = json.loads(body)["job_id"]
+                        
+                        # 事件流在任务结束后关闭
+                        status, body = request("GET", f"{base_url}/jobs/{job_id}/events")
+                        events = [json.loads(line) for line in body.splitlines()]
+                        names = [event["event"] for event in events]
+                        assert names[0] == "queued" and names[-1] == "done", names
+                        assert names.count("analyzed") == 4
+                        
+                        status, body = request("GET", f"{base_url}/jobs/{job_id}")
+                        assert json.loads(body)["analyzed"] == 4
+                        
+                        status, body = request("GET", f"{base_url}/papers?limit=2")
+                        listing = json.loads(body)
+                        assert listing["total"] == 4 and len(listing["results"]) == 2
+                        
+                        arxiv_id = listing["results"][0]["arxiv_url"].rstrip("/").split("/")[-1]
+                        assert request("GET", f"{base_url}/papers/{arxiv_id}")[0] == 200
+                        assert request("GET", f"{base_url}/papers/9999.99999")[0] == 404
+                        
+                        # 已分析过的论文直接返回缓存结果，不调用LLM
+                        llm_requests = server.stats["requests"]
+                        start = time.perf_counter()
+                        status, body = request("POST", f"{base_url}/analyze", {"arxiv_id": arxiv_id})
+                        elapsed = time.perf_counter() - start
+                        assert status == 200 and json.loads(body)["cached"] is True
+                        assert server.stats["requests"] == llm_requests
+                        assert elapsed < 1.0, f"缓存命中耗时 {elapsed:.3f}s"
+                    
+                    # 重启服务时从结果存储载入已有结果
+                    with AnalysisService(UserConfig.create_default(), os.path.join(tmp_dir, "output")) as service:
+                        assert service.get_result(arxiv_id) is not None
+            finally:
+                configure_arxiv_replay("off")
+                llm.GLOBAL_LLM = original_llm
+        
+        print("✅ 常驻服务模式测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 常驻服务模式测试失败: {e}")
+        return False
+
+
+def test_scheduler():
+    """测试定时增量调度"""
+    print("🧪 测试定时增量调度...")
+    
+    try:
+        import random
+        import tempfile
+        from dataclasses import replace
+        from datetime import datetime
+        import llm
+        import search_executor
+        from arxiv_replay import configure_arxiv_replay
+        from benchmark import write_synthetic_cassette
+        from enhanced_main import build_search_query
+        from mock_openai_server import MockOpenAIServer
+        from scheduler import InstanceLock, ScheduleEntry, Scheduler
+        from user_config import UserConfig
+        
+        config = UserConfig.create_default()
+        config.research_categories = ["cs.RO"]
+        config.max_papers = 20
+        # 与合成语料的提交日期范围一致
+        config.start_date, config.end_date = "2024-01-01", "2024-06-30"
+        entry = ScheduleEntry("robotics", config, interval_seconds=24 * 3600, jitter_seconds=600)
+        max_fetch_factor = search_executor.MAX_FETCH_FACTOR
+        
+        now = [datetime.strptime(config.end_date, "%Y-%m-%d").replace(hour=12).timestamp()]
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            original_llm = llm.GLOBAL_LLM
+            cassette_dir = os.path.join(tmp_dir, "cassettes")
+            output_dir = os.path.join(tmp_dir, "output")
+            scheduler = Scheduler([entry], output_dir, clock=lambda: now[0], rng=random.Random(0))
+            write_synthetic_cassette(cassette_dir, 10, query=build_search_query(scheduler.incremental_config(entry)))
+            configure_arxiv_replay("replay", cassette_dir)
+            try:
+                with MockOpenAIServer() as server:
+                    llm.ensure_global_llm(api_key="test", base_url=server.base_url, model="mock")
+                    
+                    assert scheduler.run(once=True)
+                    state = scheduler.state["robotics"]
+                    assert state["last_new_papers"] == 10 and state["watermark"], state
+                    assert now[0] + 24 * 3600 <= state["next_run"] <= now[0] + 24 * 3600 + 600
+                    assert os.path.exists(os.path.join(output_dir, "robotics", "analysis_summary.md"))
+                    llm_requests = server.stats["requests"]
+                    
+                    # 未到期时不运行
+                    assert scheduler.run_pending() == 0
+                    
+                    # 下一次运行从水位线开始检索，已分析过的论文不再调用LLM
+                    now[0] += 25 * 3600
+                    scheduler = Scheduler([entry], output_dir, clock=lambda: now[0], rng=random.Random(0))
+                    incremental = scheduler.incremental_config(entry)
+                    assert incremental.start_date > config.start_date and incremental.end_date > config.end_date
+                    write_synthetic_cassette(cassette_dir, 10, query=build_search_query(incremental))
+                    assert scheduler.run_pending() == 1
+                    assert scheduler.state["robotics"]["last_new_papers"] == 0
+                    assert server.stats["requests"] == llm_requests
+                    
+                    # 已分析的论文占满翻页上限、新论文没有取完时水位线保持不变
+                    watermark = scheduler.state["robotics"]["watermark"]
+                    now[0] += 25 * 3600
+                    capped = ScheduleEntry("robotics", replace(config, max_papers=3), interval_seconds=24 * 3600)
+                    scheduler = Scheduler([capped], output_dir, clock=lambda: now[0], rng=random.Random(0))
+                    incremental = scheduler.incremental_config(capped)
+                    write_synthetic_cassette(cassette_dir, 14, query=build_search_query(incremental))
+                    search_executor.MAX_FETCH_FACTOR = 4
+                    try:
+                        result = scheduler.run_entry(capped)
+                    finally:
+                        search_executor.MAX_FETCH_FACTOR = max_fetch_factor
+                    assert len(result.analyses) == 2 and not result.search_exhausted
+                    assert scheduler.state["robotics"]["watermark"] == watermark
+            finally:
+                configure_arxiv_replay("off")
+                llm.GLOBAL_LLM = original_llm
+            
+            # 同一输出目录只能有一个调度器实例
+            lock_path = os.path.join(output_dir, "scheduler.lock")
+            first = InstanceLock(lock_path)
+            assert first.acquire()
+            try:
+                assert not InstanceLock(lock_path).acquire()
+                assert not Scheduler([entry], output_dir).run(once=True)
+            finally:
+                first.release()
+            assert InstanceLock(lock_path).acquire()
+        
+        print("✅ 定时增量调度测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 定时增量调度测试失败: {e}")
+        return False
+
+
+def test_work_queue():
+    """测试工作队列的租约/确认语义和多worker分析"""
+    print("🧪 测试多worker工作队列...")
+    
+    try:
+        import tempfile
+        import threading
+        import time
+        import llm
+        from benchmark import make_synthetic_corpus
+        from local_redis import LocalRedis
+        from mock_openai_server import MockOpenAIServer
+        from results_store import ResultsStore
+        from user_config import UserConfig
+        from work_queue import QueueWorker, RedisWorkQueue, SQLiteWorkQueue, enqueue_papers
+        
+        papers = make_synthetic_corpus(8)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            now = [1000.0]
+            queues = [SQLiteWorkQueue(os.path.join(tmp_dir, "queue.db"), clock=lambda: now[0]),
+                      RedisWorkQueue(LocalRedis(), clock=lambda: now[0])]
+            for queue in queues:
+                assert enqueue_papers(queue, papers[:3]) == 3
+                assert enqueue_papers(queue, papers[:3]) == 0
+                
+                first = queue.lease("w1", 1, lease_seconds=10)[0]
+                # 租约过期后任务重新被领取，原租约无法再确认
+                now[0] += 11
+                second = queue.lease("w2", 3, lease_seconds=10)
+                assert first.item_id in [item.item_id for item in second] and len(second) == 3
+                assert not queue.ack(first)
+                for item in second:
+                    assert queue.ack(item) if item.item_id == first.item_id else queue.nack(item, "err", max_attempts=2)
+                # 未达到尝试次数上限的任务放回队列，达到上限后标记为失败
+                retried = queue.lease("w1", 3)
+                assert len(retried) == 2 and all(item.attempts == 2 for item in retried)
+                for item in retried:
+                    queue.nack(item, "err", max_attempts=2)
+                assert queue.lease("w1", 3) == []
+                assert queue.stats() == {"pending": 0, "leased": 0, "done": 1, "failed": 2}, queue.stats()
+                # 已完成的任务不会重复入队
+                assert enqueue_papers(queue, papers[:1]) == 0
+                assert queue.done_ids() == [first.item_id]
+            queues[0].close()
+            
+            # 每次都让worker崩溃（租约过期未确认）的任务达到尝试次数上限后标记为失败，不再被领取
+            for queue in (SQLiteWorkQueue(os.path.join(tmp_dir, "expiry.db"), clock=lambda: now[0]),
+                          RedisWorkQueue(LocalRedis(), clock=lambda: now[0])):
+                enqueue_papers(queue, papers[:1])
+                for attempt in (1, 2):
+                    items = queue.lease("w", 1, lease_seconds=10, max_attempts=2)
+                    assert [item.attempts for item in items] == [attempt]
+                    now[0] += 11
+                assert queue.lease("w", 1, lease_seconds=10, max_attempts=2) == []
+                assert queue.stats() == {"pending": 0, "leased": 0, "done": 0, "failed": 1}, queue.stats()
+                queue.close()
+            
+            # Redis后端：多个线程同时领取时每个任务只被领取一次
+            redis_queue = RedisWorkQueue(LocalRedis(), name="concurrent")
+            enqueue_papers(redis_queue, papers)
+            leased = []
+            
+            def take_all():
+                while True:
+                    items = redis_queue.lease("w", 1)
+                    if not items:
+                        return
+                    leased.extend(items)
+            
+            takers = [threading.Thread(target=take_all) for _ in range(4)]
+            for taker in takers:
+                taker.start()
+            for taker in takers:
+                taker.join()
+            assert sorted(item.item_id for item in leased) == sorted(p._paper.get_short_id() for p in papers)
+            assert redis_queue.stats() == {"pending": 0, "leased": 8, "done": 0, "failed": 0}
+            
+            # worker在提交领取事务前崩溃时任务仍在待处理列表中
+            client = LocalRedis()
+            crash_queue = RedisWorkQueue(client)
+            enqueue_papers(crash_queue, papers[:1])
+            commit = client.transaction
+            
+            def crash_before_exec(func, *watches, **kwargs):
+                def crash(pipe):
+                    func(pipe)
+                    raise RuntimeError("worker崩溃")
+                return commit(crash, *watches, **kwargs)
+            
+            client.transaction = crash_before_exec
+            try:
+                crash_queue.lease("w1", 1)
+                raise AssertionError("应当抛出异常")
+            except RuntimeError:
+                pass
+            client.transaction = commit
+            assert crash_queue.stats()["pending"] == 1
+            assert [item.item_id for item in crash_queue.lease("w2", 1)] == [papers[0]._paper.get_short_id()]
+            
+            original_llm = llm.GLOBAL_LLM
+            try:
+                with MockOpenAIServer(latency=0.2) as server:
+                    llm.ensure_global_llm(api_key="test", base_url=server.base_url, model="mock")
+                    output_dir = os.path.join(tmp_dir, "output")
+                    queue = SQLiteWorkQueue(os.path.join(output_dir, "work_queue.db"))
+                    enqueue_papers(queue, papers)
+                    
+                    # 两个worker（各两个线程）共享同一个队列
+                    workers = [QueueWorker(SQLiteWorkQueue(queue.db_path), UserConfig.create_default(), output_dir,
+                                           worker_id=f"w{i}", threads=2) for i in range(2)]
+                    start = time.perf_counter()
+                    threads = [threading.Thread(target=worker.run) for worker in workers]
+                    for thread in threads:
+                        thread.start()
+                    for thread in threads:
+                        thread.join()
+                    elapsed = time.perf_counter() - start
+                    
+                    assert sum(worker.processed for worker in workers) == 8
+                    assert queue.stats()["done"] == 8
+                    assert server.stats["requests"] == 8
+                    assert ResultsStore.for_output_dir(output_dir).count_analyzed() == 8
+                    assert elapsed < 8 * 0.2 * 0.75, f"4个线程处理8篇论文耗时 {elapsed:.2f}s"
+            finally:
+                llm.GLOBAL_LLM = original_llm
+        
+        print("✅ 多worker工作队列测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 多worker工作队列测试失败: {e}")
+        return False
+
+
+def test_adaptive_concurrency():
+    """测试AIMD自适应并发控制"""
+    print("🧪 测试LLM自适应并发...")
+    
+    try:
+        import threading
+        import time
+        import concurrency_limiter
+        import llm
+        from benchmark import make_synthetic_corpus
+        from concurrency_limiter import AdaptiveConcurrencyLimiter, configure_concurrency, get_limiter, is_overload_error
+        from enhanced_paper_analyzer import EnhancedPaperAnalyzer
+        from metrics import LLM_CONCURRENCY_LIMIT
+        from mock_openai_server import MockOpenAIServer
+        from user_config import UserConfig
+        
+        class APIError(Exception):
+            def __init__(self, status_code):
+                super().__init__(f"HTTP {status_code}")
+                self.status_code = status_code
+        
+        assert is_overload_error(APIError(429)) and is_overload_error(APIError(503))
+        assert is_overload_error(TimeoutError()) and not is_overload_error(APIError(400))
+        
+        # 延迟稳定且并发用满时逐步增加并发数
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=1, max_limit=8)
+        peak = [0]
+        
+        def work():
+            for _ in range(40):
+                with limiter.slot():
+                    peak[0] = max(peak[0], limiter.inflight)
+                    time.sleep(0.002)
+        
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert limiter.limit == 8 and peak[0] <= 8, (limiter.limit, peak[0])
+        assert LLM_CONCURRENCY_LIMIT.get() == 8
+        
+        # 同一轮中并发失败的请求只减半一次
+        slots = [limiter.acquire() for _ in range(4)]
+        for slot in slots:
+            limiter.release(slot, "overload")
+        assert limiter.limit == 4, limiter.limit
+        for _ in range(3):
+            try:
+                with limiter.slot():
+                    raise APIError(429)
+            except APIError:
+                pass
+        assert limiter.limit == 1 and LLM_CONCURRENCY_LIMIT.get() == 1
+        # 其他错误不调整并发数
+        try:
+            with limiter.slot():
+                raise APIError(400)
+        except APIError:
+            pass
+        assert limiter.limit == 1
+        
+        fixed = AdaptiveConcurrencyLimiter(max_limit=3, adaptive=False)
+        fixed.release(fixed.acquire(), "overload")
+        assert fixed.limit == 3
+        
+        # 批量分析时并发数从1自动增长，结果保持输入顺序
+        original_settings = dict(concurrency_limiter._settings)
+        original_llm = llm.GLOBAL_LLM
+        try:
+            configure_concurrency(initial_limit=1, max_limit=6)
+            papers = make_synthetic_corpus(24)
+            with MockOpenAIServer(latency=0.05) as server:
+                llm.ensure_global_llm(api_key="test", base_url=server.base_url, model="mock")
+                analyses = EnhancedPaperAnalyzer(UserConfig.create_default()).analyze_papers_batch(papers)
+            assert [analysis.arxiv_url for analysis in analyses] == [paper.entry_id for paper in papers]
+            assert get_limiter().limit > 1, get_limiter().limit
+        finally:
+            concurrency_limiter._settings.update(original_settings)
+            configure_concurrency()
+            llm.GLOBAL_LLM = original_llm
+        
+        print("✅ LLM自适应并发测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ LLM自适应并发测试失败: {e}")
+        return False
+
+
+def test_retry_policy():
+    """测试LLM重试策略：错误分类、指数退避、重试预算和断路器"""
+    print("🧪 测试LLM重试策略...")
+    
+    try:
+        import random
+        import threading
+        import time
+        import llm
+        import retry_policy
+        from instrumentation import get_instrumentation
+        from metrics import LLM_CIRCUIT_OPEN
+        from mock_openai_server import MockOpenAIServer
+        from retry_policy import (FATAL, MALFORMED_OUTPUT, RATE_LIMIT, RETRYABLE, CircuitBreaker,
+                                  MalformedOutputError, RetryBudget, RetryPolicy, classify_error, configure_retry)
+        
+        class APIError(Exception):
+            def __init__(self, status_code, headers=None):
+                super().__init__(f"HTTP {status_code}")
+                self.status_code = status_code
+                self.response = type("Response", (), {"headers": headers or {}})()
+        
+        assert classify_error(APIError(401)) == FATAL and classify_error(ValueError()) == FATAL
+        assert classify_error(APIError(429)) == RATE_LIMIT
+        assert classify_error(APIError(503)) == RETRYABLE and classify_error(TimeoutError()) == RETRYABLE
+        assert classify_error(MalformedOutputError()) == MALFORMED_OUTPUT
+        
+        policy = RetryPolicy(max_attempts=4, base_delay=0.5, max_delay=3.0, rng=random.Random(0))
+        assert policy.next_delay(0, APIError(401)) is None
+        assert all(policy.backoff(n) <= min(3.0, 0.5 * 2 ** n) for n in range(8))
+        assert policy.next_delay(0, APIError(429, {"retry-after": "2"})) >= 2.0
+        assert policy.next_delay(0, MalformedOutputError()) == 0.0
+        assert policy.next_delay(1, MalformedOutputError()) is None
+        assert policy.next_delay(3, APIError(503)) is None
+        
+        budget = RetryBudget(ratio=0.5, min_retries=1)
+        budget.record_request()
+        budget.record_request()
+        assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+        
+        # 断路器：连续失败后打开，到期后只放行一个探测请求，探测成功后其余请求继续
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10, clock=lambda: now[0])
+        breaker.record_failure(RATE_LIMIT)
+        breaker.record_failure(RETRYABLE)
+        assert breaker.state == CircuitBreaker.CLOSED
+        breaker.record_failure(RETRYABLE)
+        assert breaker.state == CircuitBreaker.OPEN and LLM_CIRCUIT_OPEN.get() == 1
+        now[0] = 11
+        breaker.before_request()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        waiter = threading.Thread(target=breaker.before_request)
+        waiter.start()
+        waiter.join(timeout=0.2)
+        assert waiter.is_alive()
+        breaker.record_success()
+        waiter.join(timeout=1)
+        assert not waiter.is_alive() and LLM_CIRCUIT_OPEN.get() == 0
+        
+        class FakeCompletions:
+            def __init__(self, error):
+                self.error = error
+                self.calls = 0
+            
+            def create(self, **kwargs):
+                self.calls += 1
+                raise self.error
+        
+        original_settings = dict(retry_policy._settings)
+        original_llm = llm.GLOBAL_LLM
+        try:
+            with MockOpenAIServer(rate_limit_rate=0.5, seed=1) as server:
+                configure_retry(base_delay=0.01, max_delay=0.05)
+                client = llm.LLM(api_key="test", base_url=server.base_url, model="mock")
+                retries = get_instrumentation().snapshot()["counters"].get("llm_retries", 0)
+                for _ in range(10):
+                    assert client.generate([{"role": "user", "content": "hi"}])
+                assert server.stats["rate_limited"] > 0
+                assert get_instrumentation().snapshot()["counters"]["llm_retries"] - retries == \
+                    server.stats["rate_limited"]
+                
+                # 认证失败不重试
+                completions = FakeCompletions(APIError(401))
+                client.llm = type("Client", (), {"chat": type("Chat", (), {"completions": completions})()})()
+                start = time.perf_counter()
+                try:
+                    client.generate([{"role": "user", "content": "hi"}])
+                    raise AssertionError("认证失败应当抛出异常")
+                except APIError:
+                    pass
+                assert completions.calls == 1 and time.perf_counter() - start < 0.5
+                
+                # 服务持续不可用时断路器打开，重试前等待探测间隔
+                configure_retry(max_attempts=3, base_delay=0.001, circuit_threshold=2, circuit_reset_seconds=0.3)
+                completions.error, completions.calls = APIError(503), 0
+                start = time.perf_counter()
+                try:
+                    client.generate([{"role": "user", "content": "hi"}])
+                    raise AssertionError("服务不可用时应当抛出异常")
+                except APIError:
+                    pass
+                assert completions.calls == 3 and time.perf_counter() - start >= 0.3
+                assert retry_policy.get_retry_policy().breaker.state == CircuitBreaker.OPEN
+        finally:
+            retry_policy._settings.update(original_settings)
+            configure_retry()
+            llm.GLOBAL_LLM = original_llm
+        
+        print("✅ LLM重试策略测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ LLM重试策略测试失败: {e}")
+        return False
+
+
+def test_llm_transport():
+    """测试LLM共享连接池：所有LLM实例复用同一组连接，对比每个请求新建连接"""
+    print("🧪 测试LLM共享连接池...")
+    
+    try:
+        import shutil
+        import ssl
+        import tempfile
+        from concurrent.futures import ThreadPoolExecutor
+        import llm
+        import llm_transport
+        from benchmark import make_self_signed_cert, run_connection_benchmark
+        from llm_transport import configure_transport, get_http_client
+        from mock_openai_server import MockOpenAIServer
+        
+        original_settings = dict(llm_transport._settings)
+        original_llm = llm.GLOBAL_LLM
+        try:
+            configure_transport(max_connections=4, keepalive_expiry=30)
+            assert llm_transport.pool_size() == 4
+            with MockOpenAIServer(latency=0.02) as server:
+                clients = [llm.LLM(api_key="test", base_url=server.base_url, model="mock") for _ in range(2)]
+                assert clients[0].llm._client is clients[1].llm._client is get_http_client()
+                
+                messages = [{"role": "user", "content": "hi"}]
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    replies = list(executor.map(lambda i: clients[i % 2].generate(messages), range(20)))
+                assert all(replies) and server.stats["requests"] >= 20
+                assert 1 <= server.stats["connections"] <= 4, server.stats["connections"]
+                
+                # 不保留空闲连接时每个请求都新建连接
+                runs = run_connection_benchmark(server, requests=10, concurrency=2)
+                assert runs[0]["transport"] == "new_connection" and runs[0]["connections"] == 10
+                assert runs[1]["transport"] == "pooled" and runs[1]["connections"] <= 2
+            
+            # HTTPS：连接池同样复用TLS连接
+            if shutil.which("openssl"):
+                with tempfile.TemporaryDirectory() as cert_dir:
+                    certfile, keyfile = make_self_signed_cert(cert_dir)
+                    with MockOpenAIServer(certfile=certfile, keyfile=keyfile) as server:
+                        assert server.base_url.startswith("https://")
+                        context = ssl.create_default_context(cafile=certfile)
+                        runs = run_connection_benchmark(server, requests=6, concurrency=2, verify=context)
+                assert runs[0]["tls"] and runs[0]["connections"] == 6 and runs[1]["connections"] <= 2
+            
+            try:
+                configure_transport(read_timeout=-1)
+                raise AssertionError("负的超时时间应当报错")
+            except ValueError:
+                pass
+        finally:
+            llm_transport._settings.update(original_settings)
+            configure_transport()
+            llm.GLOBAL_LLM = original_llm
+        
+        print("✅ LLM共享连接池测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ LLM共享连接池测试失败: {e}")
+        return False
+
+
+def test_streaming_json():
+    """测试流式分析：增量JSON解析、完整对象到达后提前关闭流"""
+    print("🧪 测试流式分析...")
+    
+    try:
+        import time
+        import llm
+        from enhanced_paper_analyzer import EnhancedPaperAnalyzer
+        from instrumentation import get_instrumentation
+        from json_stream import IncrementalJSONObjectParser
+        from mock_openai_server import DEFAULT_ANALYSIS_RESPONSE, MockOpenAIServer
+        from prompt_builder import PromptBudget
+        from retry_policy import MalformedOutputError, configure_retry
+        from user_config import UserConfig
+        
+        # 跳过前言中的花括号，字符串中的括号和转义引号不影响配平
+        text = '思考：字段用 {key} 表示。\n```json\n{"a": "x}\\"y", "b": {"c": [1, 2]}}\n```\n后续说明 {"d": 1}'
+        parser = IncrementalJSONObjectParser()
+        chunks = [text[i:i + 3] for i in range(0, len(text), 3)]
+        result, used = None, 0
+        for chunk in chunks:
+            used += 1
+            result = parser.feed(chunk)
+            if result is not None:
+                break
+        assert result == {"a": 'x}"y', "b": {"c": [1, 2]}}, result
+        assert used < len(chunks)
+        
+        original_settings = dict(llm._settings)
+        original_llm = llm.GLOBAL_LLM
+        messages = [{"role": "user", "content": "hi"}]
+        try:
+            with MockOpenAIServer(token_delay=0.002, trailing_content="\n说明：" + "依据见摘要。" * 100) as server:
+                client = llm.LLM(api_key="test", base_url=server.base_url, model="mock")
+                start = time.perf_counter()
+                assert client.generate(messages).endswith("依据见摘要。")
+                full_seconds = time.perf_counter() - start
+                llm.configure_streaming(True)
+                start = time.perf_counter()
+                assert client.generate_json(messages) == DEFAULT_ANALYSIS_RESPONSE
+                assert time.perf_counter() - start < full_seconds
+                deadline = time.time() + 2
+                while server.stats["streams_aborted"] < 1 and time.time() < deadline:
+                    time.sleep(0.02)
+                assert server.stats["streams_aborted"] == 1
+                
+                # 流式模式下分析器直接得到解析结果
+                llm.GLOBAL_LLM = client
+                paper = make_test_paper("2401.00001v1", "Streaming Test", "A navigation paper.")
+                analysis = EnhancedPaperAnalyzer(UserConfig.create_default(),
+                                                 prompt_budget=PromptBudget(max_tokens=0)).analyze_paper(paper)
+                assert analysis is not None and analysis.methods == DEFAULT_ANALYSIS_RESPONSE["methods"]
+            
+            # 没有完整JSON对象时按输出格式错误重试一次后放弃（流式和非流式相同）
+            for stream in (True, False):
+                llm.configure_streaming(stream)
+                with MockOpenAIServer(response_content="无法完成分析") as server:
+                    client = llm.LLM(api_key="test", base_url=server.base_url, model="mock")
+                    try:
+                        client.generate_json(messages)
+                        raise AssertionError("没有JSON对象时应当抛出异常")
+                    except MalformedOutputError:
+                        pass
+                    assert server.stats["requests"] == 2
+            
+            # 非流式模式下从说明文字中提取JSON对象
+            def parse_count():
+                return get_instrumentation().snapshot()["stages"].get("parse_llm_response", {}).get("count", 0)
+            
+            with MockOpenAIServer(response_content="分析结果：\n```json\n{\"task_category\": \"C01\"}\n```") as server:
+                client = llm.LLM(api_key="test", base_url=server.base_url, model="mock")
+                parsed_before = parse_count()
+                assert client.generate_json(messages) == {"task_category": "C01"}
+                # 解析耗时在 generate_json 中统计（流式和非流式各一次）
+                llm.configure_streaming(True)
+                assert client.generate_json(messages) == {"task_category": "C01"}
+                assert parse_count() == parsed_before + 2
+        finally:
+            llm._settings.update(original_settings)
+            llm.GLOBAL_LLM = original_llm
+            configure_retry()
+        
+        print("✅ 流式分析测试通过")
+        return True
+        
+    except Exception as e:
+        print(f"❌ 流式分析测试失败: {e}")
+        return False
+
+
+def _free_port() -> int:
+    """获取一个空闲的本地端口"""
+    import socket
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
 def run_all_tests():
     """运行所有测试"""
     print("🚀 开始运行增强版系统测试\n")
@@ -214,7 +2041,32 @@ def run_all_tests():
         ("增强版论文类", test_enhanced_paper),
         ("增强版配置", test_enhanced_config),
         ("CSV导出器", test_csv_exporter),
-        ("搜索查询构建", test_search_query_building)
+        ("搜索查询构建", test_search_query_building),
+        ("跨运行趋势汇总", test_trend_analytics),
+        ("论文去重", test_paper_dedup),
+        ("结果存储与增量重新分析", test_results_store_reanalyze),
+        ("仅重新分类的快速路径", test_reclassify_fast_path),
+        ("token预算提示词构建", test_prompt_builder),
+        ("阶段耗时埋点", test_instrumentation),
+        ("Prometheus指标导出", test_metrics_exporter),
+        ("基准测试工具", test_benchmark_harness),
+        ("arXiv检索录制/回放", test_arxiv_replay),
+        ("延迟导入", test_lazy_imports),
+        ("进程内分析流程", test_run_pipeline_in_process),
+        ("多配置批量运行", test_batch_runner),
+        ("检索查询规划", test_query_planner),
+        ("检索执行器", test_search_executor),
+        ("已处理论文过滤器", test_seen_filter),
+        ("全文分析模式", test_fulltext_mode),
+        ("全文map-reduce分析", test_mapreduce_extractor),
+        ("检索结果并行规范化", test_result_normalizer),
+        ("常驻服务模式", test_service_mode),
+        ("定时增量调度", test_scheduler),
+        ("多worker工作队列", test_work_queue),
+        ("LLM自适应并发", test_adaptive_concurrency),
+        ("LLM重试策略", test_retry_policy),
+        ("LLM共享连接池", test_llm_transport),
+        ("流式分析", test_streaming_json)
     ]
     
     passed = 0
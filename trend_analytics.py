@@ -0,0 +1,350 @@
+"""
+跨运行趋势分析：将历次分析结果按日汇总为紧凑的计数矩阵，支持按日/周/月查询趋势和增长率
+"""
+
+import csv
+import json
+import os
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+
+# 参与趋势统计的维度 -> CSV列名
+TREND_DIMENSIONS = {
+    "task_category": "Task_Category",
+    "research_field": "Research_Field",
+    "novelty_score": "Novelty_Score",
+}
+
+SUPPORTED_PERIODS = ("day", "week", "month")
+# 聚合周期在报告中的名称
+PERIOD_NAMES = {"day": "日", "week": "周", "month": "月"}
+
+
+class TrendStore:
+    """
+    趋势数据存储
+
+    每个维度保存一个 (天数 x 标签数) 的int32计数矩阵（npz文件），
+    标签表、起始日期、已汇总的数据源和论文ID保存在旁路的JSON元数据中。
+    每个CSV只会被汇总一次，后续查询不再读取原始CSV。
+    """
+
+    DATA_FILE = "trends.npz"
+    META_FILE = "trends_meta.json"
+
+    def __init__(self, store_dir: str = "output/trends"):
+        self.store_dir = store_dir
+        self._reset()
+        self._load()
+
+    # ------------------------------------------------------------------
+    # 持久化
+    # ------------------------------------------------------------------
+    def _reset(self):
+        self.start_day: Optional[int] = None
+        self.labels: Dict[str, List[str]] = {dim: [] for dim in TREND_DIMENSIONS}
+        self.counts: Dict[str, np.ndarray] = {
+            dim: np.zeros((0, 0), dtype=np.int32) for dim in TREND_DIMENSIONS
+        }
+        self.ingested_sources: List[str] = []
+        self.seen_papers = set()
+        self._label_index: Dict[str, Dict[str, int]] = {dim: {} for dim in TREND_DIMENSIONS}
+
+    def _load(self):
+        meta_path = os.path.join(self.store_dir, self.META_FILE)
+        data_path = os.path.join(self.store_dir, self.DATA_FILE)
+        if not (os.path.exists(meta_path) and os.path.exists(data_path)):
+            return
+
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with np.load(data_path) as data:
+                for dim in TREND_DIMENSIONS:
+                    if dim in data:
+                        self.counts[dim] = data[dim].astype(np.int32)
+
+            self.start_day = meta.get("start_day")
+            self.ingested_sources = meta.get("ingested_sources", [])
+            self.seen_papers = set(meta.get("seen_papers", []))
+            for dim in TREND_DIMENSIONS:
+                self.labels[dim] = meta.get("labels", {}).get(dim, [])
+                self._label_index[dim] = {label: i for i, label in enumerate(self.labels[dim])}
+        except Exception as e:
+            logger.warning(f"加载趋势数据失败: {str(e)}，将重新开始汇总")
+            self._reset()
+
+    def save(self):
+        """保存趋势数据"""
+        os.makedirs(self.store_dir, exist_ok=True)
+        meta = {
+            "start_day": self.start_day,
+            "labels": self.labels,
+            "ingested_sources": self.ingested_sources,
+            "seen_papers": sorted(self.seen_papers),
+            "updated_at": datetime.now().isoformat(),
+        }
+        np.savez_compressed(os.path.join(self.store_dir, self.DATA_FILE), **self.counts)
+        with open(os.path.join(self.store_dir, self.META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    # ------------------------------------------------------------------
+    # 汇总
+    # ------------------------------------------------------------------
+    def has_source(self, source: str) -> bool:
+        """数据源是否已经汇总过"""
+        return source in self.ingested_sources
+
+    def ingest_analyses(self, analyses: List, source: Optional[str] = None) -> int:
+        """
+        汇总一次运行的分析结果
+
+        Args:
+            analyses: EnhancedPaperAnalysis对象列表
+            source: 数据源标识（通常为CSV文件名），用于避免重复汇总
+
+        Returns:
+            新增计入的论文数量
+        """
+        rows = (
+            (
+                analysis.arxiv_url,
+                analysis.publication_date,
+                {
+                    "task_category": analysis.task_category,
+                    "research_field": analysis.research_field,
+                    "novelty_score": str(analysis.novelty_score),
+                },
+            )
+            for analysis in analyses
+        )
+        return self._ingest(rows, source)
+
+    def ingest_csv(self, csv_path: str) -> int:
+        """
+        汇总一个历史分析CSV文件（已汇总过的文件直接跳过）
+
+        Args:
+            csv_path: enhanced_papers_analysis_*.csv 文件路径
+
+        Returns:
+            新增计入的论文数量
+        """
+        source = os.path.basename(csv_path)
+        if self.has_source(source):
+            return 0
+
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            rows = [
+                (
+                    row.get("ArXiv_URL", ""),
+                    row.get("Publication_Date", ""),
+                    {dim: row.get(column, "") for dim, column in TREND_DIMENSIONS.items()},
+                )
+                for row in reader
+            ]
+        return self._ingest(rows, source)
+
+    def _ingest(self, rows: Iterable[Tuple[str, str, Dict[str, str]]], source: Optional[str]) -> int:
+        if source and self.has_source(source):
+            return 0
+
+        added = 0
+        for paper_key, date_str, values in rows:
+            paper_key = _normalize_paper_key(paper_key)
+            if paper_key and paper_key in self.seen_papers:
+                continue
+
+            day = _parse_day(date_str)
+            if day is None:
+                continue
+
+            row_index = self._ensure_day(day)
+            for dim, label in values.items():
+                label = (label or "").strip() or "未知"
+                col_index = self._ensure_label(dim, label)
+                self.counts[dim][row_index, col_index] += 1
+
+            if paper_key:
+                self.seen_papers.add(paper_key)
+            added += 1
+
+        if source:
+            self.ingested_sources.append(source)
+        return added
+
+    def _ensure_day(self, day: int) -> int:
+        """确保日期在矩阵范围内，返回对应的行号"""
+        if self.start_day is None:
+            self.start_day = day
+
+        if day < self.start_day:
+            pad = self.start_day - day
+            for dim in TREND_DIMENSIONS:
+                self.counts[dim] = np.pad(self.counts[dim], ((pad, 0), (0, 0)))
+            self.start_day = day
+
+        row_index = day - self.start_day
+        num_days = self._num_days()
+        if row_index >= num_days:
+            pad = row_index - num_days + 1
+            for dim in TREND_DIMENSIONS:
+                self.counts[dim] = np.pad(self.counts[dim], ((0, pad), (0, 0)))
+        return row_index
+
+    def _ensure_label(self, dim: str, label: str) -> int:
+        index = self._label_index[dim].get(label)
+        if index is None:
+            index = len(self.labels[dim])
+            self.labels[dim].append(label)
+            self._label_index[dim][label] = index
+            self.counts[dim] = np.pad(self.counts[dim], ((0, 0), (0, 1)))
+        return index
+
+    def _num_days(self) -> int:
+        return max(matrix.shape[0] for matrix in self.counts.values())
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    @property
+    def total_papers(self) -> int:
+        """已汇总的论文总数"""
+        return int(self.counts["task_category"].sum())
+
+    def period_counts(self, dimension: str, period: str = "week") -> Tuple[List[str], List[str], np.ndarray]:
+        """
+        按周期聚合计数
+
+        Args:
+            dimension: 维度名称（见 TREND_DIMENSIONS）
+            period: 聚合周期 day/week/month
+
+        Returns:
+            (周期标签列表, 维度标签列表, 周期数 x 标签数 的计数矩阵)
+        """
+        if dimension not in TREND_DIMENSIONS:
+            raise ValueError(f"不支持的趋势维度: {dimension}")
+        if period not in SUPPORTED_PERIODS:
+            raise ValueError(f"不支持的聚合周期: {period}")
+
+        matrix = self.counts[dimension]
+        labels = list(self.labels[dimension])
+        if self.start_day is None or matrix.shape[0] == 0:
+            return [], labels, np.zeros((0, len(labels)), dtype=np.int64)
+
+        days = [date.fromordinal(self.start_day + i) for i in range(matrix.shape[0])]
+        if period == "day":
+            return [d.isoformat() for d in days], labels, matrix.astype(np.int64)
+
+        if period == "week":
+            keys = [(d - timedelta(days=d.weekday())).isoformat() for d in days]
+        else:
+            keys = [d.strftime("%Y-%m") for d in days]
+
+        # 日期有序，因此相同周期的行是连续的，可以用reduceat一次性聚合
+        boundaries = [0] + [i for i in range(1, len(keys)) if keys[i] != keys[i - 1]]
+        aggregated = np.add.reduceat(matrix.astype(np.int64), boundaries, axis=0)
+        period_labels = [keys[i] for i in boundaries]
+        return period_labels, labels, aggregated
+
+    def trend_table(self, dimension: str = "task_category", period: str = "week",
+                    last_n: int = 6, top_n: int = 10) -> Dict:
+        """
+        生成趋势表：最近 last_n 个周期内论文数最多的 top_n 个标签
+
+        Returns:
+            {"periods": [...], "rows": [(标签, [各周期计数])]}
+        """
+        periods, labels, matrix = self.period_counts(dimension, period)
+        if not periods or not labels:
+            return {"periods": [], "rows": []}
+
+        periods = periods[-last_n:]
+        window = matrix[-last_n:]
+        totals = window.sum(axis=0)
+        order = np.argsort(-totals, kind="stable")[:top_n]
+        rows = [
+            (labels[i], [int(v) for v in window[:, i]])
+            for i in order if totals[i] > 0
+        ]
+        return {"periods": periods, "rows": rows}
+
+    def growth_rates(self, dimension: str = "task_category", period: str = "week",
+                     top_n: int = 10) -> List[Dict]:
+        """
+        计算最近一个周期相对上一个周期的增长率
+
+        Returns:
+            按最近周期论文数排序的列表，每项包含 label/current/previous/growth_rate，
+            上一周期为0时 growth_rate 为 None
+        """
+        periods, labels, matrix = self.period_counts(dimension, period)
+        if len(periods) < 2:
+            return []
+
+        current = matrix[-1]
+        previous = matrix[-2]
+        results = []
+        for i in np.argsort(-current, kind="stable")[:top_n]:
+            if current[i] == 0 and previous[i] == 0:
+                continue
+            rate = None
+            if previous[i] > 0:
+                rate = float(current[i] - previous[i]) / float(previous[i])
+            results.append({
+                "label": labels[i],
+                "current": int(current[i]),
+                "previous": int(previous[i]),
+                "growth_rate": rate,
+            })
+        return results
+
+
+def update_trend_store(output_dir: str) -> TrendStore:
+    """
+    将输出目录中尚未汇总的分析CSV汇总进趋势存储
+
+    Args:
+        output_dir: 输出目录
+
+    Returns:
+        更新后的TrendStore
+    """
+    store = TrendStore(os.path.join(output_dir, "trends"))
+    csv_files = sorted(Path(output_dir).glob("enhanced_papers_analysis_*.csv"))
+
+    new_sources = 0
+    for csv_file in csv_files:
+        if store.has_source(csv_file.name):
+            continue
+        added = store.ingest_csv(str(csv_file))
+        new_sources += 1
+        logger.debug(f"趋势汇总: {csv_file.name} 新增 {added} 篇论文")
+
+    if new_sources:
+        store.save()
+        logger.info(f"趋势数据已更新，新增 {new_sources} 个数据源")
+    return store
+
+
+def _parse_day(date_str: str) -> Optional[int]:
+    """将YYYY-MM-DD日期转换为序数日"""
+    try:
+        return datetime.strptime((date_str or "").strip()[:10], "%Y-%m-%d").toordinal()
+    except ValueError:
+        return None
+
+
+def _normalize_paper_key(url: str) -> str:
+    """将arXiv链接规范化为不带版本号的ID"""
+    key = (url or "").strip().rstrip('/').split('/')[-1]
+    if 'v' in key and key.rsplit('v', 1)[-1].isdigit():
+        key = key.rsplit('v', 1)[0]
+    return key
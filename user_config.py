@@ -4,7 +4,7 @@
 
 import json
 import os
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields, replace
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
 from loguru import logger
@@ -107,6 +107,23 @@ def validate_config(config: UserConfig) -> bool:
         return False
 
 
+def config_from_dict(data: Dict[str, Any], base: UserConfig) -> UserConfig:
+    """
+    用字典中的字段覆盖基础配置（服务模式的任务请求、调度配置文件）
+
+    Raises:
+        ValueError: 包含未知字段或配置无效
+    """
+    known = {f.name for f in fields(UserConfig)}
+    unknown = sorted(set(data) - known)
+    if unknown:
+        raise ValueError(f"未知的配置字段: {', '.join(unknown)}")
+    config = replace(base, **data)
+    if not validate_config(config):
+        raise ValueError("配置无效")
+    return config
+
+
 def get_effective_task_categories(config: UserConfig) -> Dict[str, Dict[str, str]]:
     """获取有效的任务分类（默认+自定义）"""
     from enhanced_config import ENHANCED_TASK_CATEGORIES
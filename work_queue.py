@@ -0,0 +1,501 @@
+"""
+持久化工作队列：把待分析论文放入队列，由任意多个进程/机器上的worker领取（租约）、分析、写入结果存储后确认，
+大批量回填时分析吞吐随worker数量横向扩展。
+
+队列提供至少一次（at-least-once）语义：worker崩溃或租约超时后任务重新回到队列，
+worker写入结果前检查结果存储，重复投递的论文不会重复调用LLM。
+默认使用SQLite后端（同一台机器或共享目录上的多个进程），跨机器时使用Redis后端。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+from loguru import logger
+
+from instrumentation import incr, span
+
+if TYPE_CHECKING:
+    from enhanced_main import PipelineResult
+    from prompt_builder import PromptBudget
+    from user_config import UserConfig
+
+
+QUEUE_FILE = "work_queue.db"
+DEFAULT_QUEUE_NAME = "papers"
+
+# 默认租约时长（秒）：worker在此时间内未确认时任务重新回到队列
+DEFAULT_LEASE_SECONDS = 600.0
+# 每个任务最多的尝试次数，超过后标记为失败
+DEFAULT_MAX_ATTEMPTS = 3
+# 队列为空时worker的轮询间隔（秒）
+DEFAULT_POLL_INTERVAL = 2.0
+# 租约过期且达到尝试次数上限的任务记录的失败原因
+LEASE_EXPIRED_ERROR = "租约过期（worker可能在处理时崩溃）"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue_items (
+    item_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_token TEXT,
+    lease_expires REAL,
+    worker TEXT,
+    last_error TEXT,
+    enqueued_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_queue_items_status ON queue_items (status, lease_expires);
+"""
+
+
+@dataclass
+class WorkItem:
+    """一个已领取的任务"""
+    item_id: str
+    payload: Dict
+    attempts: int
+    lease_token: str
+
+
+class SQLiteWorkQueue:
+    """
+    基于SQLite的工作队列，领取任务时在一个写事务中完成，多个进程可以安全地共享同一个数据库文件
+
+    Args:
+        db_path: 数据库文件路径
+        clock: 当前时间（秒），测试时可替换
+    """
+
+    def __init__(self, db_path: str, clock: Callable[[], float] = time.time):
+        self.db_path = db_path
+        self.clock = clock
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # 手动管理事务（BEGIN IMMEDIATE），多个进程同时领取任务时由SQLite的写锁串行化
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def enqueue(self, items: Iterable[Tuple[str, Dict]]) -> int:
+        """
+        加入任务，已在队列中（包括已完成）的任务ID被忽略
+
+        Returns:
+            新加入的任务数
+        """
+        now = self.clock()
+        rows = [(item_id, json.dumps(payload, ensure_ascii=False), now) for item_id, payload in items]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO queue_items (item_id, payload, enqueued_at) VALUES (?, ?, ?)", rows
+            )
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def lease(self, worker_id: str, count: int = 1, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+              max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> List[WorkItem]:
+        """
+        领取最多 count 个待处理或租约已过期的任务
+
+        租约过期的任务已尝试 max_attempts 次时标记为失败（如每次都让worker崩溃的论文），不再重新领取。
+        """
+        now = self.clock()
+        items = []
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                expired = self._conn.execute(
+                    "UPDATE queue_items SET status = 'failed', lease_token = NULL, last_error = ? "
+                    "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (LEASE_EXPIRED_ERROR, now, max_attempts),
+                ).rowcount
+                if expired:
+                    incr("queue_failures", expired)
+                    logger.warning(f"{expired} 个任务租约过期且已达到尝试次数上限，标记为失败")
+                rows = self._conn.execute(
+                    "SELECT item_id, payload, attempts FROM queue_items "
+                    "WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?) "
+                    "ORDER BY enqueued_at, rowid LIMIT ?",
+                    (now, count),
+                ).fetchall()
+                for row in rows:
+                    token = uuid.uuid4().hex
+                    self._conn.execute(
+                        "UPDATE queue_items SET status = 'leased', attempts = attempts + 1, lease_token = ?, "
+                        "lease_expires = ?, worker = ? WHERE item_id = ?",
+                        (token, now + lease_seconds, worker_id, row["item_id"]),
+                    )
+                    items.append(WorkItem(row["item_id"], json.loads(row["payload"]), row["attempts"] + 1, token))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return items
+
+    def ack(self, item: WorkItem) -> bool:
+        """确认任务完成，租约已过期并被其他worker领取时返回False"""
+        return self._finish(
+            "UPDATE queue_items SET status = 'done', lease_token = NULL, last_error = NULL "
+            "WHERE item_id = ? AND lease_token = ?",
+            (item.item_id, item.lease_token),
+        )
+
+    def nack(self, item: WorkItem, error: str = "", max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> bool:
+        """任务失败：尝试次数未达上限时放回队列，否则标记为失败"""
+        return self._finish(
+            "UPDATE queue_items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_token = NULL, last_error = ? WHERE item_id = ? AND lease_token = ?",
+            (max_attempts, error, item.item_id, item.lease_token),
+        )
+
+    def _finish(self, sql: str, params) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+        return cursor.rowcount == 1
+
+    def stats(self) -> Dict[str, int]:
+        """各状态的任务数（pending / leased / done / failed）"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS n FROM queue_items GROUP BY status").fetchall()
+        stats = {"pending": 0, "leased": 0, "done": 0, "failed": 0}
+        stats.update({row["status"]: row["n"] for row in rows})
+        return stats
+
+    def done_ids(self) -> List[str]:
+        """已完成的任务ID"""
+        with self._lock:
+            rows = self._conn.execute("SELECT item_id FROM queue_items WHERE status = 'done'").fetchall()
+        return [row["item_id"] for row in rows]
+
+
+class RedisWorkQueue:
+    """
+    基于Redis的工作队列，供分布在多台机器上的worker共享
+
+    待处理任务放在列表中，租约放在以到期时间为分数的有序集合中，领取任务时先把过期租约放回列表。
+    任务在列表、租约和完成集合之间的每次移动都在一个 WATCH/MULTI 事务中完成，
+    worker在任意时刻崩溃都不会让任务同时离开待处理列表和租约集合。
+    只使用基本命令和事务，可以用 local_redis.LocalRedis 等兼容实现替换。
+
+    Args:
+        client: redis.Redis 客户端或兼容对象
+        name: 队列名，作为所有键的前缀
+        clock: 当前时间（秒），测试时可替换
+    """
+
+    def __init__(self, client, name: str = DEFAULT_QUEUE_NAME, clock: Callable[[], float] = time.time):
+        self.client = client
+        self.name = name
+        self.clock = clock
+
+    def _key(self, suffix: str) -> str:
+        return f"{self.name}:{suffix}"
+
+    def close(self):
+        pass
+
+    def enqueue(self, items: Iterable[Tuple[str, Dict]]) -> int:
+        added = 0
+        for item_id, payload in items:
+            def add(pipe, item_id=item_id, payload=payload) -> bool:
+                if pipe.sismember(self._key("done"), item_id) or \
+                        pipe.hget(self._key("payloads"), item_id) is not None:
+                    return False
+                pipe.multi()
+                pipe.hset(self._key("payloads"), item_id, json.dumps(payload, ensure_ascii=False))
+                pipe.rpush(self._key("pending"), item_id)
+                return True
+
+            added += self.client.transaction(add, self._key("payloads"), value_from_callable=True)
+        return added
+
+    def _requeue_expired(self, now: float, max_attempts: int):
+        """过期租约的任务放回队列，已达到尝试次数上限的标记为失败"""
+        for item_id in self.client.zrangebyscore(self._key("leases"), "-inf", now):
+            item_id = _text(item_id)
+
+            def requeue(pipe) -> bool:
+                # 其他worker已放回或原worker已确认时租约不再存在
+                score = pipe.zscore(self._key("leases"), item_id)
+                if score is None or float(score) > now:
+                    return False
+                exhausted = int(pipe.hget(self._key("attempts"), item_id) or 0) >= max_attempts
+                pipe.multi()
+                pipe.zrem(self._key("leases"), item_id)
+                pipe.hdel(self._key("tokens"), item_id)
+                if exhausted:
+                    pipe.hset(self._key("failed"), item_id, LEASE_EXPIRED_ERROR)
+                else:
+                    pipe.rpush(self._key("pending"), item_id)
+                return exhausted
+
+            if self.client.transaction(requeue, self._key("leases"), value_from_callable=True):
+                incr("queue_failures")
+                logger.warning(f"{item_id} 租约过期且已达到尝试次数上限，标记为失败")
+
+    def lease(self, worker_id: str, count: int = 1, lease_seconds: float = DEFAULT_LEASE_SECONDS,
+              max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> List[WorkItem]:
+        now = self.clock()
+        self._requeue_expired(now, max_attempts)
+        items = []
+        for _ in range(count):
+            token = uuid.uuid4().hex
+
+            def take(pipe) -> Optional[WorkItem]:
+                # 队首任务被其他worker取走时事务失败并重试
+                item_id = _text(pipe.lindex(self._key("pending"), 0))
+                if item_id is None:
+                    return None
+                attempts = int(pipe.hget(self._key("attempts"), item_id) or 0) + 1
+                payload = pipe.hget(self._key("payloads"), item_id)
+                pipe.multi()
+                pipe.lpop(self._key("pending"))
+                pipe.zadd(self._key("leases"), {item_id: now + lease_seconds})
+                pipe.hset(self._key("tokens"), item_id, token)
+                pipe.hincrby(self._key("attempts"), item_id, 1)
+                return WorkItem(item_id, json.loads(_text(payload)), attempts, token)
+
+            item = self.client.transaction(take, self._key("pending"), value_from_callable=True)
+            if item is None:
+                break
+            items.append(item)
+        return items
+
+    def _release(self, item: WorkItem, finish: Callable) -> bool:
+        """校验租约令牌，在同一个事务中释放租约并执行 finish(pipe)"""
+        def release(pipe) -> bool:
+            if _text(pipe.hget(self._key("tokens"), item.item_id)) != item.lease_token:
+                return False
+            pipe.multi()
+            pipe.zrem(self._key("leases"), item.item_id)
+            pipe.hdel(self._key("tokens"), item.item_id)
+            finish(pipe)
+            return True
+
+        return self.client.transaction(release, self._key("tokens"), value_from_callable=True)
+
+    def ack(self, item: WorkItem) -> bool:
+        def finish(pipe):
+            pipe.sadd(self._key("done"), item.item_id)
+            pipe.hdel(self._key("payloads"), item.item_id)
+            pipe.hdel(self._key("attempts"), item.item_id)
+
+        return self._release(item, finish)
+
+    def nack(self, item: WorkItem, error: str = "", max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> bool:
+        def finish(pipe):
+            if item.attempts >= max_attempts:
+                pipe.hset(self._key("failed"), item.item_id, error)
+            else:
+                pipe.rpush(self._key("pending"), item.item_id)
+
+        return self._release(item, finish)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": int(self.client.llen(self._key("pending"))),
+            "leased": int(self.client.zcard(self._key("leases"))),
+            "done": int(self.client.scard(self._key("done"))),
+            "failed": int(self.client.hlen(self._key("failed"))),
+        }
+
+    def done_ids(self) -> List[str]:
+        return sorted(_text(item_id) for item_id in self.client.smembers(self._key("done")))
+
+
+def _text(value) -> Optional[str]:
+    """redis-py 未开启 decode_responses 时返回bytes"""
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def open_work_queue(url: Optional[str] = None, output_dir: str = "output", name: str = DEFAULT_QUEUE_NAME):
+    """
+    按地址打开工作队列
+
+    Args:
+        url: redis:// 或 rediss:// 开头时使用Redis后端（需要安装redis包），
+            否则视为SQLite数据库路径（可带 sqlite:/// 前缀）；为空时使用 <output_dir>/work_queue.db
+        output_dir: 输出目录
+        name: Redis后端的队列名
+    """
+    if url and url.startswith(("redis://", "rediss://")):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("Redis工作队列需要安装redis包: pip install redis") from e
+        return RedisWorkQueue(redis.Redis.from_url(url), name=name)
+    if url and url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SQLiteWorkQueue(url or os.path.join(output_dir, QUEUE_FILE))
+
+
+def enqueue_papers(queue, papers: Iterable) -> int:
+    """
+    把论文加入工作队列，任务ID为带版本号的arXiv ID，负载为论文元数据（worker无需重新请求arXiv）
+
+    Returns:
+        新加入的任务数
+    """
+    from results_store import _paper_record
+
+    added = queue.enqueue((paper._paper.get_short_id(), _paper_record(paper)) for paper in papers)
+    incr("queue_enqueued", added)
+    logger.info(f"已加入 {added} 篇论文到工作队列")
+    return added
+
+
+class QueueWorker:
+    """
+    工作队列的消费者：领取论文、调用 EnhancedPaperAnalyzer.analyze_paper 分析并写入结果存储后确认
+
+    同一进程内可用多个线程并发处理，更多吞吐通过在其他进程/机器上启动worker获得。
+    调用前需要先通过 set_global_llm() 设置LLM。
+
+    Args:
+        queue: SQLiteWorkQueue 或 RedisWorkQueue
+        config: 用户配置（决定分类表）
+        output_dir: 结果存储所在的输出目录
+        worker_id: worker标识，默认为 主机名-进程号
+        prompt_budget: 提示词token预算
+        fulltext: FullTextExtractor对象（全文模式）
+        threads: 本进程内并发处理的线程数
+        lease_seconds: 租约时长（秒），应大于单篇论文的分析耗时
+        max_attempts: 每篇论文最多的尝试次数
+        poll_interval: 队列为空时的轮询间隔（秒）
+    """
+
+    def __init__(self, queue, config: 'UserConfig', output_dir: str = "output", worker_id: Optional[str] = None,
+                 prompt_budget: Optional['PromptBudget'] = None, fulltext=None, threads: int = 1,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                 poll_interval: float = DEFAULT_POLL_INTERVAL):
+        import socket
+        from enhanced_paper_analyzer import EnhancedPaperAnalyzer
+        from results_store import ResultsStore
+
+        self.queue = queue
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.threads = max(1, threads)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.analyzer = EnhancedPaperAnalyzer(config, prompt_budget=prompt_budget, fulltext=fulltext)
+        self.fingerprint = self.analyzer.input_fingerprint()
+        self.store = ResultsStore.for_output_dir(output_dir)
+        self.processed = 0
+        self._count_lock = threading.Lock()
+
+    def process(self, item: WorkItem) -> bool:
+        """处理一个任务，返回是否分析成功"""
+        from results_store import _paper_from_row
+
+        paper = _paper_from_row(item.payload)
+        # 重复投递（租约过期后被重新领取）的论文已有相同指纹的结果时直接确认
+        if self.store.has_analysis(paper.arxiv_id, item.payload["version"]) and \
+                self.store.get_fingerprint(paper.arxiv_id) == self.fingerprint:
+            incr("queue_redelivered")
+            self.queue.ack(item)
+            return True
+
+        with span("queue.analyze"):
+            analysis = self.analyzer.analyze_paper(paper)
+        if analysis is None:
+            incr("queue_failures")
+            self.queue.nack(item, "分析失败", max_attempts=self.max_attempts)
+            return False
+
+        self.store.save_analysis(paper, analysis, self.fingerprint)
+        if not self.queue.ack(item):
+            logger.warning(f"租约已过期，{item.item_id} 可能被其他worker重复分析")
+        incr("queue_processed")
+        return True
+
+    def _loop(self, stop_event: threading.Event, exit_when_idle: bool, max_items: Optional[int]):
+        while not stop_event.is_set():
+            with self._count_lock:
+                if max_items is not None and self.processed >= max_items:
+                    return
+                self.processed += 1
+            items = self.queue.lease(self.worker_id, 1, self.lease_seconds, max_attempts=self.max_attempts)
+            if not items:
+                with self._count_lock:
+                    self.processed -= 1
+                if exit_when_idle:
+                    return
+                stop_event.wait(self.poll_interval)
+                continue
+            try:
+                self.process(items[0])
+            except Exception as e:
+                logger.error(f"处理 {items[0].item_id} 出错: {str(e)}")
+                self.queue.nack(items[0], str(e), max_attempts=self.max_attempts)
+
+    def run(self, exit_when_idle: bool = True, max_items: Optional[int] = None,
+            stop_event: Optional[threading.Event] = None) -> int:
+        """
+        运行worker
+
+        Args:
+            exit_when_idle: 队列中没有可领取的任务时退出（否则持续轮询）
+            max_items: 最多处理的任务数
+            stop_event: 设置后处理完当前任务即退出
+
+        Returns:
+            领取并处理的任务数
+        """
+        stop_event = stop_event or threading.Event()
+        logger.info(f"worker {self.worker_id} 启动，{self.threads} 个线程")
+        workers = [
+            threading.Thread(target=self._loop, args=(stop_event, exit_when_idle, max_items),
+                             name=f"queue-worker-{i}", daemon=True)
+            for i in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(timeout=1)
+        except KeyboardInterrupt:
+            logger.info("收到中断信号，处理完当前任务后退出")
+            stop_event.set()
+            for worker in workers:
+                worker.join()
+        logger.info(f"worker {self.worker_id} 退出，共处理 {self.processed} 个任务，队列状态: {self.queue.stats()}")
+        return self.processed
+
+
+def export_queue_results(queue, config: 'UserConfig', output_dir: str = "output") -> 'PipelineResult':
+    """把队列中已完成论文的分析结果从结果存储导出为CSV/统计摘要（通常在全部worker结束后运行一次）"""
+    from enhanced_main import PipelineResult, export_pipeline_results
+    from enhanced_paper_analyzer import EnhancedPaperAnalyzer
+    from results_store import ResultsStore
+    from seen_filter import _split_key, seen_key
+
+    store = ResultsStore.for_output_dir(output_dir)
+    papers, analyses = [], []
+    for arxiv_id in dict.fromkeys(_split_key(seen_key(item_id))[0] for item_id in queue.done_ids()):
+        paper, analysis = store.load_paper(arxiv_id), store.get_analysis(arxiv_id)
+        if paper is not None and analysis is not None:
+            papers.append(paper)
+            analyses.append(analysis)
+
+    result = PipelineResult(papers_found=len(papers))
+    if not analyses:
+        logger.warning("工作队列中没有已完成的论文")
+        return result
+    fingerprint = EnhancedPaperAnalyzer(config).input_fingerprint()
+    return export_pipeline_results(papers, analyses, fingerprint, output_dir, result)